@@ -1,12 +1,22 @@
 # config.py
 from pathlib import Path
 from dotenv import load_dotenv
-import os, re, ast
+import os, re, ast, sys
 
 # Always resolve path so it works no matter where you run from
 ENV_PATH = Path(__file__).resolve().parent / ".env"
 load_dotenv(dotenv_path=ENV_PATH)  # set override=True if you want .env to win over OS env
 
+# Repo root on sys.path so the shared `compliance` package imports from here too
+REPO_ROOT = Path(__file__).resolve().parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from compliance.pipeline import Settings
+
+# Partition / rollup / template settings, read while this .env is loaded (compliance.pipeline.Settings)
+SETTINGS = Settings.from_env()
+
 def int_set_env(name: str, default: set[int] | None = None) -> set[int]:
     raw = os.getenv(name)
     if not raw:
@@ -30,7 +40,17 @@ def int_set_env(name: str, default: set[int] | None = None) -> set[int]:
 ES_URL = (os.getenv("ES_URL"))
 SOURCE_INDEX = os.getenv("SOURCE_INDEX")
 API_KEY_B64 = os.getenv("API_KEY_B64")
+# Optional JSON list of {name, url, index, api_key | api_key_env} to read several clusters
+ES_SOURCES = os.getenv("ES_SOURCES", "")
 
 RELEASE_INFO_URL = os.getenv("RELEASE_INFO_URL")
+# Several release-information pages (e.g. Windows 11 and Windows 10), comma-separated;
+# scraped concurrently into one build table. Defaults to RELEASE_INFO_URL alone.
+RELEASE_INFO_URLS: list[str] = ([u for u in re.split(r"[,\s]+", os.getenv("RELEASE_INFO_URLS", "")) if u]
+                                or ([RELEASE_INFO_URL] if RELEASE_INFO_URL else []))
+# Parsed pages are cached on disk for this many seconds (0 = always scrape)
+RELEASE_INFO_CACHE_TTL = float(os.getenv("RELEASE_INFO_CACHE_TTL", "21600"))
+RELEASE_INFO_CACHE_DIR = os.getenv("RELEASE_INFO_CACHE_DIR") or str(Path(__file__).resolve().parent / ".release_info_cache")
 DEST_INDEX = os.getenv("DEST_INDEX")
+# Build lines to keep from the scraped pages; empty keeps every build they list
 SUPPORTED_BUILDS: set[int] = int_set_env("SUPPORTED_BUILDS")
@@ -1,56 +1,75 @@
 import os
-import json
 import re
 
+from compliance import jsoncodec
+from compliance.parallel import compare_rows
+from compliance.records import WindowsResult
 
-def write_enriched_agent_json(rows, ms_latest, out_dir="agents_enriched"):
+
+def sanitize_filename(name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", name or "unknown")
+
+
+def evaluate_row(r, ms_latest):
+    """
+    Compare one WindowsRow against the Microsoft baseline and return the
+    per-agent payload (a WindowsResult; `.as_dict()` is what goes to disk).
+    With a WindowsReleaseHistory baseline it also says how many cumulative updates
+    and days the agent is behind (None when the build has no history).
+    """
+    agent = r.agent_name or "unknown"
+    build = r.build
+    rev   = r.revision
+    base  = ms_latest.get(build)  # baseline UBR for this build line
+    behind = getattr(ms_latest, "behind", None)
+    patches, days, latest_kb = behind(build, rev) if behind else (None, None, None)
+
+    # binary updated + reason
+    if build is None or rev is None:
+        updated = "no"
+        reason  = "missing build or revision"
+    elif base is None:
+        updated = "no"
+        reason  = f"build {build} not found in Microsoft latest table"
+    else:
+        if rev >= base:
+            updated = "yes"
+            reason  = f"{build}.{rev} >= {build}.{base}"
+        else:
+            updated = "no"
+            reason  = f"{build}.{rev} < {build}.{base}"
+            if patches:
+                reason += f" ({patches} update(s), {days} day(s) behind)"
+
+    return WindowsResult(agent, r.timestamp, build, rev, base, updated, reason, patches, days, latest_kb)
+
+
+def write_enriched_agent_json(rows, ms_latest, out_dir="agents_enriched", workers=None, rollup=None):
     """
-    rows:      list of {"agent_name", "build", "revision", "timestamp"}
+    rows:      list of WindowsRow (agent_name, build, revision, timestamp)
     ms_latest: dict  { build_prefix(int) -> latest_ubr(int) }  e.g. {22631:6060, 26100:6899, 26200:6899}
+               (a WindowsReleaseHistory adds patches_behind / days_behind / latest_kb)
     out_dir:   output directory for per-agent JSON files
+    workers:   compare in a process pool when > 1 (default: $COMPARE_WORKERS)
+    rollup:    optional compliance.rollup.Rollup, counted as the payloads go by
 
-    Returns a small summary dict.
+    Returns a small summary dict (plus "rollup" when one is given).
     """
     os.makedirs(out_dir, exist_ok=True)
 
     summary = {"total": 0, "yes": 0, "no": 0}
-    for r in rows:
-        agent = r.get("agent_name") or "unknown"
-        build = r.get("build")
-        rev   = r.get("revision")
-        base  = ms_latest.get(build)  # baseline UBR for this build line
-
-        # binary updated + reason
-        if build is None or rev is None:
-            updated = "no"
-            reason  = "missing build or revision"
-        elif base is None:
-            updated = "no"
-            reason  = f"build {build} not found in Microsoft latest table"
-        else:
-            if rev >= base:
-                updated = "yes"
-                reason  = f"{build}.{rev} >= {build}.{base}"
-            else:
-                updated = "no"
-                reason  = f"{build}.{rev} < {build}.{base}"
-
-        payload = {
-            "agent_name": agent,
-            "timestamp": r.get("timestamp"),
-            "build": build,
-            "revision": rev,
-            "baseline_revision": base,
-            "updated": updated,      
-            "reason": reason
-        }
+    for row, payload in zip(rows, compare_rows(evaluate_row, ms_latest, rows, workers=workers)):
 
         # filename per agent
-        fname = re.sub(r"[^A-Za-z0-9._-]+", "_", agent) + ".json"
-        with open(os.path.join(out_dir, fname), "w", encoding="utf-8") as f:
-            json.dump(payload, f, ensure_ascii=False, indent=2)
+        fname = sanitize_filename(payload.agent_name) + ".json"
+        with open(os.path.join(out_dir, fname), "wb") as f:
+            f.write(jsoncodec.dumps(payload.as_dict(), indent=True))
 
         summary["total"] += 1
-        summary["yes" if updated == "yes" else "no"] += 1
+        summary["yes" if payload.updated == "yes" else "no"] += 1
+        if rollup is not None:
+            rollup.add(row, (fname, payload), ms_latest)
 
+    if rollup is not None:
+        summary["rollup"] = rollup
     return summary
@@ -1,89 +1,49 @@
 import os
 import sys
-import json
-from datetime import datetime
-import requests
-import sys
-import re
-from config import ES_URL, DEST_INDEX, API_KEY_B64
-
-
+from config import ES_URL, DEST_INDEX, API_KEY_B64, SETTINGS
+from compliance.bulk import BulkEngine, BulkFlushError, RunSnapshotBuilder, STATE_DIRNAME, iter_json_dir
+from compliance.partition import for_run
 
-def _iso_now():
-    return datetime.datetime.utcnow().replace(microsecond=0).isoformat() + "Z"
 
-def _sanitize(name: str) -> str:
-    return re.sub(r"[^A-Za-z0-9._-]+", "_", name or "unknown")
-
-def ship_json_dir_to_elastic(out_dir="agents_enriched", dest_index=DEST_INDEX, allowed_agents=None):
+def ship_json_dir_to_elastic(out_dir="agents_enriched", dest_index=DEST_INDEX, allowed_agents=None,
+                             batch_size=500):
     """
     Bulk-index all JSON files for agents in `allowed_agents` only.
     - allowed_agents: iterable of agent names from the *current run*.
     - Files for agents not in `allowed_agents` are skipped.
     - Uses auto-generated _id so each run creates separate docs.
+    - With PARTITION_MODE=run they go into this run's own index instead (compliance.partition).
+    - Dead letters left by a previous run (in `<out_dir>/.ship_state`) are sent first; rejected
+      items, or whole batches that keep failing, are dead-lettered for the next run.
     """
-    # Build a sanitized allowlist based on current rows
-    allowed_sanitized = None
-    if allowed_agents is not None:
-        allowed_sanitized = {_sanitize(a) for a in allowed_agents if a}
-
-    files = [f for f in os.listdir(out_dir) if f.lower().endswith(".json")]
-    if not files:
+    if not any(f.lower().endswith(".json") for f in os.listdir(out_dir)):
         print(f"No JSON files found in {out_dir}")
         return
 
-    bulk_lines = []
-    used = 0
-
-    for fname in files:
-        base = os.path.splitext(fname)[0]  # sanitized agent name in your writer
-        if allowed_sanitized is not None and base not in allowed_sanitized:
-            # stale file from previous runs; skip
-            continue
-
-        path = os.path.join(out_dir, fname)
-        with open(path, "r", encoding="utf-8") as f:
-            doc = json.load(f)
-
-        # Extra guard: if the payload has agent_name and it's not allowed, skip
-        if allowed_sanitized is not None:
-            payload_agent = _sanitize(doc.get("agent_name"))
-            if payload_agent not in allowed_sanitized:
-                continue
-
-        # Ensure @timestamp for Discover
-        if "@timestamp" not in doc:
-            ts = doc.get("timestamp")
-            doc["@timestamp"] = ts if isinstance(ts, str) and ts else _iso_now()
-
-        # Action (no _id => separate doc), then source line
-        bulk_lines.append(json.dumps({"index": {"_index": dest_index}}, separators=(",", ":")))
-        bulk_lines.append(json.dumps(doc, ensure_ascii=False, separators=(",", ":")))
-        used += 1
-
-    if not bulk_lines:
-        print("Nothing to index (no files matched current agents).")
-        return
-
-    ndjson = "\n".join(bulk_lines) + "\n"
-    url = f"{ES_URL.rstrip('/')}/_bulk"
-    headers = {
-        "Authorization": f"ApiKey {API_KEY_B64}",
-        "Content-Type": "application/x-ndjson"
-    }
-
+    engine = BulkEngine(
+        ES_URL,
+        API_KEY_B64,
+        batch_size=batch_size,
+        refresh="wait_for",
+        timeout=90,
+        state_dir=os.path.join(out_dir, STATE_DIRNAME),
+    )
+    builder = RunSnapshotBuilder(dest_index, allowed_agents)
+    partition = for_run(ES_URL, API_KEY_B64, dest_index, SETTINGS)
+    if partition is not None:
+        builder, dest_index = partition.wrap(builder), partition.index
     try:
-        resp = requests.post(url, params={"refresh": "wait_for"}, data=ndjson.encode("utf-8"), headers=headers, timeout=90)
-        resp.raise_for_status()
-        j = resp.json()
-        if j.get("errors"):
-            fails = [it for it in j.get("items", []) if it.get("index", {}).get("error")]
-            print(f"Indexed with errors: {len(fails)} failures out of {used} files")
-            for it in fails[:5]:
-                err = it["index"]["error"]
-                print(f" - {err.get('type')}: {err.get('reason')}")
-        else:
-            print(f" Bulk indexed {used} docs into {dest_index}")
-    except requests.RequestException as e:
+        stats = engine.ship(iter_json_dir(out_dir), builder)
+    except BulkFlushError as e:
         print(f" Bulk index error: {e}", file=sys.stderr)
         sys.exit(1)
+
+    if not stats.docs and not stats.replayed:
+        print("Nothing to index (no files matched current agents).")
+    elif stats.failed:
+        print(f"Indexed with errors: {stats.failed} failures out of {stats.docs} docs")
+    else:
+        print(f" Bulk indexed {stats.docs} docs into {dest_index}")
+    if partition is not None:
+        partition.commit(stats)
+    return stats
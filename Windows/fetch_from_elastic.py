@@ -1,67 +1,38 @@
 import sys
 import requests
 import sys
-from config import ES_URL, SOURCE_INDEX, API_KEY_B64
+from config import ES_URL, SOURCE_INDEX, API_KEY_B64, ES_SOURCES
+from compliance import jsoncodec
+from compliance.http import get_session
+from compliance.records import WindowsRow
+from compliance.sources import Fetched, fan_in, load_sources
+
+# resolved at import: api_key_env names may come from this folder's .env
+SOURCES = load_sources(ES_SOURCES, es_url=ES_URL, index=SOURCE_INDEX, api_key_b64=API_KEY_B64)
 
 
 def get_elastic_updates():
-    url = f"{ES_URL.rstrip('/')}/{SOURCE_INDEX}/_search"
+    """Rows from every configured source (ES_SOURCES, else ES_URL/SOURCE_INDEX), newest per agent."""
+    rows, _ = fan_in(SOURCES, fetch_source, key="agent_name")
+    return rows
+
+
+def fetch_source(source):
+    url = f"{source.es_url}/{source.index}/_search"
     params = {
         "size": 10000,
         "filter_path": "hits.hits"
     }
-    headers = {"Authorization": f"ApiKey {API_KEY_B64}"}
+    headers = {"Authorization": f"ApiKey {source.api_key_b64}"}
 
     try:
-        resp = requests.get(url, params=params, headers=headers, timeout=30)
+        resp = get_session().get(url, params=params, headers=headers, timeout=30)
         resp.raise_for_status()
-        data = resp.json()
+        data = jsoncodec.response_json(resp)
         hits = data.get("hits", {}).get("hits", [])
         print(f"Retrieved {len(hits)} os_version docs")
 
-        rows = []
-        seen_agents = set()
-
-        for doc in hits:
-            src = doc.get("_source", {}) or {}
-            host = src.get("host", {}) or {}
-            os_ = host.get("os", {}) or {}
-            os_family = os_.get("family")
-            action = src.get("action_data") or {}
-
-            agent = src.get("agent") or {}
-            agent_name = agent.get("name")
-
-           
-            if os_family != "windows" or not action:
-                continue
-            if action.get("query") != "SELECT * FROM os_version;":
-                continue
-            if agent_name in seen_agents:
-                continue
-            seen_agents.add(agent_name)
-            osquery = src.get("osquery") or {}
-            build = osquery.get("build")
-            revision = osquery.get("revision")
-            # normalize to ints if possible
-            try:
-                build = int(str(build)) if build is not None else None
-            except ValueError:
-                build = None
-            try:
-                revision = int(str(revision)) if revision is not None else None
-            except ValueError:
-                revision = None
-            
-            
-            rows.append({
-                "agent_name": agent_name,
-                "build": build,           # e.g., 22631
-                "revision": revision,     # e.g., 6060
-                "timestamp": src.get("@timestamp")
-            })
-
-        return rows
+        return Fetched(rows_from_hits(hits, set()), len(hits))
 
     except requests.exceptions.RequestException as e:
         print(f" Elastic HTTP error: {e}", file=sys.stderr)
@@ -70,3 +41,47 @@ def get_elastic_updates():
         print(" Failed to parse Elastic JSON.", file=sys.stderr)
         sys.exit(1)
 
+
+def rows_from_hits(hits, seen_agents):
+    """
+    Turn raw `_search` hits into Windows os_version rows (WindowsRow), one per agent.
+    `seen_agents` is updated in place so it can be shared across pages.
+    """
+    rows = []
+    for doc in hits:
+        src = doc.get("_source", {}) or {}
+        host = src.get("host", {}) or {}
+        os_ = host.get("os", {}) or {}
+        os_family = os_.get("family")
+        action = src.get("action_data") or {}
+
+        agent = src.get("agent") or {}
+        agent_name = agent.get("name")
+
+        if os_family != "windows" or not action:
+            continue
+        if action.get("query") != "SELECT * FROM os_version;":
+            continue
+        if agent_name in seen_agents:
+            continue
+        seen_agents.add(agent_name)
+        osquery = src.get("osquery") or {}
+        build = osquery.get("build")
+        revision = osquery.get("revision")
+        # normalize to ints if possible
+        try:
+            build = int(str(build)) if build is not None else None
+        except ValueError:
+            build = None
+        try:
+            revision = int(str(revision)) if revision is not None else None
+        except ValueError:
+            revision = None
+
+        rows.append(WindowsRow(
+            agent_name,
+            build,                    # e.g., 22631
+            revision,                 # e.g., 6060
+            src.get("@timestamp"),
+        ))
+    return rows
@@ -0,0 +1,134 @@
+# pipeline.py
+"""Windows plug-in for the shared runners (see compliance.pipeline)."""
+from pathlib import Path
+
+from config import ES_URL, SOURCE_INDEX, API_KEY_B64, DEST_INDEX, SUPPORTED_BUILDS, SETTINGS
+from compliance.pipeline import PipelineSpec
+from compliance.bulk import AgentReportBuilder, STATE_DIRNAME, ship_dir_to_elastic
+from compliance.dag import Stage
+from compliance.records import WindowsRow
+from compliance.rollup import Rollup
+from compliance import templates
+from compliance.templates import DATE, FREE_TEXT, INTEGER, KEYWORD, REPORT_FIELDS
+from fetch_from_elastic import SOURCES, get_elastic_updates, rows_from_hits
+from scrape_latest_build import fetch_ms_latest_builds
+from create_json import evaluate_row, sanitize_filename, write_enriched_agent_json
+
+OUT_DIR = str(Path(__file__).resolve().parent / "agents_enriched")
+
+# Only what rows_from_hits() reads; the os_version query check stays client-side
+QUERY = {"bool": {"filter": [{"match": {"host.os.family": "windows"}}]}}
+SOURCE_FIELDS = [
+    "@timestamp",
+    "agent.name",
+    "host.os.family",
+    "action_data.query",
+    "osquery.build",
+    "osquery.revision",
+]
+
+# compliance.templates: one WindowsResult per agent (see compliance.records)
+MAPPINGS = {
+    **REPORT_FIELDS,
+    "agent_name": KEYWORD,
+    "timestamp": DATE,
+    "build": INTEGER,
+    "revision": INTEGER,
+    "baseline_revision": INTEGER,
+    "updated": KEYWORD,
+    "reason": FREE_TEXT,
+    "patches_behind": INTEGER,
+    "days_behind": INTEGER,
+    "latest_kb": KEYWORD,
+}
+
+
+def evaluate(row, ms_latest):
+    """(filename, payload) — the same shape ship_dir_to_elastic reads back from disk."""
+    payload = evaluate_row(row, ms_latest)
+    return sanitize_filename(payload.agent_name) + ".json", payload
+
+
+def line_of(row) -> str:
+    """OS line for compliance.hostindex: the build (22631, 26100, ...)."""
+    return f"build-{row.build}"
+
+
+def baseline_lines(ms_latest) -> dict:
+    """A build's hosts change status only when its latest UBR does."""
+    return {f"build-{build}": ubr for build, ubr in ms_latest.items()}
+
+
+def rollup_of(row, record, ms_latest):
+    """compliance.rollup: (status, days behind, version) of one compared agent."""
+    payload = record[1]
+    if payload.build is None or payload.revision is None:
+        return "unknown", None, None
+    version = f"{payload.build}.{payload.revision}"
+    if payload.baseline_revision is None:
+        return "unsupported", None, version
+    if payload.updated == "yes":
+        return "compliant", 0, version
+    return "behind", payload.days_behind, version
+
+
+def spec(dest_index: str = DEST_INDEX) -> PipelineSpec:
+    return PipelineSpec(
+        name="windows",
+        es_url=ES_URL,
+        api_key_b64=API_KEY_B64,
+        source_index=SOURCE_INDEX,
+        dest_index=dest_index,
+        query=QUERY,
+        source_fields=SOURCE_FIELDS,
+        load_baseline=fetch_ms_latest_builds,
+        rows_from_hits=rows_from_hits,
+        evaluate=evaluate,
+        builder=AgentReportBuilder(dest_index),
+        shard_field="agent.name",
+        row_key="agent_name",
+        sources=SOURCES,
+        line_of=line_of,
+        baseline_lines=baseline_lines,
+        row_type=WindowsRow,
+        rollup_of=rollup_of,
+        mappings=MAPPINGS,
+        index_sort="agent_name",
+        state_dir=str(Path(OUT_DIR) / STATE_DIRNAME),   # same as ship_dir_to_elastic's
+        settings=SETTINGS,
+    )
+
+
+def _baseline(_):
+    ms_latest = fetch_ms_latest_builds()
+    print("Microsoft latest (build → UBR):", ms_latest)
+    print("Current supported builds: ", SUPPORTED_BUILDS)
+    return ms_latest
+
+
+def stages(dest_index: str = DEST_INDEX, out_dir: str = OUT_DIR, compare_workers: int = None) -> list:
+    """
+    fetch ∥ baseline → compare (per-agent files) → ship → rollup, for compliance.dag;
+    ship also waits for the index template check (compliance.templates).
+    compare_workers > 1 compares in a process pool (default: $COMPARE_WORKERS).
+    """
+    run_spec = spec(dest_index)
+    return [
+        Stage("fetch", lambda r: get_elastic_updates()),
+        Stage("baseline", _baseline),
+        Stage("template", lambda r: templates.ensure(run_spec)),
+        Stage("compare", lambda r: write_enriched_agent_json(
+            r["fetch"], r["baseline"], out_dir=out_dir, workers=compare_workers, rollup=Rollup.of(run_spec)),
+              deps=("fetch", "baseline")),
+        Stage("ship", lambda r: ship_dir_to_elastic(
+            directory=out_dir,
+            dest_index=dest_index,
+            es_url=run_spec.es_url,
+            api_key_b64=run_spec.api_key_b64,
+            settings=run_spec.settings,
+            refresh="wait_for",   # optional: make searchable before returning
+            batch_size=500,
+            id_field="agent_name",  # or None to let ES autogenerate IDs
+        ), deps=("compare", "template")),
+        Stage("rollup", lambda r: r["compare"]["rollup"].ship(run_spec), deps=("compare", "ship")),
+    ]
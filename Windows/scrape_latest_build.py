@@ -1,38 +1,160 @@
 import sys
 import requests
-import sys
 import re
 import html
-from config import RELEASE_INFO_URL, SUPPORTED_BUILDS
+import hashlib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from config import RELEASE_INFO_URLS, SUPPORTED_BUILDS, RELEASE_INFO_CACHE_TTL, RELEASE_INFO_CACHE_DIR
+from compliance import jsoncodec
+from compliance.http import get_session
+from compliance.release_history import WindowsReleaseHistory
+
+def _cell_text(c: str) -> str:
+    return re.sub(r"<.*?>", "", html.unescape(c)).strip()
 
 def fetch_ms_latest_builds():
     """
-    Scrape the table on Microsoft's 'Windows 11 release information' page.
-    Returns { build_prefix:int -> latest_ubr:int }, e.g. {22631: 6060, 26100: 6899, 26200: 6899}.
+    Scrape the tables on Microsoft's release information pages (RELEASE_INFO_URLS,
+    e.g. Windows 11 and Windows 10), concurrently, and merge them into one table.
+    Returns { build_prefix:int -> latest_ubr:int }, e.g. {22631: 6060, 26100: 6899, 26200: 6899},
+    as a WindowsReleaseHistory that also holds every build's (UBR, availability date, KB)
+    rows from the per-version release history tables.
+
+    Each page's parsed tables are cached for RELEASE_INFO_CACHE_TTL seconds, so
+    extra pages cost nothing on most runs.
     """
+    if not RELEASE_INFO_URLS:
+        print(" Set RELEASE_INFO_URL or RELEASE_INFO_URLS.", file=sys.stderr)
+        sys.exit(1)
+
+    with ThreadPoolExecutor(max_workers=len(RELEASE_INFO_URLS)) as pool:
+        pages = list(pool.map(_load_page, RELEASE_INFO_URLS))
+    # a missing page drops its build lines, and their hosts would be reported as unsupported
+    failed = [url for url, page in zip(RELEASE_INFO_URLS, pages) if page is None]
+    if failed:
+        print(f" Could not load {len(failed)} of {len(pages)} Microsoft page(s) and no cached copy: "
+              f"{', '.join(failed)}", file=sys.stderr)
+        sys.exit(1)
+
+    latest_by_build = WindowsReleaseHistory()
+    for page in pages:
+        if page is None:
+            continue
+        for build, ubr in page["latest"].items():
+            build = int(build)
+            # Only keep the build lines we care about (all of them when unset)
+            if not SUPPORTED_BUILDS or build in SUPPORTED_BUILDS:
+                latest_by_build[build] = max(ubr, latest_by_build.get(build, 0))
+        for build, ubr, day, kb in page["history"]:
+            if not SUPPORTED_BUILDS or build in SUPPORTED_BUILDS:
+                latest_by_build.add(build, ubr, day, kb)
+
+    latest_by_build.freeze()
+    if not latest_by_build:
+        print(" Could not parse 'Latest build' from Microsoft table.", file=sys.stderr)
+        sys.exit(1)
+    missing = sorted(SUPPORTED_BUILDS - set(latest_by_build))
+    if missing:
+        print(f"[WARN] SUPPORTED_BUILDS {missing} not on any Microsoft page; their hosts have no baseline")
+    if not latest_by_build.ubrs:
+        print("[WARN] no release history tables on the Microsoft page; patches/days behind left empty")
+
+    return latest_by_build
+
+# --- one page ----------------------------------------------------------------
+
+def _cache_path(url: str) -> str:
+    return os.path.join(RELEASE_INFO_CACHE_DIR, hashlib.sha1(url.encode()).hexdigest()[:16] + ".json")
+
+def _read_cache(url: str):
+    if RELEASE_INFO_CACHE_TTL <= 0:
+        return None
+    try:
+        with open(_cache_path(url), "rb") as fh:
+            page = jsoncodec.load(fh)
+        return page if page.get("url") == url else None
+    except (OSError, ValueError):
+        return None
+
+def _write_cache(page: dict) -> None:
+    if RELEASE_INFO_CACHE_TTL <= 0:
+        return
     try:
-        r = requests.get(RELEASE_INFO_URL, timeout=30)
+        os.makedirs(RELEASE_INFO_CACHE_DIR, exist_ok=True)
+        path = _cache_path(page["url"])
+        with open(path + ".tmp", "wb") as fh:
+            jsoncodec.dump(page, fh)
+        os.replace(path + ".tmp", path)
+    except OSError as e:
+        print(f"[WARN] could not cache {page['url']}: {e}")
+
+def _load_page(url: str):
+    """
+    Parsed tables of one page: from the cache while fresh, else scraped (a
+    conditional GET when a stale copy exists). A page that cannot be fetched
+    falls back to its stale copy, or None.
+    """
+    cached = _read_cache(url)
+    now = time.time()
+    if cached and now - cached.get("fetched_at", 0) < RELEASE_INFO_CACHE_TTL:
+        print(f"[OK] {url}: cached {int(now - cached['fetched_at'])}s ago")
+        return cached
+
+    headers = {}
+    if cached and cached.get("etag"):
+        headers["If-None-Match"] = cached["etag"]
+    if cached and cached.get("last_modified"):
+        headers["If-Modified-Since"] = cached["last_modified"]
+    try:
+        r = get_session().get(url, headers=headers, timeout=30)
+        if r.status_code == 304 and cached:
+            cached["fetched_at"] = now
+            _write_cache(cached)
+            print(f"[OK] {url}: not modified")
+            return cached
         r.raise_for_status()
-        html_text = r.text
     except requests.RequestException as e:
-        print(f" Failed to fetch Microsoft page: {e}", file=sys.stderr)
-        sys.exit(1)
+        if cached:
+            print(f"[WARN] Failed to fetch Microsoft page {url} ({e}); using copy from "
+                  f"{int(now - cached.get('fetched_at', 0))}s ago")
+            return cached
+        print(f" Failed to fetch Microsoft page {url}: {e}", file=sys.stderr)
+        return None
+
+    page = parse_release_page(r.text)
+    page.update(url=url, fetched_at=now, etag=r.headers.get("ETag"),
+                last_modified=r.headers.get("Last-Modified"))
+    _write_cache(page)
+    return page
 
+def parse_release_page(html_text: str) -> dict:
+    """
+    Every build on one release information page, unfiltered:
+    {"latest": {build: latest_ubr}, "history": [[build, ubr, "YYYY-MM-DD", kb], ...]}.
+    """
     # Grab all tables
     tables = re.findall(r"<table.*?>.*?</table>", html_text, flags=re.I | re.S)
-    latest_by_build = {}
+    latest, history = {}, []
 
     for tbl in tables:
         # Extract headers
         headers = re.findall(r"<th[^>]*>(.*?)</th>", tbl, flags=re.I | re.S)
-        headers = [re.sub(r"<.*?>", "", html.unescape(h)).strip() for h in headers]
+        headers = [_cell_text(h) for h in headers]
         if not headers:
             continue
 
+        # Release history tables: Servicing option | Availability date | Build | KB article
+        lower = [h.lower() for h in headers]
+        if "build" in lower and "availability date" in lower:
+            history.extend(_history_rows(tbl, lower))
+            continue
+
         # We want the table that has both 'Version' and 'Latest build'
         try:
-            v_idx = [h.lower() for h in headers].index("version")
-            lb_idx = next(i for i, h in enumerate(headers) if "latest build" in h.lower())
+            v_idx = lower.index("version")
+            lb_idx = next(i for i, h in enumerate(lower) if "latest build" in h)
         except (ValueError, StopIteration):
             continue  # not our table
 
@@ -43,8 +165,7 @@ def fetch_ms_latest_builds():
             if not cells or len(cells) <= max(v_idx, lb_idx):
                 continue
             # Clean cell text
-            cells = [re.sub(r"<.*?>", "", html.unescape(c)).strip() for c in cells]
-            version_txt = cells[v_idx]          # e.g., "25H2"
+            cells = [_cell_text(c) for c in cells]
             latest_build_txt = cells[lb_idx]    # e.g., "26200.6899"
 
             m = re.search(r"(\d{5})\.(\d+)", latest_build_txt)
@@ -52,13 +173,28 @@ def fetch_ms_latest_builds():
                 continue
             build_prefix = int(m.group(1))
             ubr = int(m.group(2))
+            # Several servicing options (GA / LTSC) can share a build line
+            latest[build_prefix] = max(ubr, latest.get(build_prefix, 0))
 
-            # Only keep Windows 11 lines we care about
-            if build_prefix in SUPPORTED_BUILDS:
-                latest_by_build[build_prefix] = max(ubr, latest_by_build.get(build_prefix, 0))
+    return {"latest": latest, "history": history}
 
-    if not latest_by_build:
-        print(" Could not parse 'Latest build' from Microsoft table.", file=sys.stderr)
-        sys.exit(1)
-
-    return latest_by_build
+def _history_rows(tbl: str, headers: list) -> list:
+    b_idx = headers.index("build")
+    d_idx = headers.index("availability date")
+    kb_idx = next((i for i, h in enumerate(headers) if h.startswith("kb")), None)
+    out = []
+    for row in re.findall(r"<tr[^>]*>(.*?)</tr>", tbl, flags=re.I | re.S):
+        cells = [_cell_text(c) for c in re.findall(r"<td[^>]*>(.*?)</td>", row, flags=re.I | re.S)]
+        if len(cells) <= max(b_idx, d_idx):
+            continue
+        day = re.search(r"\d{4}-\d{2}-\d{2}", cells[d_idx])
+        if not day:
+            continue
+        kb = None
+        if kb_idx is not None and kb_idx < len(cells):
+            m = re.search(r"KB\d+", cells[kb_idx])
+            kb = m.group(0) if m else None
+        # a cell can carry several builds, e.g. "26100.6899 and 26200.6899"
+        for m in re.finditer(r"(\d{5})\.(\d+)", cells[b_idx]):
+            out.append([int(m.group(1)), int(m.group(2)), day.group(0), kb])
+    return out
@@ -0,0 +1,6 @@
+"""
+Offline benchmarks: a synthetic osquery fleet served by a local Elasticsearch
+stand-in, driven through each platform's real pipeline.
+
+    python -m bench.run --sizes 10k,100k --platforms windows,macos,linux
+"""
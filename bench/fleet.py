@@ -0,0 +1,174 @@
+# fleet.py
+"""
+Deterministic synthetic osquery documents.
+
+Documents are computed from their position, never stored: `doc(i)` is the i-th
+hit of the index, newest `@timestamp` first, so the stand-in can serve a
+million-host fleet in constant memory. With `results_per_host` > 1 the same
+host reports several times; its first (newest) hit is the one that counts.
+"""
+import json
+from datetime import datetime, timedelta, timezone
+
+EPOCH = datetime(2025, 10, 20, tzinfo=timezone.utc)
+
+# build line -> latest UBR, as published on the (synthetic) Microsoft page
+WINDOWS_LATEST = {22631: 6060, 26100: 6899, 26200: 6899, 19045: 6456, 17763: 7922}
+WINDOWS_MIX = [26100, 26100, 26100, 22631, 22631, 26200, 19045, 17763]
+
+# maintained macOS majors -> latest; 13 and 12 are unmaintained
+MACOS_LATEST = {"26": "26.0.1", "15": "15.7.1", "14": "14.8.1"}
+MACOS_MIX = ["15", "15", "15", "26", "14", "14", "13", "12"]
+MACOS_PATCHES = {"26": 1, "15": 7, "14": 8, "13": 7, "12": 7}
+
+UBUNTU_LATEST = {"25": "25.10", "24": "24.04.3", "22": "22.04.5"}
+LINUX_MIX = [
+    ("Ubuntu", "24.04.{p} LTS (Noble Numbat)", 3),
+    ("Ubuntu", "24.04.{p} LTS (Noble Numbat)", 3),
+    ("Ubuntu", "22.04.{p} LTS (Jammy Jellyfish)", 5),
+    ("Ubuntu", "25.10", 0),
+    ("Debian GNU/Linux", "12 (bookworm)", 0),
+    ("Linux Mint", "22.{p}", 2),
+]
+
+PLATFORMS = ("windows", "macos", "linux")
+
+
+def _h(i: int) -> int:
+    # cheap, stable per-position "random" bits
+    return (i * 2654435761) & 0xFFFFFFFF
+
+
+def timestamp(i: int) -> str:
+    ts = EPOCH - timedelta(seconds=i)
+    return ts.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+def timestamp_millis(i: int) -> int:
+    return int((EPOCH - timedelta(seconds=i)).timestamp() * 1000)
+
+
+def windows_doc(i: int, hosts: int) -> dict:
+    host = i % hosts
+    h = _h(host)
+    build = WINDOWS_MIX[h % len(WINDOWS_MIX)]
+    latest = WINDOWS_LATEST[build]
+    behind = (h >> 8) % 6            # 0 = current
+    return {
+        "@timestamp": timestamp(i),
+        "agent": {"name": f"WIN-{host:07d}"},
+        "host": {"os": {"family": "windows", "name": "Windows 11 Pro" if build >= 22000 else "Windows 10 Pro"}},
+        "action_data": {"query": "SELECT * FROM os_version;"},
+        "osquery": {"build": str(build), "revision": str(latest - behind * 37 if behind else latest)},
+    }
+
+
+def macos_doc(i: int, hosts: int) -> dict:
+    host = i % hosts
+    h = _h(host)
+    major = MACOS_MIX[h % len(MACOS_MIX)]
+    top = MACOS_PATCHES[major]
+    minor = top - ((h >> 8) % (top + 1))
+    version = f"{major}.{minor}" if major != "26" else f"26.0.{minor}"
+    if major in MACOS_LATEST and (h >> 16) % 2 == 0:
+        version = MACOS_LATEST[major]
+    return {
+        "@timestamp": timestamp(i),
+        "agent": {"name": f"MAC-{host:07d}"},
+        "host": {"os": {"name": "macOS", "family": "darwin"}},
+        "action_data": {"query": "SELECT * from os_version;"},
+        "osquery": {"version": version},
+    }
+
+
+def linux_doc(i: int, hosts: int) -> dict:
+    host = i % hosts
+    h = _h(host)
+    name, pattern, top = LINUX_MIX[h % len(LINUX_MIX)]
+    version = pattern.format(p=(h >> 8) % (top + 1)) if "{p}" in pattern else pattern
+    return {
+        "@timestamp": timestamp(i),
+        "host": {
+            "id": f"{host:032x}",
+            "name": f"lnx-{host:07d}",
+            "os": {"name": name, "version": version},
+        },
+    }
+
+
+DOC_FUNCS = {"windows": windows_doc, "macos": macos_doc, "linux": linux_doc}
+
+
+class Fleet:
+    """One platform's source index: `hosts` hosts, `hosts * results_per_host` hits."""
+
+    def __init__(self, platform: str, hosts: int, results_per_host: int = 1):
+        self.platform = platform
+        self.hosts = hosts
+        self.total = hosts * results_per_host
+        self._doc = DOC_FUNCS[platform]
+
+    def doc(self, i: int) -> dict:
+        return self._doc(i, self.hosts)
+
+    def __len__(self):
+        return self.total
+
+    def __iter__(self):
+        for i in range(self.total):
+            yield self.doc(i)
+
+
+def parse_size(s: str) -> int:
+    s = s.strip().lower()
+    mult = {"k": 1_000, "m": 1_000_000}.get(s[-1:], 1)
+    return int(float(s[:-1] if mult > 1 else s) * mult)
+
+
+# --- baselines served next to the fleet ----------------------------------------
+
+WINDOWS_VERSIONS = {22631: ("23H2", "win11"), 26100: ("24H2", "win11"), 26200: ("25H2", "win11"),
+                    19045: ("22H2", "win10"), 17763: ("1809", "win10")}
+
+
+def ms_release_page(family: str = None) -> str:
+    """Release-information page for `family` ("win11" / "win10"), or every build line."""
+    builds = {b: ubr for b, ubr in WINDOWS_LATEST.items()
+              if family is None or WINDOWS_VERSIONS[b][1] == family}
+    rows = "".join(
+        f"<tr><td>{WINDOWS_VERSIONS[b][0]}</td><td>General Availability Channel</td><td>2025-10-14</td>"
+        f"<td>{b}.{ubr}</td></tr>"
+        for b, ubr in builds.items()
+    )
+    history = "".join(_ms_history_table(b, ubr) for b, ubr in builds.items())
+    return ("<html><body><table><tr><th>Version</th><th>Servicing option</th>"
+            "<th>Availability date</th><th>Latest build</th></tr>" + rows + "</table>"
+            + history + "</body></html>")
+
+
+def _ms_history_table(build: int, latest: int, releases: int = 8) -> str:
+    """Monthly cumulative updates, 37 UBRs apart — the steps fleet hosts lag behind by."""
+    day0 = datetime(2025, 10, 14)
+    rows = "".join(
+        f"<tr><td>General Availability Channel</td><td>{(day0 - timedelta(days=28 * k)):%Y-%m-%d}</td>"
+        f"<td>{build}.{latest - 37 * k}</td><td><a href='#'>KB{5066835 - 1000 * k}</a></td></tr>"
+        for k in range(releases)
+    )
+    return (f"<h4>Version (OS build {build})</h4><table><tr><th>Servicing option</th>"
+            "<th>Availability date</th><th>Build</th><th>KB article</th></tr>" + rows + "</table>")
+
+
+def endoflife_macos() -> str:
+    releases = []
+    for major in ["26", "15", "14", "13", "12"]:
+        maintained = major in MACOS_LATEST
+        latest = MACOS_LATEST.get(major) or f"{major}.{MACOS_PATCHES[major]}"
+        releases.append({"name": major, "isMaintained": maintained,
+                         "latest": {"name": latest, "date": "2025-10-01"}})
+    return json.dumps({"result": {"name": "macos", "releases": releases}})
+
+
+def diwa_ubuntu() -> str:
+    items = [{"text": f"Distribution Release: Ubuntu {v}", "url": f"https://distrowatch.com/{n}"}
+             for n, v in enumerate(UBUNTU_LATEST.values(), 12000)]
+    return json.dumps({"recent_related_news_and_releases": items})
@@ -0,0 +1,191 @@
+# run.py
+"""
+End-to-end pipeline benchmarks against the local stand-in.
+
+    python -m bench.run --sizes 10k,100k,1m --platforms windows,macos,linux
+    python -m bench.run --sizes 10k --mode sync --latency-ms 5 --bulk-us-per-doc 20
+    python -m bench.run --sizes 100k --codecs json,orjson       # stdlib vs orjson
+
+The stand-in runs in its own process and every (platform, size) case runs in a
+fresh interpreter, so peak RSS is per case and the server never competes with
+the pipeline for the GIL. Each case is the platform's real pipeline (async:
+compliance.aio over its PipelineSpec; sync: its compliance.dag stages) with the
+Elasticsearch and baseline URLs pointed at the stand-in. Results are printed as
+a table and appended as JSON lines to --out (default bench_output.txt).
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from bench import fleet, stub_es
+
+RESULT_TAG = "BENCH_RESULT "
+
+
+def platform_env(platform: str, es_url: str, index: str, dest: str) -> dict:
+    """Settings each platform reads at import time, aimed at the stand-in."""
+    return {
+        # Windows / macOS config.py
+        "ES_URL": es_url,
+        "SOURCE_INDEX": index,
+        "API_KEY_B64": "bench",
+        "DEST_INDEX": dest,
+        "RELEASE_INFO_URLS": f"{es_url}/ms/release-info/win11,{es_url}/ms/release-info/win10",
+        "RELEASE_INFO_CACHE_TTL": "0",      # measure the scrape, every case
+        "SUPPORTED_BUILDS": ",".join(str(b) for b in fleet.WINDOWS_LATEST),
+        "MACOS_EOL_URL": f"{es_url}/eol/macos",
+        "MACOS_EOL_CACHE_TTL": "0",
+        # linux/pipeline.py
+        "ES_API_KEY": "bench",
+        "ES_INDEX": dest,
+        "SNAPSHOT": "",
+        "DIWA_BASE": f"{es_url}/diwa",
+        "DIWA_DISTRO": "ubuntu",
+        # keep the run metrics local
+        "METRICS_INDEX": "",
+        "METRICS_TEXTFILE": "",
+    }
+
+
+def run_case(platform: str, mode: str, compare_workers: int = 0) -> dict:
+    """Child side: one pipeline run in this process; env is already set by the parent."""
+    from compliance import aio, jsoncodec
+    from compliance.dag import run_dag
+    from compliance.metrics import RunMetrics
+    from compliance.platforms import load_platform
+
+    pipeline = load_platform(platform)
+    dest = os.environ["DEST_INDEX"]
+    metrics = RunMetrics(platform)
+    with tempfile.TemporaryDirectory(prefix=f"bench-{platform}-") as tmp:
+        if mode == "async":
+            with metrics.stage("pipeline") as st:
+                metrics.absorb(st, aio.run(pipeline.spec(dest), state_dir=tmp,
+                                           compare_workers=compare_workers))
+            ok = True
+        else:
+            if platform == "linux":
+                stages = pipeline.stages(dest, compare_workers=compare_workers)
+            else:
+                stages = pipeline.stages(dest, out_dir=tmp, compare_workers=compare_workers)
+            ok = run_dag(stages, metrics=metrics, verbose=False).ok
+    doc = metrics.to_doc()
+    doc["status"] = "ok" if ok else "failed"
+    doc["json_codec"] = jsoncodec.NAME
+    return doc
+
+
+def start_stub(latency_ms: float, bulk_us_per_doc: float):
+    parent, child = multiprocessing.Pipe()
+    proc = multiprocessing.Process(target=stub_es.serve, args=(0, latency_ms, bulk_us_per_doc, child),
+                                   daemon=True)
+    proc.start()
+    if not parent.poll(10):
+        proc.terminate()
+        raise RuntimeError("stub Elasticsearch did not start")
+    return proc, f"http://127.0.0.1:{parent.recv()}"
+
+
+def _fmt_rate(n: float) -> str:
+    return f"{n / 1000:.1f}k/s" if n >= 1000 else f"{n:.0f}/s"
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark each platform pipeline against a local stand-in.")
+    ap.add_argument("--sizes", default="10k,100k", help="fleet sizes in hosts, e.g. 10k,100k,1m")
+    ap.add_argument("--platforms", default=",".join(fleet.PLATFORMS))
+    ap.add_argument("--mode", choices=["async", "sync"], default="async")
+    ap.add_argument("--results-per-host", type=int, default=1, help="hits per host in the source index")
+    ap.add_argument("--latency-ms", type=float, default=0.0, help="stand-in latency per request")
+    ap.add_argument("--bulk-us-per-doc", type=float, default=0.0, help="stand-in _bulk cost per item")
+    ap.add_argument("--compare-workers", type=int, default=0, help="process-pool size for compare")
+    ap.add_argument("--codecs", default="",
+                    help="run every case once per compliance.jsoncodec backend, e.g. json,orjson "
+                         "(default: $JSON_CODEC / auto only)")
+    ap.add_argument("--out", default=str(REPO_ROOT / "bench_output.txt"))
+    ap.add_argument("--verbose", action="store_true", help="show the pipelines' own output")
+    ap.add_argument("--case", nargs=2, metavar=("PLATFORM", "MODE"), help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.case:
+        print(RESULT_TAG + json.dumps(run_case(*args.case, args.compare_workers)), flush=True)
+        return 0
+
+    sizes = [fleet.parse_size(s) for s in args.sizes.split(",") if s.strip()]
+    platforms = [p.strip().lower() for p in args.platforms.split(",") if p.strip()]
+    codecs = [c.strip().lower() for c in args.codecs.split(",") if c.strip()] or [None]
+    stub, es_url = start_stub(args.latency_ms, args.bulk_us_per_doc)
+    print(f"[INFO] stand-in at {es_url} (latency {args.latency_ms} ms, "
+          f"bulk {args.bulk_us_per_doc} µs/doc), mode={args.mode}")
+    if args.mode == "sync":
+        print("[INFO] sync mode: the Windows/macOS fetchers read at most 10000 hits in one request")
+
+    results = []
+    failures = 0
+    try:
+        for hosts in sizes:
+            for platform in platforms:
+                index = f"bench-{platform}-{hosts}" + (f"-x{args.results_per_host}"
+                                                       if args.results_per_host > 1 else "")
+                for codec in codecs:
+                    env = {**os.environ, **platform_env(platform, es_url, index, f"bench-out-{platform}")}
+                    if codec:
+                        env["JSON_CODEC"] = codec
+                    t0 = time.perf_counter()
+                    proc = subprocess.run(
+                        [sys.executable, "-m", "bench.run", "--case", platform, args.mode,
+                         "--compare-workers", str(args.compare_workers)],
+                        cwd=REPO_ROOT, env=env, capture_output=True, text=True,
+                    )
+                    wall = time.perf_counter() - t0
+                    if args.verbose:
+                        sys.stdout.write(proc.stdout)
+                    line = next((l for l in proc.stdout.splitlines() if l.startswith(RESULT_TAG)), None)
+                    if proc.returncode != 0 or line is None:
+                        failures += 1
+                        print(f"[ERROR] {platform} @ {hosts}: exit {proc.returncode}\n{proc.stderr[-2000:]}")
+                        continue
+                    doc = json.loads(line[len(RESULT_TAG):])
+                    rec = {
+                        "platform": platform, "mode": args.mode, "hosts": hosts,
+                        "hits": hosts * args.results_per_host,
+                        "compare_workers": args.compare_workers, "latency_ms": args.latency_ms, "bulk_us_per_doc": args.bulk_us_per_doc,
+                        "json_codec": doc.get("json_codec"),
+                        "status": doc["status"],
+                        "pipeline_seconds": doc["wall_seconds"],
+                        "process_seconds": round(wall, 3),
+                        "docs_shipped": doc["docs"],
+                        "hosts_per_sec": round(hosts / doc["wall_seconds"], 1) if doc["wall_seconds"] else 0.0,
+                        "peak_rss_mb": round(doc["peak_rss_bytes"] / 2**20, 1),
+                        "bytes_sent": doc["bytes_sent"],
+                        "stages": {n: s["seconds"] for n, s in doc["stages"].items()},
+                    }
+                    results.append(rec)
+                    print(f"[OK] {platform:<8} {hosts:>9,} hosts  {rec['json_codec'] or '':<6}  "
+                          f"{rec['pipeline_seconds']:8.2f}s  "
+                          f"{_fmt_rate(rec['hosts_per_sec']):>9}  shipped {rec['docs_shipped']:>9,}  "
+                          f"peak {rec['peak_rss_mb']:7.1f} MiB")
+    finally:
+        stub.terminate()
+        stub.join(5)
+
+    if results:
+        with open(args.out, "a", encoding="utf-8") as fh:
+            for rec in results:
+                fh.write(json.dumps(rec) + "\n")
+        print(f"[OK] appended {len(results)} result(s) to {args.out}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
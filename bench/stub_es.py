@@ -0,0 +1,424 @@
+# stub_es.py
+"""
+Local Elasticsearch stand-in for the benchmarks.
+
+Serves just what the pipelines call:
+  POST /<index>/_pit, DELETE /_pit           point-in-time open/close
+  GET|POST /<index>/_search, POST /_search   paging by `search_after` (PIT or not);
+                                             the compliance.shard script filter is honoured
+  POST /_bulk                                gzip / chunked NDJSON, every item 201
+  POST /<index>/_doc                         run-metrics docs
+  POST /_aliases, GET /_alias/<name>,        per-run partitions (compliance.partition):
+  GET /_cat/indices/<pattern>, POST          indices written by _bulk or created by PUT
+  /<index>[,...]/_refresh, PUT /<index>,     are remembered by name only; aliasing an
+  DELETE /<index>[,...]                      index that does not exist is a 404
+  GET|PUT /_index_template/<name>,           destination templates (compliance.templates);
+  POST /_index_template/_simulate_index/<i>, an index written by _bulk reports the mappings
+  GET /<index>/_mapping                      of the template that matches it
+plus the upstream baselines, so no internet is needed:
+  GET /ms/release-info[/win11|/win10]        Microsoft release-information tables (with an
+                                             ETag; If-None-Match gets a 304)
+  GET /eol/macos                             endoflife.date macOS product
+  GET /diwa/<slug>                           Diwa distribution news
+
+Source indices are named `bench-<platform>-<hosts>` (optionally `-x<results per
+host>`); their documents come from bench.fleet and are never stored. Bulk
+bodies are parsed and counted, not kept.
+
+For tests, `make_server(track_ids=True)` remembers every acknowledged `_id` per
+index (a repeated `create` then gets a 409, as from Elasticsearch) and
+`POST /_stub/faults` injects failures:
+  {"bulk_errors": 2}             the next 2 `_bulk` requests get a 503
+  {"bulk_truncated": 1}          the next `_bulk` request gets a 200 with a cut-off body
+  {"reject_ids": ["a", "b"]}     items with these `_id`s get a 400 mapping error
+  {"fail_paths": ["/ms/..."]}    GETs of these paths get a 503
+
+    python -m bench.stub_es --port 9201 --latency-ms 2 --bulk-us-per-doc 20
+"""
+import argparse
+import fnmatch
+import gzip
+import hashlib
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+from compliance.shard import Shard, in_shard
+
+from . import fleet
+
+INDEX_RE = re.compile(r"^bench-(windows|macos|linux)-(\d+)(?:-x(\d+))?$")
+
+
+class StubState:
+    def __init__(self, latency_ms: float = 0.0, bulk_us_per_doc: float = 0.0):
+        self.latency = latency_ms / 1000.0
+        self.bulk_per_doc = bulk_us_per_doc / 1e6
+        self.fleets = {}
+        self.pits = {}
+        self.indices = set()   # written by _bulk
+        self.aliases = {}      # alias -> {index, ...}
+        self.templates = {}    # name -> index template body
+        self.bulk_errors = 0   # next N _bulk requests answered 503
+        self.bulk_truncated = 0  # next N _bulk requests answered 200 with half a JSON body
+        self.reject_ids = set()
+        self.fail_paths = set()
+        self.acked = None      # index -> {_id, ...} with track_ids
+        self.counters = {"search": 0, "bulk": 0, "bulk_docs": 0, "bulk_bytes": 0, "docs": 0,
+                         "pages": 0, "pages_not_modified": 0}
+        self.lock = threading.Lock()
+
+    def fleet(self, index: str):
+        with self.lock:
+            if index not in self.fleets:
+                m = INDEX_RE.match(index)
+                if not m:
+                    return None
+                self.fleets[index] = fleet.Fleet(m.group(1), int(m.group(2)), int(m.group(3) or 1))
+            return self.fleets[index]
+
+    def bump(self, **kw):
+        with self.lock:
+            for k, v in kw.items():
+                self.counters[k] += v
+
+
+def _sort_values(i: int, with_shard_doc: bool) -> list:
+    return [fleet.timestamp_millis(i), i] if with_shard_doc else [fleet.timestamp_millis(i)]
+
+
+def _start_after(search_after) -> int:
+    # [ts, shard_doc] → shard_doc is the position; [ts] alone → invert the timestamp
+    if not search_after:
+        return 0
+    if len(search_after) > 1:
+        return int(search_after[1]) + 1
+    return (fleet.timestamp_millis(0) - int(search_after[0])) // 1000 + 1
+
+
+def _shard_params(query):
+    """(field, Shard) from a compliance.shard script filter anywhere in `query`, else None."""
+    if isinstance(query, dict):
+        script = query.get("script")
+        if isinstance(script, dict) and isinstance(script.get("script"), dict):
+            p = script["script"].get("params") or {}
+            if {"field", "n", "i"} <= set(p):
+                return p["field"], Shard(int(p["i"]), int(p["n"]))
+        for v in query.values():
+            found = _shard_params(v)
+            if found:
+                return found
+    elif isinstance(query, list):
+        for v in query:
+            found = _shard_params(v)
+            if found:
+                return found
+    return None
+
+
+def _field(doc: dict, dotted: str):
+    for part in dotted.split("."):
+        doc = doc.get(part) if isinstance(doc, dict) else None
+    return doc
+
+
+class Handler(BaseHTTPRequestHandler):
+    # replies are written in pieces (status, headers, body); keep them off the delayed-ACK path
+    disable_nagle_algorithm = True
+    protocol_version = "HTTP/1.1"
+    state: StubState = None  # set by make_server
+
+    def log_message(self, *args):
+        pass
+
+    # --- plumbing ---------------------------------------------------------
+
+    def _body(self) -> bytes:
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().split(b";")[0].strip() or b"0", 16)
+                if size == 0:
+                    self.rfile.readline()
+                    break
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+            raw = b"".join(chunks)
+        else:
+            raw = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if self.headers.get("Content-Encoding", "").lower() == "gzip":
+            raw = gzip.decompress(raw)
+        return raw
+
+    def _send(self, status: int, payload, content_type="application/json", headers=None):
+        data = payload if isinstance(payload, bytes) else (
+            payload.encode("utf-8") if isinstance(payload, str) else json.dumps(payload).encode("utf-8"))
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _route(self, method: str):
+        if self.state.latency:
+            time.sleep(self.state.latency)
+        url = urlsplit(self.path)
+        parts = [p for p in url.path.split("/") if p]
+        query = parse_qs(url.query)
+        body = self._body()
+
+        with self.state.lock:
+            failing = url.path in self.state.fail_paths
+        if failing:
+            return self._send(503, {"error": {"type": "stub_fault", "path": url.path}})
+        if parts[:2] == ["ms", "release-info"]:
+            family = parts[2] if len(parts) > 2 else None
+            page = fleet.ms_release_page(family)
+            etag = '"%s"' % hashlib.sha1(page.encode("utf-8")).hexdigest()[:16]
+            self.state.bump(pages=1)
+            if self.headers.get("If-None-Match") == etag:
+                self.state.bump(pages_not_modified=1)
+                return self._send(304, b"", headers={"ETag": etag})
+            return self._send(200, page, "text/html; charset=utf-8", headers={"ETag": etag})
+        if parts[:2] == ["eol", "macos"]:
+            return self._send(200, fleet.endoflife_macos())
+        if parts[:1] == ["diwa"] and len(parts) == 2:
+            return self._send(200, fleet.diwa_ubuntu() if parts[1] == "ubuntu" else
+                              json.dumps({"recent_related_news_and_releases": []}))
+
+        if parts == ["_pit"] and method == "DELETE":
+            pid = (json.loads(body or b"{}") or {}).get("id")
+            with self.state.lock:
+                self.state.pits.pop(pid, None)
+            return self._send(200, {"succeeded": True, "num_freed": 1})
+        if len(parts) == 2 and parts[1] == "_pit" and method == "POST":
+            if self.state.fleet(parts[0]) is None:
+                return self._send(404, {"error": {"type": "index_not_found_exception"}})
+            pid = f"pit-{parts[0]}-{time.monotonic_ns()}"
+            with self.state.lock:
+                self.state.pits[pid] = parts[0]
+            return self._send(200, {"id": pid})
+        if parts == ["_aliases"] and method == "POST":
+            return self._aliases(json.loads(body or b"{}"))
+        if len(parts) == 2 and parts[0] == "_alias" and method == "GET":
+            with self.state.lock:
+                held = sorted(self.state.aliases.get(parts[1], ()))
+            if not held:
+                return self._send(404, {"error": "alias [%s] missing" % parts[1], "status": 404})
+            return self._send(200, {i: {"aliases": {parts[1]: {}}} for i in held})
+        if parts[:2] == ["_cat", "indices"] and method == "GET":
+            pattern = parts[2] if len(parts) > 2 else "*"
+            with self.state.lock:
+                names = sorted(i for i in self.state.indices if fnmatch.fnmatchcase(i, pattern))
+            return self._send(200, [{"index": i} for i in names])
+        if len(parts) == 2 and parts[1] == "_refresh":
+            with self.state.lock:
+                known = all(i in self.state.indices for i in parts[0].split(","))
+            ok = known or query.get("ignore_unavailable") == ["true"]
+            return self._send(200 if ok else 404, {"_shards": {"failed": 0}})
+        if parts[:1] == ["_index_template"]:
+            return self._index_template(method, parts[1:], body)
+        if len(parts) == 2 and parts[1] == "_mapping" and method == "GET":
+            with self.state.lock:
+                known = parts[0] in self.state.indices
+            tpl = self._template_for(parts[0]) if known else None
+            if not known:
+                return self._send(404, {"error": {"type": "index_not_found_exception"}, "status": 404})
+            return self._send(200, {parts[0]: {"mappings": (tpl or {}).get("template", {}).get("mappings", {})}})
+        if len(parts) == 1 and method == "PUT" and not parts[0].startswith("_"):
+            with self.state.lock:
+                exists = parts[0] in self.state.indices
+                self.state.indices.add(parts[0])
+            if exists:
+                return self._send(400, {"error": {"type": "resource_already_exists_exception",
+                                                  "index": parts[0]}, "status": 400})
+            return self._send(200, {"acknowledged": True, "index": parts[0]})
+        if len(parts) == 1 and method == "DELETE":
+            with self.state.lock:
+                for i in parts[0].split(","):
+                    self.state.indices.discard(i)
+                    for held in self.state.aliases.values():
+                        held.discard(i)
+            return self._send(200, {"acknowledged": True})
+        if parts[-1:] == ["_search"]:
+            return self._search(parts, query, body)
+        if parts == ["_bulk"]:
+            return self._bulk(body)
+        if len(parts) == 2 and parts[1] == "_doc" and method == "POST":
+            self.state.bump(docs=1)
+            return self._send(201, {"result": "created", "_index": parts[0]})
+        return self._send(404, {"error": {"type": "no_handler", "path": url.path}})
+
+    # --- endpoints --------------------------------------------------------
+
+    def _search(self, parts, query, body):
+        req = json.loads(body) if body else {}
+        pit = req.get("pit")
+        if pit:
+            with self.state.lock:
+                index = self.state.pits.get(pit.get("id"))
+            if index is None:
+                return self._send(404, {"error": {"type": "search_context_missing_exception"}})
+        else:
+            index = parts[0] if len(parts) == 2 else None
+        f = self.state.fleet(index) if index else None
+        if f is None:
+            return self._send(404, {"error": {"type": "index_not_found_exception", "index": index}})
+
+        size = int(req.get("size") or (query.get("size") or ["10"])[0])
+        start = _start_after(req.get("search_after"))
+        shard = _shard_params(req.get("query"))
+        hits = []
+        i = start
+        while i < f.total and len(hits) < size:
+            doc = f.doc(i)
+            if shard is None or in_shard(str(_field(doc, shard[0])), shard[1]):
+                hits.append({"_index": index, "_source": doc, "sort": _sort_values(i, bool(pit))})
+            i += 1
+        self.state.bump(search=1)
+        out = {"took": 1, "timed_out": False, "hits": {"hits": hits}}
+        if pit:
+            out["pit_id"] = pit["id"]
+        return self._send(200, out)
+
+    def _aliases(self, req: dict):
+        with self.state.lock:
+            missing = sorted({args["index"] for action in req.get("actions") or []
+                              for op, args in action.items() if op == "add"} - self.state.indices)
+            if missing:
+                return self._send(404, {"error": {"type": "index_not_found_exception", "index": missing[0]},
+                                        "status": 404})
+            for action in req.get("actions") or []:
+                (op, args), = action.items()
+                held = self.state.aliases.setdefault(args["alias"], set())
+                if op == "add":
+                    held.add(args["index"])
+                elif op == "remove":
+                    held.discard(args["index"])
+        return self._send(200, {"acknowledged": True})
+
+    def _template_for(self, index: str):
+        with self.state.lock:
+            matching = [t for t in self.state.templates.values()
+                        if any(fnmatch.fnmatchcase(index, p) for p in t.get("index_patterns") or [])]
+        return max(matching, key=lambda t: t.get("priority", 0), default=None)
+
+    def _index_template(self, method: str, rest: list, body: bytes):
+        if rest[:1] == ["_simulate_index"] and len(rest) == 2:
+            tpl = self._template_for(rest[1])
+            return self._send(200, {"template": (tpl or {}).get("template", {}), "overlapping": []})
+        if len(rest) != 1:
+            return self._send(400, {"error": {"type": "illegal_argument_exception"}})
+        if method == "PUT":
+            with self.state.lock:
+                self.state.templates[rest[0]] = json.loads(body)
+            return self._send(200, {"acknowledged": True})
+        with self.state.lock:
+            tpl = self.state.templates.get(rest[0])
+        if tpl is None:
+            return self._send(404, {"error": {"type": "resource_not_found_exception"}, "status": 404})
+        return self._send(200, {"index_templates": [{"name": rest[0], "index_template": tpl}]})
+
+    def _bulk(self, body: bytes):
+        with self.state.lock:
+            if self.state.bulk_errors:
+                self.state.bulk_errors -= 1
+                return self._send(503, {"error": {"type": "unavailable_shards_exception"}, "status": 503})
+            if self.state.bulk_truncated:
+                self.state.bulk_truncated -= 1
+                return self._send(200, b'{"took": 1, "errors": false, "ite')
+        lines = body.split(b"\n")
+        items = []
+        written = set()
+        errors = False
+        with self.state.lock:
+            for i in range(0, len(lines) - 1, 2):
+                if not lines[i]:
+                    continue
+                action = json.loads(lines[i])
+                op, meta = next(iter(action.items()))
+                index, _id = meta.get("_index"), meta.get("_id")
+                res = {"_index": index, "_id": _id, "status": 201, "result": "created"}
+                acked = self.state.acked.setdefault(index, set()) if self.state.acked is not None else None
+                if _id in self.state.reject_ids:
+                    res = {"_index": index, "_id": _id, "status": 400,
+                           "error": {"type": "mapper_parsing_exception", "reason": "failed to parse"}}
+                elif op == "create" and acked is not None and _id in acked:
+                    res = {"_index": index, "_id": _id, "status": 409,
+                           "error": {"type": "version_conflict_engine_exception"}}
+                else:
+                    written.add(index)
+                    if acked is not None:
+                        acked.add(_id)
+                errors = errors or "error" in res
+                items.append({op: res})
+            self.state.indices.update(written)
+        if self.state.bulk_per_doc:
+            time.sleep(self.state.bulk_per_doc * len(items))
+        self.state.bump(bulk=1, bulk_docs=len(items), bulk_bytes=len(body))
+        return self._send(200, {"took": 1, "errors": errors, "items": items})
+
+    def _faults(self, req: dict):
+        with self.state.lock:
+            self.state.bulk_errors = int(req.get("bulk_errors", self.state.bulk_errors))
+            self.state.bulk_truncated = int(req.get("bulk_truncated", self.state.bulk_truncated))
+            if "reject_ids" in req:
+                self.state.reject_ids = set(req["reject_ids"])
+            if "fail_paths" in req:
+                self.state.fail_paths = set(req["fail_paths"])
+        return self._send(200, {"acknowledged": True})
+
+    def do_GET(self):
+        if self.path == "/_stub/counters":
+            with self.state.lock:
+                return self._send(200, dict(self.state.counters))
+        self._route("GET")
+
+    def do_POST(self):
+        if self.path == "/_stub/faults":
+            return self._faults(json.loads(self._body() or b"{}"))
+        self._route("POST")
+
+    def do_PUT(self):
+        self._route("PUT")
+
+    def do_DELETE(self):
+        self._route("DELETE")
+
+
+def make_server(host="127.0.0.1", port=0, latency_ms=0.0, bulk_us_per_doc=0.0,
+                track_ids=False) -> ThreadingHTTPServer:
+    state = StubState(latency_ms, bulk_us_per_doc)
+    if track_ids:
+        state.acked = {}
+    handler = type("BoundHandler", (Handler,), {"state": state})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def serve(port: int, latency_ms: float, bulk_us_per_doc: float, ready=None) -> None:
+    """Entry point for a separate process; `ready` (a Connection) receives the bound port."""
+    server = make_server(port=port, latency_ms=latency_ms, bulk_us_per_doc=bulk_us_per_doc)
+    if ready is not None:
+        ready.send(server.server_address[1])
+    server.serve_forever()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Local Elasticsearch stand-in for benchmarks.")
+    ap.add_argument("--port", type=int, default=9201)
+    ap.add_argument("--latency-ms", type=float, default=0.0, help="added to every request")
+    ap.add_argument("--bulk-us-per-doc", type=float, default=0.0, help="extra _bulk time per item")
+    args = ap.parse_args()
+    print(f"[INFO] stub Elasticsearch on http://127.0.0.1:{args.port}")
+    serve(args.port, args.latency_ms, args.bulk_us_per_doc)
+
+
+if __name__ == "__main__":
+    main()
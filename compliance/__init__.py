@@ -0,0 +1,7 @@
+"""
+Shared plumbing for the Windows / macOS / Linux compliance scripts.
+
+The platform folders stay runnable on their own (``python main.py`` from inside
+the folder); their ``config.py`` puts the repo root on ``sys.path`` so the
+modules here can be imported from any of them.
+"""
@@ -0,0 +1,304 @@
+# aio.py
+"""
+asyncio execution mode: fetch, compare and ship overlap.
+
+    fetch  ──page──▶  compare  ──batch──▶  ship (x SHIP_CONCURRENCY)
+
+- The fetcher walks the source index with PIT + search_after and keeps up to
+  `prefetch_pages` pages queued, so page N+1 is in flight while page N is compared.
+- With several sources (compliance.sources) every cluster is walked at once and
+  their rows are merged newest-per-host before compare starts, since a host's
+  newest record may come from any of them.
+- The baseline is loaded at the same time as the first page.
+- Compare runs on the event loop (or, with `compare_workers` > 1, each page is
+  evaluated in a compliance.parallel process pool); bulk batches are shipped by
+  worker tasks while the next batch is being built.
+- With an index directory (compliance.hostindex) every compared row is also
+  filed under its OS line, and the index is replaced once the run is done.
+- Every compared row is counted into the run's compliance.rollup, which is
+  shipped as one summary doc at the end (and returned in the summary).
+- With PARTITION_MODE=run (compliance.partition) the run is written into its
+  own index with `create` ops, and `<dest>-latest` moves to it once it is done.
+- With a lookup directory (compliance.lookup) every compared host's result is
+  also written to the snapshot the local lookup service serves.
+- The destination index template (compliance.templates) is checked before the
+  first write.
+- Blocking `requests` calls run in threads (`asyncio.to_thread`); a semaphore
+  caps how many HTTP requests are in flight at once (`HTTP_CONCURRENCY`).
+"""
+import asyncio
+import dataclasses
+import os
+import time
+from typing import Optional
+
+from .bulk import BulkEngine, BulkStats, BulkFlushError
+from .hostindex import HOST_INDEX_DIR, IndexWriter, indexes
+from .lookup import LOOKUP_DIR, SnapshotWriter
+from .partition import for_run
+from .parallel import COMPARE_CHUNK_SIZE, COMPARE_WORKERS, ComparePool
+from .pipeline import PipelineSpec
+from .rollup import Rollup
+from .search import PagedSearch
+from .sources import check_reports, fetch_timed, merge_newest, paged_fetcher
+from .templates import ensure as ensure_template
+
+HTTP_CONCURRENCY = int(os.getenv("HTTP_CONCURRENCY", "4"))
+SHIP_CONCURRENCY = int(os.getenv("SHIP_CONCURRENCY", "2"))
+FETCH_PAGE_SIZE = int(os.getenv("FETCH_PAGE_SIZE", "1000"))
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "500"))
+
+_DONE = object()
+
+
+def _timed(fn, phases: dict, phase: str):
+    def run(*args):
+        t0 = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            phases[phase] += time.perf_counter() - t0
+    return run
+
+
+async def _fetch(search: PagedSearch, pages: asyncio.Queue, http: asyncio.Semaphore, phases: dict) -> None:
+    next_page = _timed(search.next_page, phases, "fetch")
+    try:
+        while True:
+            async with http:
+                hits = await asyncio.to_thread(next_page)
+            if hits:
+                await pages.put(hits)
+            if search.done or not hits:
+                break
+    finally:
+        async with http:
+            await asyncio.to_thread(search.close)
+        await pages.put(_DONE)
+
+
+async def _fan_in(spec: PipelineSpec, pages: asyncio.Queue, http: asyncio.Semaphore, phases: dict,
+                  page_size: int, use_pit: bool, reports: list) -> None:
+    """Fetch every source concurrently, merge newest-per-host, queue the rows in page-sized lists."""
+    fetch = paged_fetcher(spec.rows_from_hits, query=spec.query, source_fields=spec.source_fields,
+                          page_size=page_size, use_pit=use_pit)
+
+    async def one(source):
+        async with http:
+            return await asyncio.to_thread(fetch_timed, source, fetch)
+
+    t0 = time.perf_counter()
+    try:
+        results = await asyncio.gather(*(one(s) for s in spec.sources))
+        reports.extend(r for _, r in results)
+        check_reports(reports)
+        rows = merge_newest((rows for rows, _ in results), spec.row_key)
+        phases["fetch"] += time.perf_counter() - t0
+        print(f"[OK] {spec.name}: merged {sum(r.rows for r in reports)} row(s) from "
+              f"{len(reports)} source(s) into {len(rows)} host(s)")
+        for start in range(0, len(rows), page_size):
+            await pages.put(rows[start:start + page_size])
+    finally:
+        await pages.put(_DONE)
+
+
+async def _compare(spec: PipelineSpec, baseline_task: asyncio.Task, pages: asyncio.Queue,
+                   batches: asyncio.Queue, batch_size: int, counts: dict, n_shippers: int,
+                   compare_workers: int, pre_rows: bool = False,
+                   index: Optional[IndexWriter] = None, rollup: Optional[Rollup] = None,
+                   lookup: Optional[SnapshotWriter] = None) -> None:
+    pool = None
+    seen = set()
+    actions, docs = [], []
+    try:
+        baseline = await baseline_task
+        if compare_workers > 1:
+            pool = ComparePool(spec.evaluate, baseline, workers=compare_workers,
+                               chunk_size=min(COMPARE_CHUNK_SIZE, max(1, batch_size)))
+        while True:
+            hits = await pages.get()
+            if hits is _DONE:
+                break
+            t0 = time.perf_counter()
+            rows = hits if pre_rows else spec.rows_from_hits(hits, seen)
+            if index is not None:
+                index.add(rows)
+            if pool is not None:
+                records = await pool.map_async(list(rows))
+            else:
+                records = (spec.evaluate(row, baseline) for row in rows)
+            for row, record in zip(rows, records):
+                counts["rows"] += 1
+                if rollup is not None:
+                    rollup.add(row, record, baseline)
+                if lookup is not None:
+                    lookup.add(row, record, baseline)
+                if record is None:
+                    continue
+                item = spec.builder(record)
+                if item is None:
+                    continue
+                actions.append(item[0])
+                docs.append(item[1])
+                if len(actions) >= batch_size:
+                    counts["compare"] += time.perf_counter() - t0
+                    await batches.put((actions, docs))
+                    actions, docs = [], []
+                    t0 = time.perf_counter()
+            counts["compare"] += time.perf_counter() - t0
+            # give the shippers a turn between pages
+            await asyncio.sleep(0)
+        if actions:
+            await batches.put((actions, docs))
+    finally:
+        if pool is not None:
+            await asyncio.to_thread(pool.close)
+        for _ in range(n_shippers):
+            await batches.put(_DONE)
+
+
+async def _ship(spec: PipelineSpec, engine: BulkEngine, batches: asyncio.Queue, http: asyncio.Semaphore,
+                errors: list) -> BulkStats:
+    stats = BulkStats()
+    while True:
+        batch = await batches.get()
+        if batch is _DONE:
+            return stats
+        try:
+            async with http:
+                rejected = await asyncio.to_thread(engine.ship_batch, batch[0], batch[1], stats)
+            failed = {i for i, _ in rejected}
+        except BulkFlushError as e:
+            # ship_batch has dead-lettered the batch; keep draining so compare never blocks
+            errors.append(e)
+            failed = set(range(len(batch[0])))
+        if spec.on_batch is not None:
+            spec.on_batch(batch[0], failed)
+
+
+async def run_async(
+    spec: PipelineSpec,
+    *,
+    http_concurrency: int = HTTP_CONCURRENCY,
+    ship_concurrency: int = SHIP_CONCURRENCY,
+    page_size: int = FETCH_PAGE_SIZE,
+    batch_size: int = BULK_BATCH_SIZE,
+    prefetch_pages: int = 2,
+    use_pit: bool = True,
+    state_dir: Optional[str] = None,
+    refresh: Optional[str] = None,
+    compare_workers: int = COMPARE_WORKERS,
+    index_dir: Optional[str] = HOST_INDEX_DIR,
+    ship_rollup: bool = True,
+    lookup_dir: Optional[str] = LOOKUP_DIR,
+    partition: bool = True,
+) -> dict:
+    """
+    Run one platform's fetch → compare → ship with the stages overlapped.
+    index_dir: also keep the compliance.hostindex for later `reevaluate` runs.
+    ship_rollup: False leaves the rollup doc in the summary only (sharded runs).
+    lookup_dir: also write the compliance.lookup snapshot of this run's results.
+    partition: False ships into the destination index even with PARTITION_MODE=run.
+    state_dir: dead letters of failed or rejected batches (replayed first by the next run);
+    default `spec.ship_state()`, the same directory the platform's sync shipper uses.
+    """
+    t0 = time.perf_counter()
+    part = for_run(spec.es_url, spec.api_key_b64, spec.dest_index, spec.settings) if partition else None
+    if part is not None:
+        spec = dataclasses.replace(spec, builder=part.wrap(spec.builder))
+    http = asyncio.Semaphore(max(1, http_concurrency))
+    phases = {"fetch": 0.0, "baseline": 0.0}
+    n_shippers = max(1, ship_concurrency)
+    pages: asyncio.Queue = asyncio.Queue(maxsize=max(1, prefetch_pages))
+    batches: asyncio.Queue = asyncio.Queue(maxsize=n_shippers)
+
+    search = PagedSearch(spec.es_url, spec.source_index, spec.api_key_b64,
+                         query=spec.query, source=spec.source_fields,
+                         page_size=page_size, use_pit=use_pit)
+    engine = BulkEngine(spec.es_url, spec.api_key_b64, batch_size=batch_size,
+                        refresh=refresh, state_dir=state_dir or spec.ship_state())
+
+    async def _baseline():
+        async with http:
+            return await asyncio.to_thread(_timed(spec.load_baseline, phases, "baseline"))
+
+    # The destination template has to be in place before anything creates the index
+    await asyncio.to_thread(ensure_template, spec)
+    # Dead letters from an earlier run go out first
+    replay = BulkStats()
+    await asyncio.to_thread(engine.replay_dead_letters, replay)
+
+    counts = {"rows": 0, "compare": 0.0}
+    errors = []
+    reports = []
+    fan_in = bool(spec.sources) and len(spec.sources) > 1
+    index = IndexWriter(spec, index_dir) if index_dir and indexes(spec) else None
+    rollup = Rollup.of(spec) if spec.rollup_of else None
+    lookup = SnapshotWriter(spec, lookup_dir) if lookup_dir and spec.rollup_of else None
+    baseline_task = asyncio.create_task(_baseline())
+    shippers = [asyncio.create_task(_ship(spec, engine, batches, http, errors)) for _ in range(n_shippers)]
+    try:
+        await asyncio.gather(
+            _fan_in(spec, pages, http, phases, page_size, use_pit, reports) if fan_in
+            else _fetch(search, pages, http, phases),
+            _compare(spec, baseline_task, pages, batches, batch_size, counts, n_shippers,
+                     compare_workers, pre_rows=fan_in, index=index, rollup=rollup, lookup=lookup),
+        )
+    except BaseException:
+        if lookup is not None:
+            lookup.abort()
+        raise
+    if lookup is not None:
+        # the snapshot reflects what was compared, shipped or not
+        await asyncio.to_thread(lookup.commit)
+    stats = replay
+    for s in await asyncio.gather(*shippers):
+        stats.merge(s)
+    stats.seconds = time.perf_counter() - t0
+    if errors:
+        print(f"[ERROR] {spec.name}: {len(errors)} batch(es) dead-lettered after retries")
+        raise errors[0]
+    await asyncio.to_thread(engine.refresh_written)
+    if part is not None:
+        async with http:
+            await asyncio.to_thread(part.commit, stats)
+    if index is not None:
+        await asyncio.to_thread(index.commit, baseline_task.result())
+    if rollup is not None and ship_rollup:
+        async with http:
+            await asyncio.to_thread(rollup.ship, spec, engine)
+
+    if fan_in:
+        search.pages = sum(r.pages for r in reports)
+        search.hits = sum(r.hits for r in reports)
+    summary = {
+        "platform": spec.name,
+        "pages": search.pages,
+        "hits": search.hits,
+        "rows": counts["rows"],
+        "seconds": round(stats.seconds, 3),
+        # busy time per phase; they overlap, so the sum exceeds `seconds`
+        "phases": {
+            "fetch": round(phases["fetch"], 4),
+            "baseline": round(phases["baseline"], 4),
+            "compare": round(counts["compare"], 4),
+            "serialize": round(stats.encode_seconds, 4),
+            "ship": round(stats.post_seconds, 4),
+        },
+        "bulk": stats.as_dict(),
+    }
+    if rollup is not None:
+        summary["rollup"] = rollup.doc()
+    if part is not None:
+        summary["partition"] = part.index
+    if reports:
+        summary["sources"] = [r.as_dict() for r in reports]
+    print(f"[DONE] {spec.name}: {search.hits} hit(s) in {search.pages} page(s), "
+          f"{counts['rows']} host(s), shipped {stats.docs} doc(s) in {stats.seconds:.2f}s "
+          f"(failures: {stats.failed})")
+    return summary
+
+
+def run(spec: PipelineSpec, **kwargs) -> dict:
+    """Blocking wrapper around `run_async` for the platform entry points."""
+    return asyncio.run(run_async(spec, **kwargs))
@@ -0,0 +1,40 @@
+"""
+Shared Elasticsearch bulk engine.
+
+    engine = BulkEngine(es_url, api_key_b64, state_dir=...)
+    stats = engine.ship(records, builder, key=...)
+
+`records` is any iterable, `builder` turns one record into an (action, doc)
+pair (see `builders`), and the engine takes care of batching, retries,
+gzip, dead letters, checkpoints and the returned `BulkStats`.
+"""
+from .engine import BulkEngine, BulkStats, BulkFlushError
+from .state import (
+    STATE_DIRNAME,
+    load_checkpoint,
+    save_checkpoint,
+    clear_checkpoint,
+    write_dead_letters,
+    claim_dead_letters,
+    release_claim,
+)
+from .builders import AgentReportBuilder, RunSnapshotBuilder, LinuxHostBuilder, iter_json_dir
+from .shipper import ship_dir_to_elastic
+
+__all__ = [
+    "BulkEngine",
+    "BulkStats",
+    "BulkFlushError",
+    "STATE_DIRNAME",
+    "load_checkpoint",
+    "save_checkpoint",
+    "clear_checkpoint",
+    "write_dead_letters",
+    "claim_dead_letters",
+    "release_claim",
+    "AgentReportBuilder",
+    "RunSnapshotBuilder",
+    "LinuxHostBuilder",
+    "iter_json_dir",
+    "ship_dir_to_elastic",
+]
@@ -0,0 +1,134 @@
+# builders.py
+"""
+Document builders: one per platform record shape.
+
+A builder is a callable `record -> (action, doc)` or `None` to skip the record.
+"""
+import os
+import re
+from datetime import datetime, timezone
+from typing import Iterable, Iterator, Optional, Tuple
+
+from .. import jsoncodec
+
+
+def _sanitize(name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", name or "unknown")
+
+
+def _iso_now() -> str:
+    return datetime.now(timezone.utc).replace(microsecond=0).isoformat().replace("+00:00", "Z")
+
+
+def _as_dict(doc) -> dict:
+    """compliance.records types (straight from the compare step) → plain dict."""
+    return doc if isinstance(doc, dict) else doc.as_dict()
+
+
+def iter_json_dir(directory: str) -> Iterator[Tuple[str, dict]]:
+    """Yield (filename, doc) for every `*.json` object in `directory`, sorted by filename."""
+    files = sorted(f for f in os.listdir(directory) if f.lower().endswith(".json"))
+    for fname in files:
+        fpath = os.path.join(directory, fname)
+        try:
+            with open(fpath, "rb") as fh:
+                doc = jsoncodec.load(fh)
+        except Exception as e:
+            print(f"[WARN] Skipping {fname}: cannot parse JSON ({e})")
+            continue
+        if not isinstance(doc, dict):
+            print(f"[WARN] Skipping {fname}: root is not a JSON object")
+            continue
+        yield fname, doc
+
+
+class AgentReportBuilder:
+    """
+    Windows / macOS per-agent report files, record = (filename, doc); doc may be
+    a compliance.records result.
+
+    - Adds `ingested_at` (UTC ISO8601) and `source_file` if they don't exist.
+    - Uses `_id` from `id_field` when present; otherwise falls back to filename (without .json) if enabled.
+    """
+
+    def __init__(self, dest_index: str, *, id_field: Optional[str] = "agent_name",
+                 use_filename_as_fallback_id: bool = True, ingested_at: Optional[str] = None):
+        self.dest_index = dest_index
+        self.id_field = id_field
+        self.use_filename_as_fallback_id = use_filename_as_fallback_id
+        self.ingested_at = ingested_at or datetime.now(timezone.utc).isoformat()
+
+    def __call__(self, record):
+        fname, doc = record
+        doc = _as_dict(doc)
+        doc.setdefault("ingested_at", self.ingested_at)
+        doc.setdefault("source_file", fname)
+        doc.setdefault("@timestamp", doc.get("checked_at") or doc.get("ingested_at"))
+
+        _id = None
+        if self.id_field:
+            _id = doc.get(self.id_field)
+        if not _id and self.use_filename_as_fallback_id:
+            _id = os.path.splitext(fname)[0]
+
+        meta = {"index": {"_index": self.dest_index}}
+        if _id:
+            meta["index"]["_id"] = str(_id)
+        return meta, doc
+
+
+class RunSnapshotBuilder:
+    """
+    Windows per-run snapshot docs, record = (filename, doc).
+    Auto-generated _id so each run creates separate docs; agents outside
+    `allowed_agents` (stale files from previous runs) are skipped.
+    """
+
+    def __init__(self, dest_index: str, allowed_agents: Optional[Iterable[str]] = None):
+        self.dest_index = dest_index
+        self.allowed = None
+        if allowed_agents is not None:
+            self.allowed = {_sanitize(a) for a in allowed_agents if a}
+
+    def __call__(self, record):
+        fname, doc = record
+        doc = _as_dict(doc)
+        if self.allowed is not None:
+            if os.path.splitext(fname)[0] not in self.allowed:
+                return None
+            # Extra guard: if the payload has agent_name and it's not allowed, skip
+            if _sanitize(doc.get("agent_name")) not in self.allowed:
+                return None
+
+        # Ensure @timestamp for Discover
+        if "@timestamp" not in doc:
+            ts = doc.get("timestamp")
+            doc["@timestamp"] = ts if isinstance(ts, str) and ts else _iso_now()
+        return {"index": {"_index": self.dest_index}}, doc
+
+
+class LinuxHostBuilder:
+    """
+    Linux comparator rows, record = LinuxResult or {"id", "os_name", "current_version", "latest_version"}.
+    ECS-ish doc with a deterministic _id so re-running upserts the same host+current_version.
+    """
+
+    def __init__(self, dest_index: str, now: Optional[str] = None):
+        self.dest_index = dest_index
+        self.now = now or _iso_now()
+
+    def __call__(self, r):
+        host_id = r.get("id")
+        cur = r.get("current_version")
+        doc = {
+            "@timestamp": self.now,
+            "status": "out_of_date",
+            "source": "comparator",
+            "host": {"id": host_id},
+            "os": {
+                "name": r.get("os_name"),
+                "version": cur,
+                "expected": r.get("latest_version"),   # custom field alongside os.version
+            },
+        }
+        return {"index": {"_index": self.dest_index, "_id": f"{host_id}-{cur}"}}, doc
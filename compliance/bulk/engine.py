@@ -0,0 +1,408 @@
+# engine.py
+import os
+import time
+import zlib
+from dataclasses import dataclass, asdict
+from datetime import datetime, timezone
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+import requests
+
+from .. import jsoncodec
+from ..http import auth_headers, count_sent, get_session
+from .state import (
+    load_checkpoint,
+    save_checkpoint,
+    clear_checkpoint,
+    write_dead_letters,
+    claim_dead_letters,
+    release_claim,
+)
+
+# (action, doc) pair as produced by a document builder
+BulkItem = Tuple[dict, dict]
+
+# NDJSON bytes serialized (and gzip'd) before they are handed to the socket
+BULK_STREAM_CHUNK = int(os.getenv("BULK_STREAM_CHUNK", str(64 * 1024)))
+
+
+class BulkFlushError(RuntimeError):
+    """A bulk request still failed after all retries (its items are dead-lettered)."""
+
+
+@dataclass
+class BulkStats:
+    docs: int = 0               # items sent (acknowledged or rejected per item)
+    failed: int = 0             # items Elasticsearch rejected
+    existing: int = 0           # `create` items already there (an earlier attempt of the batch landed)
+    dead_lettered: int = 0      # items written to the dead-letter file
+    replayed: int = 0           # dead letters from earlier runs sent this run
+    skipped: int = 0            # records skipped by the builder or by the checkpoint
+    batches: int = 0
+    retries: int = 0
+    bytes_raw: int = 0          # NDJSON bytes before compression
+    bytes_sent: int = 0         # request body bytes on the wire
+    bytes_received: int = 0
+    took_ms: int = 0            # sum of Elasticsearch `took`
+    encode_seconds: float = 0.0  # time spent serializing NDJSON (+ gzip)
+    post_seconds: float = 0.0   # time spent in HTTP round trips, retries included
+    seconds: float = 0.0        # wall time spent in ship()
+
+    @property
+    def docs_per_sec(self) -> float:
+        return self.docs / self.seconds if self.seconds else 0.0
+
+    def merge(self, other: "BulkStats") -> "BulkStats":
+        """Add another worker's counters into this one (wall time is not summed)."""
+        for name in self.__dataclass_fields__:
+            if name != "seconds":
+                setattr(self, name, getattr(self, name) + getattr(other, name))
+        return self
+
+    def as_dict(self) -> dict:
+        d = asdict(self)
+        d["docs_per_sec"] = round(self.docs_per_sec, 1)
+        for k in ("encode_seconds", "post_seconds", "seconds"):
+            d[k] = round(d[k], 4)
+        return d
+
+
+def _refresh_param(refresh) -> Optional[str]:
+    if refresh is None:
+        return None
+    return "true" if refresh is True else "false" if refresh is False else str(refresh)
+
+
+class BulkEngine:
+    """
+    Batches (action, doc) items into NDJSON `_bulk` requests.
+
+    - Retries 429/5xx and connection errors with exponential backoff.
+    - Streams request bodies: each attempt serializes the batch into `chunk_size` pieces that
+      go out with chunked transfer encoding as they are made, so no full NDJSON string or byte
+      copy of the batch is built and serializing overlaps sending.
+    - Gzips request bodies (`compress=True`), Elasticsearch decompresses them natively.
+    - `refresh="wait_for"` / True is not sent with every batch (each one would wait for, or
+      force, a refresh of its own); the written indices are refreshed once when `ship()` is
+      done, or when the caller of `ship_batch()` calls `refresh_written()`.
+    - With a `state_dir`, rejected items and batches that exhaust their retries go to a
+      dead-letter file that is replayed first on the next `ship()`, and (when `ship()` gets
+      a `key`) the last acknowledged record is checkpointed so a rerun resumes after it.
+    """
+
+    def __init__(
+        self,
+        es_url: str,
+        api_key_b64: Optional[str] = None,
+        *,
+        batch_size: int = 500,
+        refresh: Optional[str] = None,          # e.g., "wait_for" | True | False | None
+        max_retries: int = 3,
+        retry_backoff_sec: float = 1.0,
+        compress: bool = True,
+        timeout: float = 120,
+        state_dir: Optional[str] = None,
+        session: Optional[requests.Session] = None,
+        chunk_size: int = BULK_STREAM_CHUNK,
+    ):
+        self.es_url = es_url.rstrip("/")
+        self.bulk_url = f"{self.es_url}/_bulk"
+        self.auth = auth_headers(api_key_b64)
+        self.headers = {"Content-Type": "application/x-ndjson", **self.auth}
+        if compress:
+            self.headers["Content-Encoding"] = "gzip"
+        self.params = {}
+        self.refresh = _refresh_param(refresh) in ("true", "wait_for")
+        self.written = set()    # indices with acknowledged items since the last refresh_written()
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.retry_backoff_sec = retry_backoff_sec
+        self.compress = compress
+        self.chunk_size = max(1, chunk_size)
+        self.timeout = timeout
+        self.state_dir = os.path.abspath(state_dir) if state_dir else None
+        self.session = session or get_session()
+
+    # --- one request ------------------------------------------------------
+
+    def _stream(self, actions: List[dict], docs: List[dict], stats: BulkStats, sent: list,
+                count_raw: bool = True) -> Iterator[bytes]:
+        """
+        One attempt's request body, made while it is sent: NDJSON (gzip'd) in pieces of about
+        `chunk_size` bytes. `sent[0]` accumulates the bytes handed out.
+        """
+        gz = zlib.compressobj(1, zlib.DEFLATED, 31) if self.compress else None  # 31: gzip container
+        buf = bytearray()
+        dumps = jsoncodec.dumps
+        t0 = time.perf_counter()
+
+        def piece(final: bool) -> bytes:
+            if count_raw:
+                stats.bytes_raw += len(buf)
+            if gz is None:
+                out = bytes(buf)
+            else:
+                out = gz.compress(buf) + (gz.flush() if final else b"")
+            buf.clear()
+            return out
+
+        for meta, doc in zip(actions, docs):
+            buf += dumps(meta)
+            buf += b"\n"
+            buf += dumps(doc)
+            buf += b"\n"
+            if len(buf) >= self.chunk_size:
+                out = piece(False)
+                if out:   # an empty chunk would end the chunked body early
+                    stats.encode_seconds += time.perf_counter() - t0
+                    sent[0] += len(out)
+                    yield out
+                    t0 = time.perf_counter()
+        out = piece(True)
+        stats.encode_seconds += time.perf_counter() - t0
+        if out:
+            sent[0] += len(out)
+            yield out
+
+    def flush(self, actions: List[dict], docs: List[dict], stats: BulkStats) -> List[Tuple[int, dict]]:
+        """
+        Sends one bulk request. Returns the failed items as (position_in_batch, error).
+        Raises BulkFlushError once retries are exhausted.
+        """
+        if not actions:
+            return []
+
+        last_resp = None
+        last_exc = None
+        for attempt in range(1, self.max_retries + 1):
+            # a generator is consumed by its attempt: every retry serializes the batch again
+            sent = [0]
+            body = self._stream(actions, docs, stats, sent, count_raw=attempt == 1)
+            t0 = time.perf_counter()
+            encoding = stats.encode_seconds
+            try:
+                resp = self.session.post(self.bulk_url, params=self.params, data=body,
+                                         headers=self.headers, timeout=self.timeout)
+            except requests.RequestException as e:
+                last_resp, last_exc = None, e
+                problem = f"error {e.__class__.__name__}"
+            else:
+                last_resp, last_exc = resp, None
+                stats.bytes_received += len(resp.content)
+            finally:
+                body.close()
+                stats.post_seconds += time.perf_counter() - t0 - (stats.encode_seconds - encoding)
+                stats.bytes_sent += sent[0]
+                count_sent(sent[0])
+            if last_resp is not None:
+                if not (resp.status_code == 429 or 500 <= resp.status_code < 600):
+                    break
+                problem = f"HTTP {resp.status_code}"
+            if attempt < self.max_retries:
+                stats.retries += 1
+                sleep_for = self.retry_backoff_sec * (2 ** (attempt - 1))
+                print(f"[WARN] Bulk {problem} attempt {attempt}/{self.max_retries}; "
+                      f"backing off {sleep_for:.1f}s")
+                time.sleep(sleep_for)
+
+        if last_resp is None or not last_resp.ok:
+            if last_exc is not None:
+                msg = f"Bulk failed: {last_exc}"
+            else:
+                msg = f"Bulk failed: HTTP {getattr(last_resp, 'status_code', '???')} {getattr(last_resp, 'text', '')[:500]}"
+            raise BulkFlushError(msg)
+
+        try:
+            result = jsoncodec.response_json(last_resp)
+        except ValueError as e:   # e.g. a proxy cut the body off; whether the items landed is unknown
+            raise BulkFlushError(f"Bulk failed: undecodable response (HTTP {last_resp.status_code}, "
+                                 f"{len(last_resp.content)} bytes): {e}") from e
+        if not isinstance(result, dict):
+            raise BulkFlushError(f"Bulk failed: undecodable response (HTTP {last_resp.status_code}): "
+                                 f"{last_resp.text[:200]}")
+        if self.refresh:
+            self.written.update(next(iter(a.values())).get("_index") for a in actions)
+        stats.batches += 1
+        stats.docs += len(actions)
+        stats.took_ms += int(result.get("took") or 0)
+
+        failed = []
+        if result.get("errors"):
+            # Collect + summarize first few failures (item key is the op type: index/create/...)
+            existing = 0
+            for i, item in enumerate(result.get("items", [])):
+                op, res = next(iter(item.items()), (None, {})) if item else (None, {})
+                err = res.get("error")
+                if err and op == "create" and res.get("status") == 409:
+                    existing += 1
+                    continue
+                if err:
+                    failed.append((i, err))
+                    if len(failed) <= 10:
+                        print(f"[ERROR] item #{i} failed: status={res.get('status')} "
+                              f"_id={res.get('_id')} error={err}")
+            stats.failed += len(failed)
+            stats.existing += existing
+        else:
+            print(f"[OK] Bulk indexed {len(actions)} docs in {result.get('took')} ms")
+        return failed
+
+    def ship_batch(self, actions, docs, stats, attempts: Optional[List[int]] = None) -> List[Tuple[int, dict]]:
+        """
+        flush(); rejected items are dead-lettered, a failed batch is dead-lettered and re-raised.
+        Returns the rejected items as flush() does. `attempts`: earlier rejections per item
+        (replayed dead letters), see compliance.bulk.state.
+        """
+        try:
+            failed = self.flush(actions, docs, stats)
+        except BulkFlushError as e:
+            if self.state_dir:
+                stats.dead_lettered += write_dead_letters(
+                    self.state_dir, actions, docs, [str(e)] * len(actions), attempts)
+            raise
+        if self.state_dir and failed:
+            stats.dead_lettered += write_dead_letters(
+                self.state_dir,
+                [actions[i] for i, _ in failed],
+                [docs[i] for i, _ in failed],
+                [err for _, err in failed],
+                [attempts[i] for i, _ in failed] if attempts else None,
+                rejected=True,
+            )
+        return failed
+
+    def refresh_written(self) -> None:
+        """One `_refresh` of every index written to since the last call (refresh was requested)."""
+        indices = sorted(i for i in self.written if i)
+        self.written.clear()
+        if not indices:
+            return
+        try:
+            resp = self.session.post(f"{self.es_url}/{','.join(indices)}/_refresh",
+                                     params={"ignore_unavailable": "true"}, headers=self.auth,
+                                     timeout=self.timeout)
+        except requests.RequestException as e:
+            print(f"[WARN] Refresh of {', '.join(indices)} failed: {e}")
+            return
+        if not resp.ok:
+            print(f"[WARN] Refresh of {', '.join(indices)} failed: HTTP {resp.status_code}")
+
+    # --- whole shipment ---------------------------------------------------
+
+    def replay_dead_letters(self, stats: BulkStats) -> None:
+        if not self.state_dir:
+            return
+        dl_actions, dl_docs, dl_attempts, claimed = claim_dead_letters(self.state_dir)
+        if not dl_actions:
+            return
+        print(f"[INFO] Replaying {len(dl_actions)} dead-lettered item(s) from {self.state_dir}")
+        total, done = len(dl_actions), 0   # entries acknowledged or parked again
+        try:
+            for start in range(0, total, self.batch_size):
+                end = start + self.batch_size
+                try:
+                    self.ship_batch(dl_actions[start:end], dl_docs[start:end], stats, dl_attempts[start:end])
+                except BulkFlushError:
+                    # this batch is parked again; park the rest unsent too
+                    done = min(end, total)
+                    stats.dead_lettered += write_dead_letters(
+                        self.state_dir, dl_actions[end:], dl_docs[end:],
+                        ["not replayed: cluster unavailable"] * len(dl_actions[end:]), dl_attempts[end:])
+                    done = total
+                    raise
+                done = min(end, total)
+                stats.replayed += len(dl_actions[start:end])
+        finally:
+            # whatever was neither sent nor parked again stays claimed for the next run
+            if done == total:
+                os.remove(claimed)
+            else:
+                release_claim(claimed, total - done)
+
+    def ship(
+        self,
+        records: Iterable,
+        builder: Callable[[object], Optional[BulkItem]],
+        *,
+        key: Optional[Callable[[object], str]] = None,
+        scope: Optional[str] = None,
+        resume: bool = True,
+    ) -> BulkStats:
+        """
+        Ship every record that `builder` turns into an (action, doc) pair.
+
+        key/scope: enable checkpointing (needs `state_dir`). `key(record)` must be
+        ascending over `records`; `scope` identifies the shipment (e.g. source dir +
+        destination index) so a checkpoint from a different shipment is ignored.
+        On BulkFlushError the failed batch is dead-lettered, the checkpoint moves past
+        it, and the error propagates; a rerun resumes from there.
+        """
+        stats = BulkStats()
+        t0 = time.perf_counter()
+        try:
+            self.replay_dead_letters(stats)
+            self._ship(records, builder, key, scope, resume, stats)
+            self.refresh_written()
+        finally:
+            stats.seconds = time.perf_counter() - t0
+        return stats
+
+    def _ship(self, records, builder, key, scope, resume, stats: BulkStats) -> None:
+        checkpointing = bool(self.state_dir and key)
+        checkpoint = None
+        if checkpointing:
+            checkpoint = load_checkpoint(self.state_dir) if resume else None
+            if checkpoint and checkpoint.get("scope") != scope:
+                checkpoint = None
+            if checkpoint and checkpoint.get("last_key") is not None:
+                print(f"[INFO] Resuming after checkpoint '{checkpoint['last_key']}' "
+                      f"({checkpoint.get('batches', 0)} batch(es) done)")
+            else:
+                checkpoint = {"scope": scope, "last_key": None, "batches": 0}
+        last_done = checkpoint.get("last_key") if checkpoint else None
+
+        actions, docs = [], []
+        batch_last_key = None
+
+        def advance():
+            checkpoint["last_key"] = batch_last_key
+            checkpoint["batches"] = checkpoint.get("batches", 0) + 1
+            checkpoint["updated_at"] = datetime.now(timezone.utc).isoformat()
+            save_checkpoint(self.state_dir, checkpoint)
+
+        def flush():
+            try:
+                self.ship_batch(actions, docs, stats)
+            except BulkFlushError as e:
+                # Batch is parked; move past it so a rerun neither loses nor re-sends it
+                if checkpointing:
+                    advance()
+                    print(f"[ERROR] {e}. Stopping; rerun to resume after '{batch_last_key}'.")
+                raise
+            if checkpointing:
+                advance()
+            actions.clear()
+            docs.clear()
+
+        for record in records:
+            if checkpointing:
+                k = key(record)
+                if last_done is not None and k <= last_done:
+                    stats.skipped += 1
+                    continue
+                batch_last_key = k
+            item = builder(record)
+            if item is None:
+                stats.skipped += 1
+                continue
+            actions.append(item[0])
+            docs.append(item[1])
+            if len(actions) >= self.batch_size:
+                flush()
+
+        if actions:
+            flush()
+
+        # Whole shipment done: next run starts from the top again
+        if checkpointing:
+            clear_checkpoint(self.state_dir)
@@ -0,0 +1,88 @@
+# shipper.py
+"""
+Directory of per-agent report files → destination index, for the Windows and
+macOS ship stages (each platform's `pipeline.py` passes its cluster from config).
+"""
+import os
+from datetime import datetime, timezone
+from typing import Optional
+
+from .builders import AgentReportBuilder, iter_json_dir
+from .engine import BulkEngine
+from .state import STATE_DIRNAME
+
+
+def generation(directory: str) -> int:
+    """Newest mtime (ns) of the `*.json` files in `directory`; changes whenever they are rewritten."""
+    with os.scandir(directory) as it:
+        return max((e.stat().st_mtime_ns for e in it if e.name.lower().endswith(".json") and e.is_file()),
+                   default=0)
+
+
+def ship_dir_to_elastic(
+    directory: str,
+    dest_index: str,
+    *,
+    es_url: str,
+    api_key_b64: Optional[str] = None,
+    batch_size: int = 500,
+    id_field: Optional[str] = "agent_name",     # None → ES auto IDs
+    use_filename_as_fallback_id: bool = True,
+    refresh: Optional[str] = None,              # e.g., "wait_for" | True | False | None
+    max_retries: int = 3,
+    retry_backoff_sec: float = 1.0,
+    state_dir: Optional[str] = None,            # default: <directory>/.ship_state
+    resume: bool = True,
+    compress: bool = True,
+    settings=None,                              # compliance.pipeline.Settings; default: the environment
+):
+    """
+    Index all JSON files in `directory` into `dest_index` using the shared bulk engine.
+
+    - Each `*.json` file → one document (see compliance.bulk.AgentReportBuilder).
+    - Items Elasticsearch rejects, and whole batches that still fail after retries, are appended
+      to `<state_dir>/dead_letter.ndjson`; the next run replays them before anything else.
+    - After every acknowledged batch the last shipped file is checkpointed. If a batch fails the
+      run stops with BulkFlushError and a rerun (with `resume=True`) continues after that batch.
+      The checkpoint belongs to this generation of the files (their newest mtime): once the
+      compare stage has written them again, the next run ships all of them from the top.
+
+    Returns the engine's BulkStats.
+    """
+    from ..partition import for_run   # compliance.partition imports this package
+
+    directory = os.path.abspath(directory)
+    engine = BulkEngine(
+        es_url,
+        api_key_b64,
+        batch_size=batch_size,
+        refresh=refresh,
+        max_retries=max_retries,
+        retry_backoff_sec=retry_backoff_sec,
+        compress=compress,
+        state_dir=state_dir or os.path.join(directory, STATE_DIRNAME),
+    )
+    builder = AgentReportBuilder(
+        dest_index,
+        id_field=id_field,
+        use_filename_as_fallback_id=use_filename_as_fallback_id,
+        ingested_at=datetime.now(timezone.utc).isoformat(),
+    )
+    # PARTITION_MODE=run: this run's own index, `create` ops, then the -latest alias moves to it
+    partition = for_run(es_url, api_key_b64, dest_index, settings)
+    if partition is not None:
+        builder = partition.wrap(builder)
+        dest_index = partition.index
+    stats = engine.ship(
+        iter_json_dir(directory),
+        builder,
+        key=lambda rec: rec[0],
+        scope=f"{directory} -> {dest_index} @ {generation(directory)}",
+        resume=resume,
+    )
+
+    print(f"[DONE] Indexed {stats.docs} doc(s) from {directory} into '{dest_index}'. "
+          f"Failures: {stats.failed} (dead-lettered: {stats.dead_lettered})")
+    if partition is not None:
+        partition.commit(stats)
+    return stats
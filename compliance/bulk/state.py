@@ -0,0 +1,157 @@
+# state.py
+"""
+On-disk shipping state: the checkpoint of acknowledged batches and the
+dead-letter file of items that could not be indexed.
+
+Every dead letter carries `attempts`, how many times Elasticsearch rejected the
+item itself (a batch that never got an answer does not count). An item rejected
+DEAD_LETTER_MAX_ATTEMPTS times (a mapping conflict, a malformed doc) goes to
+`poison.ndjson` instead, which is never replayed; look at it, fix the cause and
+move the lines back to `dead_letter.ndjson` to retry them.
+"""
+import os
+import threading
+from typing import Optional, List, Tuple
+
+from .. import jsoncodec
+
+STATE_DIRNAME = ".ship_state"
+CHECKPOINT_FILE = "checkpoint.json"
+DEAD_LETTER_FILE = "dead_letter.ndjson"
+POISON_FILE = "poison.ndjson"
+DEAD_LETTER_MAX_ATTEMPTS = int(os.getenv("DEAD_LETTER_MAX_ATTEMPTS", "5"))
+
+# concurrent ship workers append to the same dead-letter file
+_dead_letter_lock = threading.Lock()
+
+
+def load_checkpoint(state_dir: str) -> Optional[dict]:
+    path = os.path.join(state_dir, CHECKPOINT_FILE)
+    try:
+        with open(path, "rb") as fh:
+            return jsoncodec.load(fh)
+    except FileNotFoundError:
+        return None
+    except ValueError as e:
+        print(f"[WARN] Ignoring unreadable checkpoint {path}: {e}")
+        return None
+
+
+def save_checkpoint(state_dir: str, checkpoint: dict) -> None:
+    # write-then-rename so a crash never leaves a half-written checkpoint
+    os.makedirs(state_dir, exist_ok=True)
+    path = os.path.join(state_dir, CHECKPOINT_FILE)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as fh:
+        jsoncodec.dump(checkpoint, fh, indent=True)
+    os.replace(tmp, path)
+
+
+def clear_checkpoint(state_dir: str) -> None:
+    try:
+        os.remove(os.path.join(state_dir, CHECKPOINT_FILE))
+    except FileNotFoundError:
+        pass
+
+
+def _append(path: str, entries: List[dict]) -> None:
+    with _dead_letter_lock, open(path, "ab") as fh:
+        for e in entries:
+            fh.write(jsoncodec.dumps(e) + b"\n")
+        fh.flush()
+        os.fsync(fh.fileno())
+
+
+def write_dead_letters(state_dir: str, actions: List[dict], docs: List[dict], errors: List,
+                       attempts: Optional[List[int]] = None, *, rejected: bool = False) -> int:
+    """
+    Append (action, doc, error) entries to the on-disk dead-letter file.
+
+    `attempts` are the items' earlier rejection counts (0 for new items); `rejected`
+    says Elasticsearch rejected these items, which counts as one more attempt. Items
+    reaching DEAD_LETTER_MAX_ATTEMPTS go to the poison file instead.
+    """
+    if not actions:
+        return 0
+    os.makedirs(state_dir, exist_ok=True)
+    attempts = attempts or [0] * len(actions)
+    parked, poison = [], []
+    for meta, doc, err, n in zip(actions, docs, errors, attempts):
+        n += 1 if rejected else 0
+        (poison if n >= DEAD_LETTER_MAX_ATTEMPTS else parked).append(
+            {"action": meta, "doc": doc, "error": err, "attempts": n})
+    if parked:
+        path = os.path.join(state_dir, DEAD_LETTER_FILE)
+        _append(path, parked)
+        print(f"[WARN] Dead-lettered {len(parked)} item(s) to {path}")
+    if poison:
+        path = os.path.join(state_dir, POISON_FILE)
+        _append(path, poison)
+        print(f"[ERROR] {len(poison)} item(s) rejected {DEAD_LETTER_MAX_ATTEMPTS} times; moved to {path} "
+              f"and no longer replayed")
+    return len(actions)
+
+
+def claim_dead_letters(state_dir: str) -> Tuple[List[dict], List[dict], List[int], Optional[str]]:
+    """
+    Move the dead-letter file aside for replay and return (actions, docs, attempts, claimed_path).
+    A claim left behind by an interrupted replay is picked up as well.
+    Once the replay has been sent (or re-parked), delete `claimed_path`; if it stopped
+    part-way, `release_claim` keeps what was not sent for the next run.
+    """
+    live = os.path.join(state_dir, DEAD_LETTER_FILE)
+    claimed = live + ".replay"
+
+    entries = []
+    for path in (claimed, live):
+        if not os.path.exists(path):
+            continue
+        with open(path, "rb") as fh:
+            for line in fh:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entries.append(jsoncodec.loads(line))
+                except ValueError:
+                    print(f"[WARN] Skipping corrupt dead-letter line in {path}")
+
+    if not entries:
+        return [], [], [], None
+
+    _rewrite(claimed, entries)
+    if os.path.exists(live):
+        os.remove(live)
+
+    return ([e["action"] for e in entries], [e["doc"] for e in entries],
+            [int(e.get("attempts") or 0) for e in entries], claimed)
+
+
+def _rewrite(path: str, entries: List[dict]) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as fh:
+        for e in entries:
+            fh.write(jsoncodec.dumps(e) + b"\n")
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp, path)
+
+
+def release_claim(claimed: str, unsent: int) -> None:
+    """A replay stopped part-way: keep the claim's last `unsent` entries for the next run."""
+    try:
+        with open(claimed, "rb") as fh:
+            lines = [line for line in fh if line.strip()]
+        keep = lines[len(lines) - unsent:] if unsent else []
+        if keep:
+            tmp = claimed + ".tmp"
+            with open(tmp, "wb") as fh:
+                fh.writelines(keep)
+                fh.flush()
+                os.fsync(fh.fileno())
+            os.replace(tmp, claimed)
+        else:
+            os.remove(claimed)
+    except OSError as e:
+        # the whole claim stays; the next replay re-sends what did land (same `_id`s)
+        print(f"[WARN] Could not trim dead-letter claim {claimed}: {e}")
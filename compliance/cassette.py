@@ -0,0 +1,189 @@
+# cassette.py
+"""
+Record / replay transport for the shared session.
+
+    COMPLIANCE_HTTP_RECORD=run.cassette.gz  python -m compliance run   # capture
+    COMPLIANCE_HTTP_REPLAY=run.cassette.gz  python -m compliance run   # offline
+
+Record mode sends every request for real and appends the exchange (method,
+path + query, request-body digest, status, content type, response body,
+elapsed time) to a gzip'd JSON-lines cassette. Authorization headers and
+write bodies are never stored.
+
+Replay mode answers from the cassette without touching the network. Requests
+are matched on method + path + query + body digest, so the scheme/host may
+differ between the capture and the laptop. Repeated identical requests are
+served in recorded order (the last answer repeats). Writes — `_bulk`, `_doc`,
+PIT deletes — are always accepted with a synthetic success, since their bodies
+(ingest timestamps) differ from run to run. With COMPLIANCE_HTTP_REPLAY_LATENCY=1
+each replayed response waits for its recorded elapsed time.
+"""
+import base64
+import gzip
+import hashlib
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from . import jsoncodec
+
+WRITE_SUFFIXES = ("/_bulk", "/_doc")
+
+
+def _body_bytes(request) -> bytes:
+    body = request.body
+    if body is None:
+        return b""
+    if isinstance(body, str):
+        return body.encode("utf-8")
+    if isinstance(body, (bytes, bytearray)):
+        return bytes(body)
+    return b""  # generator bodies: matched on method + path only
+
+
+def request_key(request) -> str:
+    url = urlsplit(request.url)
+    target = url.path + ("?" + url.query if url.query else "")
+    digest = hashlib.blake2b(_body_bytes(request), digest_size=8).hexdigest()
+    return f"{request.method} {target} {digest}"
+
+
+def is_write(request) -> bool:
+    path = urlsplit(request.url).path.rstrip("/")
+    return (request.method == "POST" and path.endswith(WRITE_SUFFIXES)) or \
+        (request.method == "DELETE" and path.endswith("/_pit"))
+
+
+def _build_response(request, status: int, content: bytes, content_type: str,
+                    elapsed: float = 0.0) -> requests.Response:
+    resp = requests.Response()
+    resp.status_code = status
+    resp._content = content
+    resp.headers = CaseInsensitiveDict({"Content-Type": content_type,
+                                        "Content-Length": str(len(content))})
+    resp.encoding = "utf-8" if "json" in content_type or "text" in content_type else None
+    resp.url = request.url
+    resp.request = request
+    resp.reason = "OK" if status < 400 else "Error"
+    resp.elapsed = timedelta(seconds=elapsed)
+    return resp
+
+
+def _ack_write(request) -> requests.Response:
+    """Synthetic success for a write, shaped like Elasticsearch's answer."""
+    path = urlsplit(request.url).path.rstrip("/")
+    if path.endswith("/_bulk"):
+        body = request.body
+        # a streamed bulk body is only made while it is read
+        raw = _body_bytes(request) if body is None or isinstance(body, (bytes, bytearray, str)) \
+            else b"".join(body)
+        if request.headers.get("Content-Encoding") == "gzip" and raw:
+            raw = gzip.decompress(raw)
+        items = []
+        lines = [l for l in raw.split(b"\n") if l.strip()]
+        for line in lines[0::2]:
+            op, meta = next(iter(jsoncodec.loads(line).items()))
+            items.append({op: {"_index": meta.get("_index"), "_id": meta.get("_id"),
+                               "status": 201, "result": "created"}})
+        payload = {"took": 0, "errors": False, "items": items}
+    elif path.endswith("/_doc"):
+        payload = {"result": "created", "_index": path.split("/")[-2]}
+    else:
+        payload = {"succeeded": True, "num_freed": 1}
+    return _build_response(request, 201 if path.endswith("/_doc") else 200,
+                           jsoncodec.dumps(payload), "application/json")
+
+
+class RecordingAdapter(HTTPAdapter):
+    """HTTPAdapter that appends every exchange to a gzip'd JSON-lines cassette."""
+
+    def __init__(self, path: str, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self._fh = gzip.open(path, "wt", encoding="utf-8")
+        self._lock = threading.Lock()
+        self.recorded = 0
+
+    def send(self, request, **kwargs):
+        t0 = time.perf_counter()
+        resp = super().send(request, **kwargs)
+        elapsed = time.perf_counter() - t0
+        write = is_write(request)
+        entry = {
+            "key": request_key(request),
+            "status": resp.status_code,
+            "content_type": resp.headers.get("Content-Type", "application/octet-stream"),
+            "elapsed": round(elapsed, 6),
+            # write responses are synthesized on replay; keep only their timing
+            "body": "" if write else base64.b64encode(resp.content).decode("ascii"),
+            "write": write,
+        }
+        with self._lock:
+            if self._fh is not None:
+                self._fh.write(jsoncodec.dumps_str(entry) + "\n")
+                self.recorded += 1
+        return resp
+
+    def close(self):
+        with self._lock:
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+                print(f"[OK] recorded {self.recorded} HTTP exchange(s) to {self.path}")
+        super().close()
+
+
+class ReplayAdapter(BaseAdapter):
+    """Serves responses from a cassette; never opens a connection."""
+
+    def __init__(self, path: str, *, latency: bool = False):
+        super().__init__()
+        self.path = path
+        self.latency = latency
+        self.entries = defaultdict(deque)
+        with gzip.open(path, "rt", encoding="utf-8") as fh:
+            for line in fh:
+                if line.strip():
+                    entry = jsoncodec.loads(line)
+                    self.entries[entry["key"]].append(entry)
+        self._lock = threading.Lock()
+        self.served = 0
+        self.misses = 0
+
+    def _next(self, key: str):
+        with self._lock:
+            queue = self.entries.get(key)
+            if not queue:
+                return None
+            # keep the last answer for any further identical request
+            return queue.popleft() if len(queue) > 1 else queue[0]
+
+    def send(self, request, **kwargs):
+        entry = self._next(request_key(request))
+        if is_write(request):
+            if self.latency and entry is not None:
+                time.sleep(entry["elapsed"])
+            self.served += 1
+            return _ack_write(request)
+        if entry is None:
+            self.misses += 1
+            raise requests.ConnectionError(
+                f"replay: no recorded response for {request.method} {request.url} in {self.path}",
+                request=request)
+        if self.latency:
+            time.sleep(entry["elapsed"])
+        self.served += 1
+        return _build_response(request, entry["status"], base64.b64decode(entry["body"]),
+                               entry["content_type"], entry["elapsed"])
+
+    def close(self):
+        if self.served or self.misses:
+            print(f"[INFO] replayed {self.served} HTTP exchange(s) from {self.path} "
+                  f"({self.misses} miss(es))")
+            self.served = self.misses = 0
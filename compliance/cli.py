@@ -0,0 +1,379 @@
+# cli.py
+"""
+Single entry point for all platforms:
+
+    python -m compliance run --platforms windows,macos,linux
+    python -m compliance daemon --platforms windows,macos --interval 3600
+    python -m compliance tail --platforms windows,macos --poll 1 --max-latency 2
+    python -m compliance run --record run.cassette.gz     # then --replay it offline
+    python -m compliance run --mode async --shard 0/4     # then merge-shards
+    python -m compliance run --mode async --index-dir .host_index   # then reevaluate
+    python -m compliance run --mode async --lookup-dir .lookup      # served by `serve`
+
+The per-platform `main.py` scripts (`cd Windows && python main.py`) go through
+`platform_main()`.
+"""
+import argparse
+import os
+import sys
+from contextlib import nullcontext
+
+from .http import set_transport
+from .dag import Stage, prefixed, run_dag, report
+from .metrics import RunMetrics
+from .platforms import PLATFORMS, load_platform
+
+
+def _platform_list(raw: str) -> list:
+    names = [p.strip().lower() for p in raw.split(",") if p.strip()]
+    unknown = [p for p in names if p not in PLATFORMS]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown platform(s) {unknown}; known: {', '.join(PLATFORMS)}")
+    return names
+
+
+def build_stages(platforms: list, mode: str = "sync", shard=None, shard_dir: str = None,
+                 compare_workers: int = None, index_dir: str = None, lookup_dir: str = None,
+                 run_id: str = None) -> list:
+    """One merged graph: every platform's stages, namespaced `<platform>.<stage>`."""
+    stages = []
+    aio_kwargs = {} if compare_workers is None else {"compare_workers": compare_workers}
+    if index_dir is not None:
+        aio_kwargs["index_dir"] = index_dir
+    if lookup_dir is not None:
+        aio_kwargs["lookup_dir"] = lookup_dir
+    for name in platforms:
+        pipeline = load_platform(name)
+        if shard is not None:
+            from .shard import SHARD_DIR, run_shard
+            stages.append(Stage(f"{name}.pipeline", lambda r, p=pipeline: run_shard(
+                p.spec(), shard, shard_dir or SHARD_DIR, run_id, **aio_kwargs)))
+        elif mode == "async":
+            from . import aio
+            stages.append(Stage(f"{name}.pipeline", lambda r, p=pipeline: aio.run(p.spec(), **aio_kwargs)))
+        else:
+            stages.extend(prefixed(name, pipeline.stages(compare_workers=compare_workers)))
+    return stages
+
+
+def _shard(raw: str):
+    from .shard import Shard
+    try:
+        return Shard.parse(raw)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def cmd_run(args) -> int:
+    if args.shard and args.mode != "async":
+        print("[ERROR] --shard needs --mode async", file=sys.stderr)
+        return 2
+    if args.index_dir and (args.mode != "async" or args.shard):
+        print("[ERROR] --index-dir needs --mode async and a whole (unsharded) fleet", file=sys.stderr)
+        return 2
+    if args.lookup_dir and (args.mode != "async" or args.shard):
+        print("[ERROR] --lookup-dir needs --mode async and a whole (unsharded) fleet", file=sys.stderr)
+        return 2
+    stages = build_stages(args.platforms, args.mode, args.shard, args.shard_dir, args.compare_workers,
+                          args.index_dir, args.lookup_dir, args.run_id)
+    metrics = RunMetrics(",".join(args.platforms))
+    profiler = None
+    if args.profile is not None:
+        from .profiling import StageProfiler, default_dir
+        profiler = StageProfiler(args.profile or default_dir())
+    run = run_dag(stages, max_workers=args.workers, metrics=metrics, profiler=profiler)
+    if profiler is not None:
+        profiler.close()
+    print(report(run))
+    metrics.emit(index=args.metrics_index, textfile=args.metrics_textfile)
+    return 0 if run.ok else 1
+
+
+def _add_metrics_args(p: argparse.ArgumentParser) -> None:
+    p.add_argument("--metrics-index", default=None,
+                   help="index for the run-metrics document (default: $METRICS_INDEX, "
+                        "cluster $METRICS_ES_URL or $ES_URL)")
+    p.add_argument("--metrics-textfile", default=None,
+                   help="Prometheus textfile for run metrics (default: $METRICS_TEXTFILE)")
+
+
+def _add_transport_args(p: argparse.ArgumentParser) -> None:
+    g = p.add_mutually_exclusive_group()
+    g.add_argument("--record", metavar="CASSETTE", default=None,
+                   help="record every HTTP exchange to a gzip'd cassette ($COMPLIANCE_HTTP_RECORD)")
+    g.add_argument("--replay", metavar="CASSETTE", default=None,
+                   help="answer HTTP from a cassette, no network ($COMPLIANCE_HTTP_REPLAY)")
+    p.add_argument("--replay-latency", action="store_true",
+                   help="with --replay, wait the recorded time for each response")
+
+
+def cmd_merge_shards(args) -> int:
+    from .shard import merge_dir
+    from .rollup import Rollup
+    merged = merge_dir(args.dir, args.platforms, args.run_id)
+    if not merged:
+        return 1
+    if args.ship_rollup:
+        for platform, m in merged.items():
+            if m.get("rollup") and not m["shards"]["missing"]:
+                Rollup.from_doc(m["rollup"]).ship(load_platform(platform).spec())
+    return 1 if any(m["shards"]["missing"] for m in merged.values()) else 0
+
+
+def cmd_reevaluate(args) -> int:
+    from .hostindex import reevaluate
+    if not args.index_dir:
+        print("[ERROR] set --index-dir or $HOST_INDEX_DIR", file=sys.stderr)
+        return 2
+    stages = [Stage(f"{name}.reevaluate", lambda r, p=load_platform(name): reevaluate(
+                  p.spec(), args.index_dir, compare_workers=args.compare_workers))
+              for name in args.platforms]
+    metrics = RunMetrics(",".join(args.platforms))
+    run = run_dag(stages, max_workers=args.workers, metrics=metrics)
+    print(report(run))
+    metrics.emit(index=args.metrics_index, textfile=args.metrics_textfile)
+    return 0 if run.ok else 1
+
+
+def cmd_daemon(args) -> int:
+    from .daemon import Daemon
+    daemon = Daemon(
+        args.platforms,
+        interval=args.interval,
+        baseline_ttl=args.baseline_ttl,
+        ship_unchanged=args.ship_unchanged,
+        max_cycles=args.max_cycles,
+        metrics_index=args.metrics_index,
+        metrics_textfile=args.metrics_textfile,
+    )
+    return daemon.serve_forever()
+
+
+def _since(raw: str) -> float:
+    from .tail import parse_since
+    try:
+        return parse_since(raw)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def cmd_serve(args) -> int:
+    from .lookup import serve
+    if not args.lookup_dir:
+        print("[ERROR] set --lookup-dir or $LOOKUP_DIR", file=sys.stderr)
+        return 2
+    return serve(args.lookup_dir, args.host, args.port, args.reload)
+
+
+def cmd_tail(args) -> int:
+    from .tail import tail
+    specs = [load_platform(name).spec() for name in args.platforms]
+    return tail(
+        specs,
+        poll=args.poll,
+        max_batch=args.max_batch,
+        max_latency=args.max_latency,
+        overlap=args.overlap,
+        since=args.since,
+        baseline_ttl=args.baseline_ttl,
+        ship_unchanged=args.ship_unchanged,
+        max_polls=args.max_polls,
+        report_every=args.report_every,
+        metrics_textfile=args.metrics_textfile,
+    )
+
+
+def build_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(prog="compliance", description="OS update compliance runner")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="run platform pipelines as one stage graph")
+    run.add_argument("--platforms", type=_platform_list, default=list(PLATFORMS),
+                     help=f"comma-separated subset of {','.join(PLATFORMS)} (default: all)")
+    run.add_argument("--mode", choices=("sync", "async"), default="sync",
+                     help="sync: fetch/baseline/compare/ship stages; async: one overlapped pipeline per platform")
+    run.add_argument("--workers", type=int, default=8, help="max stages running at once")
+    run.add_argument("--compare-workers", type=int, default=None,
+                     help="compare rows in a process pool of this size (default: $COMPARE_WORKERS, off)")
+    run.add_argument("--profile", nargs="?", const="", default=None, metavar="DIR",
+                     help="write cProfile + tracemalloc reports per stage "
+                          "(default DIR: profiles/<timestamp>; stages then run one at a time)")
+    run.add_argument("--shard", type=_shard, default=None, metavar="i/N",
+                     help="only handle the hosts hashed into shard i of N (0-based; needs --mode async)")
+    run.add_argument("--shard-dir", default=None,
+                     help="where shard summaries are written (default: $SHARD_DIR or shards/)")
+    run.add_argument("--run-id", default=None,
+                     help="with --shard: the same id on every shard of one run "
+                          "(default: $SHARD_RUN_ID or the UTC date)")
+    run.add_argument("--index-dir", default=None,
+                     help="keep the host-by-OS-line index here for `reevaluate` (needs --mode async; "
+                          "default: $HOST_INDEX_DIR, off)")
+    run.add_argument("--lookup-dir", default=None,
+                     help="write each platform's results here for `serve` (needs --mode async; "
+                          "default: $LOOKUP_DIR, off)")
+    _add_metrics_args(run)
+    _add_transport_args(run)
+    run.set_defaults(func=cmd_run)
+
+    rev = sub.add_parser("reevaluate",
+                         help="re-compare and ship only the indexed hosts whose OS line's baseline changed")
+    rev.add_argument("--platforms", type=_platform_list, default=list(PLATFORMS),
+                     help=f"comma-separated subset of {','.join(PLATFORMS)} (default: all)")
+    rev.add_argument("--index-dir", default=os.getenv("HOST_INDEX_DIR", ""),
+                     help="index written by `run --index-dir` (default: $HOST_INDEX_DIR)")
+    rev.add_argument("--workers", type=int, default=8, help="max platforms running at once")
+    rev.add_argument("--compare-workers", type=int, default=None,
+                     help="compare rows in a process pool of this size (default: $COMPARE_WORKERS, off)")
+    _add_metrics_args(rev)
+    _add_transport_args(rev)
+    rev.set_defaults(func=cmd_reevaluate)
+
+    mrg = sub.add_parser("merge-shards", help="add up the per-shard summaries of a sharded run")
+    mrg.add_argument("dir", nargs="?", default=os.getenv("SHARD_DIR", "shards"),
+                     help="directory holding <platform>-<i>-of-<N>.json (default: $SHARD_DIR or shards/)")
+    mrg.add_argument("--platforms", type=_platform_list, default=None,
+                     help="only merge these platforms")
+    mrg.add_argument("--run-id", default=None,
+                     help="merge this run's summaries (default: each platform's newest run)")
+    mrg.add_argument("--no-ship-rollup", dest="ship_rollup", action="store_false",
+                     help="do not ship the fleet rollup doc added up from the shards "
+                          "(it is only shipped when no shard is missing)")
+    mrg.set_defaults(func=cmd_merge_shards)
+
+    dmn = sub.add_parser("daemon", help="stay resident and run the cycle on an interval")
+    dmn.add_argument("--platforms", type=_platform_list, default=list(PLATFORMS),
+                     help=f"comma-separated subset of {','.join(PLATFORMS)} (default: all)")
+    dmn.add_argument("--interval", type=float, default=3600, help="seconds between cycle starts")
+    dmn.add_argument("--baseline-ttl", type=float, default=3600,
+                     help="seconds a parsed baseline is reused before it is fetched again")
+    dmn.add_argument("--ship-unchanged", action="store_true",
+                     help="re-ship hosts whose result did not change since the last cycle")
+    dmn.add_argument("--max-cycles", type=int, default=None, help="exit after N cycles")
+    _add_metrics_args(dmn)
+    _add_transport_args(dmn)
+    dmn.set_defaults(func=cmd_daemon)
+
+    from .lookup import LOOKUP_PORT, LOOKUP_RELOAD_SECONDS
+    srv = sub.add_parser("serve", help="answer 'is host X up to date?' from the latest run's results")
+    srv.add_argument("--lookup-dir", default=os.getenv("LOOKUP_DIR", ""),
+                     help="snapshots written by `run --lookup-dir` (default: $LOOKUP_DIR)")
+    srv.add_argument("--host", default="127.0.0.1", help="address to bind (default: 127.0.0.1)")
+    srv.add_argument("--port", type=int, default=LOOKUP_PORT, help="port (default: $LOOKUP_PORT or 8088)")
+    srv.add_argument("--reload", type=float, default=LOOKUP_RELOAD_SECONDS,
+                     help="seconds between checks for a new snapshot; 0 = only on SIGHUP / POST /reload "
+                          "(default: $LOOKUP_RELOAD_SECONDS or 5)")
+    srv.set_defaults(func=cmd_serve)
+
+    from .tail import TAIL_POLL_SECONDS, TAIL_MAX_BATCH, TAIL_MAX_LATENCY, TAIL_OVERLAP_SECONDS
+    tl = sub.add_parser("tail", help="follow the source index and ship new results within seconds")
+    tl.add_argument("--platforms", type=_platform_list, default=list(PLATFORMS),
+                    help=f"comma-separated subset of {','.join(PLATFORMS)} (default: all)")
+    tl.add_argument("--poll", type=float, default=TAIL_POLL_SECONDS,
+                    help="seconds between polls of the source index (default: $TAIL_POLL_SECONDS or 1)")
+    tl.add_argument("--max-batch", type=int, default=TAIL_MAX_BATCH,
+                    help="ship a batch once it holds this many docs (default: $TAIL_MAX_BATCH or 200)")
+    tl.add_argument("--max-latency", type=float, default=TAIL_MAX_LATENCY,
+                    help="ship a batch before its oldest doc waits longer than this many seconds "
+                         "(default: $TAIL_MAX_LATENCY or 2)")
+    tl.add_argument("--since", type=_since, default=None, metavar="now|N[s|m|h|d]",
+                    help="start with results this far back (default: now)")
+    tl.add_argument("--overlap", type=float, default=TAIL_OVERLAP_SECONDS,
+                    help="seconds re-read before the newest result handled, for late-indexed results "
+                         "(default: $TAIL_OVERLAP_SECONDS or 30)")
+    tl.add_argument("--baseline-ttl", type=float, default=3600,
+                    help="seconds a parsed baseline is reused before it is fetched again")
+    tl.add_argument("--ship-unchanged", action="store_true",
+                    help="ship every new result, even when the host's document would not change")
+    tl.add_argument("--report-every", type=float, default=60,
+                    help="seconds between latency reports (and metrics textfile writes)")
+    tl.add_argument("--max-polls", type=int, default=None, help="exit after N polls per platform")
+    tl.add_argument("--metrics-textfile", default=os.getenv("TAIL_METRICS_TEXTFILE"),
+                    help="write latency/lag gauges in Prometheus text format here "
+                         "(default: $TAIL_METRICS_TEXTFILE, off)")
+    tl.set_defaults(func=cmd_tail)
+    return ap
+
+
+def build_platform_parser(description: str) -> argparse.ArgumentParser:
+    """Options of a platform folder's own `main.py` (one platform, no subcommands)."""
+    ap = argparse.ArgumentParser(description=description)
+    ap.add_argument("--mode", choices=("sync", "async"), default="sync",
+                    help="async: overlap fetch / compare / ship (no per-agent files are written)")
+    ap.add_argument("--http-concurrency", type=int, default=None,
+                    help="max HTTP requests in flight in async mode (default: $HTTP_CONCURRENCY or 4)")
+    ap.add_argument("--compare-workers", type=int, default=None,
+                    help="compare rows in a process pool of this size (default: $COMPARE_WORKERS, off)")
+    ap.add_argument("--metrics-index", default=None,
+                    help="index for the run-metrics document (default: $METRICS_INDEX)")
+    ap.add_argument("--metrics-textfile", default=None,
+                    help="Prometheus textfile for run metrics (default: $METRICS_TEXTFILE)")
+    ap.add_argument("--profile", nargs="?", const="", default=None, metavar="DIR",
+                    help="write cProfile + tracemalloc reports per stage "
+                         "(default DIR: profiles/<timestamp>; stages then run one at a time)")
+    ap.add_argument("--shard", type=_shard, default=None, metavar="i/N",
+                    help="only handle the hosts hashed into shard i of N (0-based; async mode); "
+                         "merge with `python -m compliance merge-shards`")
+    ap.add_argument("--shard-dir", default=None,
+                    help="where the shard summary is written (default: $SHARD_DIR or shards/)")
+    ap.add_argument("--run-id", default=None,
+                    help="same id on every shard of one run (default: $SHARD_RUN_ID or the UTC date)")
+    return ap
+
+
+def platform_main(pipeline, description: str, argv=None) -> int:
+    """
+    Body of a platform's `main.py`: `pipeline` is that folder's pipeline module.
+    sync runs its stages (per-agent files under `pipeline.OUT_DIR`); async runs
+    compliance.aio, or one shard of it with --shard.
+    """
+    ap = build_platform_parser(description)
+    args = ap.parse_args(argv)
+    if args.shard and args.mode != "async":
+        ap.error("--shard needs --mode async")
+
+    run_spec = pipeline.spec()
+    metrics = RunMetrics(run_spec.name)
+    profiler = None
+    if args.profile is not None:
+        from .profiling import StageProfiler, default_dir
+        profiler = StageProfiler(args.profile or default_dir())
+    ok = True
+    if args.mode == "async":
+        from . import aio
+        kwargs = {"refresh": "wait_for"}
+        if args.http_concurrency:
+            kwargs["http_concurrency"] = args.http_concurrency
+        if args.compare_workers is not None:
+            kwargs["compare_workers"] = args.compare_workers
+        with metrics.stage("pipeline") as st:
+            with profiler.stage("pipeline") if profiler else nullcontext():
+                if args.shard:
+                    from .shard import SHARD_DIR, run_shard
+                    summary = run_shard(run_spec, args.shard, args.shard_dir or SHARD_DIR,
+                                        args.run_id, **kwargs)
+                else:
+                    summary = aio.run(run_spec, **kwargs)
+            metrics.absorb(st, summary)
+    else:
+        run = run_dag(metrics=metrics, profiler=profiler,
+                      stages=pipeline.stages(out_dir=pipeline.OUT_DIR, compare_workers=args.compare_workers))
+        print(report(run))
+        ok = run.ok
+
+    if profiler is not None:
+        profiler.close()
+    metrics.emit(es_url=run_spec.es_url, api_key_b64=run_spec.api_key_b64,
+                 index=args.metrics_index, textfile=args.metrics_textfile)
+    return 0 if ok else 1
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    if getattr(args, "record", None) or getattr(args, "replay", None):
+        set_transport(record=args.record, replay=args.replay,
+                      replay_latency=args.replay_latency or None)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
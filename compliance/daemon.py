@@ -0,0 +1,189 @@
+# daemon.py
+"""
+Resident service mode: run the compliance cycle every `interval` seconds.
+
+Compared with one cron run per cycle, the process keeps between cycles:
+- the imported platform modules and their parsed config / .env,
+- the pooled HTTP session (compliance.http), so connections and TLS are reused,
+- each platform's parsed baseline, refreshed once it is older than `baseline_ttl`,
+- a fingerprint of the last document acknowledged per host; a host whose result
+  has not changed since the previous cycle is not shipped again.
+
+SIGTERM / SIGINT let the running cycle finish, then the loop exits cleanly.
+"""
+import hashlib
+import signal
+import threading
+import time
+from typing import Any, Callable, Collection, Dict, List, Optional
+
+from . import aio, jsoncodec
+from .dag import Stage, run_dag, report
+from .http import close_session
+from .metrics import RunMetrics
+from .partition import partitioned
+from .platforms import load_platform
+
+# Fields that change every run without the host changing
+VOLATILE_FIELDS = ("@timestamp", "ingested_at", "checked_at", "source_file")
+
+
+class TTLCache:
+    """Memoize a zero-arg loader for `ttl` seconds."""
+
+    def __init__(self, loader: Callable[[], Any], ttl: float):
+        self.loader = loader
+        self.ttl = ttl
+        self.value = None
+        self.loaded_at: Optional[float] = None
+        self.hits = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            now = time.monotonic()
+            if self.loaded_at is None or now - self.loaded_at >= self.ttl:
+                self.value = self.loader()
+                self.loaded_at = now
+            else:
+                self.hits += 1
+            return self.value
+
+
+class HostStateFilter:
+    """
+    Remembers a fingerprint of the last doc shipped per `_id` and drops a doc
+    whose content (ignoring VOLATILE_FIELDS) is unchanged. Docs without an
+    explicit `_id` (auto-ID, append-style indices) always pass.
+
+    A fingerprint only counts once Elasticsearch has acknowledged the doc: the
+    wrapped builder keeps it pending, and `settle()` (PipelineSpec.on_batch,
+    called with every bulk batch's outcome) keeps or drops it. A host whose doc
+    failed or was rejected is shipped again next cycle.
+    """
+
+    def __init__(self):
+        self.fingerprints: Dict[str, bytes] = {}
+        self.pending: Dict[str, bytes] = {}
+        self.unchanged = 0
+
+    @staticmethod
+    def fingerprint(doc: dict) -> bytes:
+        stable = {k: v for k, v in doc.items() if k not in VOLATILE_FIELDS}
+        raw = jsoncodec.dumps(stable, sort_keys=True, default=str)
+        return hashlib.blake2b(raw, digest_size=8).digest()
+
+    def wrap(self, builder):
+        def filtered(record):
+            item = builder(record)
+            if item is None:
+                return None
+            action, doc = item
+            _id = next(iter(action.values()), {}).get("_id")
+            if _id is None:
+                return item
+            fp = self.fingerprint(doc)
+            if self.fingerprints.get(_id) == fp:
+                self.unchanged += 1
+                return None
+            self.pending[_id] = fp
+            return item
+        return filtered
+
+    def settle(self, actions: List[dict], failed: Collection[int]) -> None:
+        """One bulk batch is done: remember its acknowledged docs, forget the `failed` positions."""
+        for i, action in enumerate(actions):
+            _id = next(iter(action.values()), {}).get("_id")
+            fp = self.pending.pop(_id, None) if _id is not None else None
+            if fp is not None and i not in failed:
+                self.fingerprints[_id] = fp
+
+
+class Daemon:
+    def __init__(
+        self,
+        platforms: list,
+        *,
+        interval: float = 3600,
+        baseline_ttl: float = 3600,
+        ship_unchanged: bool = False,
+        max_cycles: Optional[int] = None,
+        run_kwargs: Optional[dict] = None,
+        metrics_index: Optional[str] = None,
+        metrics_textfile: Optional[str] = None,
+    ):
+        self.platforms = platforms
+        self.interval = interval
+        self.baseline_ttl = baseline_ttl
+        self.ship_unchanged = ship_unchanged
+        self.max_cycles = max_cycles
+        self.run_kwargs = run_kwargs or {}
+        self.metrics_index = metrics_index
+        self.metrics_textfile = metrics_textfile
+        self.stop = threading.Event()
+        self.cycles = 0
+
+        # warm state, built once
+        self.pipelines = {p: load_platform(p) for p in platforms}
+        self.baselines: Dict[str, TTLCache] = {}
+        self.host_state: Dict[str, HostStateFilter] = {p: HostStateFilter() for p in platforms}
+
+    def _spec(self, name: str):
+        spec = self.pipelines[name].spec()
+        if name not in self.baselines:
+            self.baselines[name] = TTLCache(spec.load_baseline, self.baseline_ttl)
+        spec.load_baseline = self.baselines[name]
+        # a run partition must hold every host, changed or not
+        if not self.ship_unchanged and not partitioned(spec.settings):
+            spec.builder = self.host_state[name].wrap(spec.builder)
+            spec.on_batch = self.host_state[name].settle
+        return spec
+
+    def cycle(self):
+        self.cycles += 1
+        stages = [
+            Stage(f"{name}.pipeline", lambda r, n=name: aio.run(self._spec(n), **self.run_kwargs))
+            for name in self.platforms
+        ]
+        metrics = RunMetrics(",".join(self.platforms))
+        run = run_dag(stages, max_workers=len(stages), metrics=metrics)
+        print(report(run))
+        metrics.emit(index=self.metrics_index, textfile=self.metrics_textfile)
+        for name in self.platforms:
+            hs = self.host_state[name]
+            print(f"[DAEMON] {name}: {len(hs.fingerprints)} host(s) tracked, "
+                  f"{hs.unchanged} unchanged doc(s) skipped so far, "
+                  f"baseline cache hits {self.baselines[name].hits if name in self.baselines else 0}")
+        return run
+
+    def _on_signal(self, signum, _frame):
+        print(f"[DAEMON] received {signal.Signals(signum).name}; stopping after the current cycle")
+        self.stop.set()
+
+    def serve_forever(self) -> int:
+        signal.signal(signal.SIGTERM, self._on_signal)
+        signal.signal(signal.SIGINT, self._on_signal)
+        print(f"[DAEMON] platforms={','.join(self.platforms)} interval={self.interval}s "
+              f"baseline_ttl={self.baseline_ttl}s")
+        failures = 0
+        try:
+            while not self.stop.is_set():
+                started = time.monotonic()
+                try:
+                    if not self.cycle().ok:
+                        failures += 1
+                except Exception as e:
+                    failures += 1
+                    print(f"[DAEMON] cycle {self.cycles} crashed: {e!r}")
+                if self.max_cycles is not None and self.cycles >= self.max_cycles:
+                    break
+                # start-to-start interval; an overrunning cycle is followed immediately
+                wait_for = max(0.0, self.interval - (time.monotonic() - started))
+                if wait_for:
+                    print(f"[DAEMON] next cycle in {wait_for:.0f}s")
+                self.stop.wait(wait_for)
+        finally:
+            close_session()
+        print(f"[DAEMON] stopped after {self.cycles} cycle(s), {failures} failed")
+        # non-zero when any cycle failed, however the daemon was stopped (--max-cycles or a signal)
+        return 1 if failures else 0
@@ -0,0 +1,194 @@
+# dag.py
+"""
+Tiny stage-graph runner.
+
+Stages declare the stages they depend on; every stage whose dependencies are
+done is started right away on a thread pool, so independent steps (the Elastic
+fetch and the baseline scrape, or whole platforms) run side by side. After the
+run the critical path — the chain of stages that bounded the wall-clock time —
+is reported.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+
+@dataclass
+class Stage:
+    name: str
+    # fn(results) -> result; `results` maps every finished stage name to its result
+    fn: Callable[[Dict[str, Any]], Any]
+    deps: Tuple[str, ...] = ()
+
+
+@dataclass
+class StageResult:
+    name: str
+    status: str = "pending"          # ok | failed | skipped
+    result: Any = None
+    error: Optional[BaseException] = None
+    start: float = 0.0               # seconds since run start
+    end: float = 0.0
+
+    @property
+    def seconds(self) -> float:
+        return self.end - self.start
+
+
+@dataclass
+class DagRun:
+    stages: Dict[str, StageResult]
+    wall_seconds: float
+    critical_path: List[str] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return all(s.status == "ok" for s in self.stages.values())
+
+    def results(self) -> Dict[str, Any]:
+        return {n: s.result for n, s in self.stages.items() if s.status == "ok"}
+
+
+def prefixed(prefix: str, stages: Iterable[Stage]) -> List[Stage]:
+    """Namespace a platform's stages (`fetch` → `windows.fetch`) so several graphs can be merged."""
+    out = []
+    for st in stages:
+        def fn(results, _fn=st.fn):
+            local = {k[len(prefix) + 1:]: v for k, v in results.items() if k.startswith(prefix + ".")}
+            return _fn(local)
+        out.append(Stage(f"{prefix}.{st.name}", fn, tuple(f"{prefix}.{d}" for d in st.deps)))
+    return out
+
+
+def _check(stages: List[Stage]) -> None:
+    names = [s.name for s in stages]
+    if len(names) != len(set(names)):
+        raise ValueError("duplicate stage names")
+    known = set(names)
+    for s in stages:
+        missing = [d for d in s.deps if d not in known]
+        if missing:
+            raise ValueError(f"stage {s.name!r} depends on unknown {missing}")
+    # cycle check (Kahn)
+    indeg = {s.name: len(s.deps) for s in stages}
+    users = {s.name: [] for s in stages}
+    for s in stages:
+        for d in s.deps:
+            users[d].append(s.name)
+    ready = [n for n, k in indeg.items() if k == 0]
+    seen = 0
+    while ready:
+        n = ready.pop()
+        seen += 1
+        for u in users[n]:
+            indeg[u] -= 1
+            if indeg[u] == 0:
+                ready.append(u)
+    if seen != len(stages):
+        raise ValueError("stage graph has a cycle")
+
+
+def critical_path(stages: List[Stage], done: Dict[str, StageResult]) -> List[str]:
+    """Walk back from the last stage to finish through the dependency that finished last."""
+    by_name = {s.name: s for s in stages}
+    finished = [r for r in done.values() if r.status in ("ok", "failed")]
+    if not finished:
+        return []
+    node = max(finished, key=lambda r: r.end).name
+    path = [node]
+    while by_name[node].deps:
+        deps = [done[d] for d in by_name[node].deps if done[d].status in ("ok", "failed")]
+        if not deps:
+            break
+        node = max(deps, key=lambda r: r.end).name
+        path.append(node)
+    return list(reversed(path))
+
+
+def run_dag(stages: List[Stage], *, max_workers: int = 8, verbose: bool = True,
+            metrics=None, profiler=None) -> DagRun:
+    """
+    Run `stages` respecting their deps. A failed stage marks everything that
+    depends on it as skipped; independent branches keep going.
+    metrics: optional compliance.metrics.RunMetrics; every stage is recorded into it.
+    profiler: optional compliance.profiling.StageProfiler; stages then run one at
+    a time so their profiles do not mix.
+    """
+    _check(stages)
+    if profiler is not None:
+        max_workers = 1
+    by_name = {s.name: s for s in stages}
+    done: Dict[str, StageResult] = {s.name: StageResult(s.name) for s in stages}
+    results: Dict[str, Any] = {}
+    t0 = time.perf_counter()
+
+    def _measured(stage: Stage, inputs: Dict[str, Any]):
+        if metrics is None:
+            return stage.fn(inputs)
+        with metrics.stage(stage.name) as st:
+            result = stage.fn(inputs)
+            metrics.absorb(st, result)
+            return result
+
+    def _run(stage: Stage, inputs: Dict[str, Any]):
+        done[stage.name].start = time.perf_counter() - t0
+        try:
+            if profiler is not None:
+                with profiler.stage(stage.name):
+                    return _measured(stage, inputs)
+            return _measured(stage, inputs)
+        finally:
+            done[stage.name].end = time.perf_counter() - t0
+
+    pending = dict(by_name)
+    running = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while pending or running:
+            # skip stages whose deps failed; start stages whose deps are all ok
+            for name, st in list(pending.items()):
+                states = [done[d].status for d in st.deps]
+                if any(s in ("failed", "skipped") for s in states):
+                    done[name].status = "skipped"
+                    del pending[name]
+                    if verbose:
+                        print(f"[SKIP] {name} (dependency failed)")
+                elif all(s == "ok" for s in states):
+                    running[pool.submit(_run, st, dict(results))] = name
+                    del pending[name]
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                name = running.pop(fut)
+                res = done[name]
+                try:
+                    res.result = fut.result()
+                    res.status = "ok"
+                    results[name] = res.result
+                    if verbose:
+                        print(f"[STAGE] {name} ok in {res.seconds:.2f}s")
+                except BaseException as e:  # the fetchers sys.exit() on HTTP errors
+                    res.status = "failed"
+                    res.error = e
+                    print(f"[STAGE] {name} FAILED after {res.seconds:.2f}s: {e!r}")
+
+    run = DagRun(stages=done, wall_seconds=time.perf_counter() - t0)
+    if metrics is not None:
+        metrics.finish()
+    run.critical_path = critical_path(stages, done)
+    return run
+
+
+def report(run: DagRun) -> str:
+    lines = [f"Stages (wall {run.wall_seconds:.2f}s, "
+             f"sum of stage times {sum(s.seconds for s in run.stages.values()):.2f}s):"]
+    for s in sorted(run.stages.values(), key=lambda r: (r.start, r.name)):
+        if s.status == "skipped":
+            lines.append(f"  {s.name:<28} skipped")
+        else:
+            lines.append(f"  {s.name:<28} {s.status:<6} {s.start:7.2f}s → {s.end:7.2f}s  ({s.seconds:.2f}s)")
+    if run.critical_path:
+        cp = " → ".join(f"{n} ({run.stages[n].seconds:.2f}s)" for n in run.critical_path)
+        lines.append(f"Critical path: {cp}")
+    return "\n".join(lines)
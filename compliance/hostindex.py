@@ -0,0 +1,175 @@
+# hostindex.py
+"""
+Persistent index of hosts by OS line, for re-evaluating only what a baseline
+change touches.
+
+    python -m compliance run --mode async --index-dir .host_index    # full run, keeps the index
+    python -m compliance reevaluate --index-dir .host_index           # later: baseline-only run
+
+A full async run with an index directory (`--index-dir`, $HOST_INDEX_DIR)
+files every fetched row under its OS line — Windows build, macOS major, distro
++ major (`spec.line_of`) — and stores the baseline's value for each line
+(`spec.baseline_lines`, e.g. {"build-26100": 6899}). `reevaluate()` loads the
+current baseline, compares it line by line with the stored one, and compares
+and ships only the hosts on the lines that changed; no Elasticsearch fetch, so
+the run costs time in proportion to the affected hosts. Rows are the ones seen
+by the last full run.
+
+Layout, per platform:
+  <dir>/<platform>/index.json          line -> {file, hosts}, and the baseline signatures
+  <dir>/<platform>/lines/<line>.json   {host key: row} for one line
+
+The "*" signature is what lines without their own entry compare against (e.g.
+macOS majors that are not maintained, whose reason lists every maintained branch).
+"""
+import os
+import re
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from . import jsoncodec
+from .bulk import BulkEngine
+from .parallel import compare_rows
+from .partition import latest_alias, partitioned, retarget
+from .pipeline import PipelineSpec
+
+HOST_INDEX_DIR = os.getenv("HOST_INDEX_DIR", "")
+DEFAULT = "*"
+
+
+def _safe(line: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", line) or "_"
+
+
+def _atomic_json(path: str, data) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as fh:
+        jsoncodec.dump(data, fh)
+    os.replace(tmp, path)
+
+
+def _signature(sigs: dict, line: str):
+    return sigs.get(line, sigs.get(DEFAULT))
+
+
+class HostIndex:
+    def __init__(self, directory: str, platform: str):
+        self.root = os.path.join(directory, platform)
+        self.lines_dir = os.path.join(self.root, "lines")
+        self.manifest_path = os.path.join(self.root, "index.json")
+
+    def manifest(self) -> dict:
+        try:
+            with open(self.manifest_path, "rb") as fh:
+                return jsoncodec.load(fh)
+        except (OSError, ValueError):
+            return {}
+
+    def write(self, buckets: Dict[str, dict], signatures: dict) -> None:
+        """Replace the index with `buckets` ({line: {key: row}}) and the baseline's signatures."""
+        os.makedirs(self.lines_dir, exist_ok=True)
+        old = self.manifest().get("lines") or {}
+        lines = {}
+        for line, hosts in buckets.items():
+            fname = _safe(line) + ".json"
+            _atomic_json(os.path.join(self.lines_dir, fname),
+                         {k: (r.as_dict() if hasattr(r, "as_dict") else r) for k, r in hosts.items()})
+            lines[line] = {"file": fname, "hosts": len(hosts)}
+        for line, entry in old.items():
+            if line not in lines:
+                try:
+                    os.remove(os.path.join(self.lines_dir, entry["file"]))
+                except OSError:
+                    pass
+        self._write_manifest(lines, signatures)
+
+    def _write_manifest(self, lines: dict, signatures: dict) -> None:
+        _atomic_json(self.manifest_path, {
+            "updated_at": datetime.now(timezone.utc).isoformat(),
+            "lines": lines,
+            "signatures": signatures,
+        })
+
+    def changed_lines(self, signatures: dict) -> List[str]:
+        """Indexed lines whose baseline value differs from the stored one."""
+        manifest = self.manifest()
+        old = manifest.get("signatures") or {}
+        return [line for line in manifest.get("lines") or {}
+                if _signature(signatures, line) != _signature(old, line)]
+
+    def load_line(self, line: str, row_type=None) -> list:
+        entry = (self.manifest().get("lines") or {}).get(line)
+        if not entry:
+            return []
+        with open(os.path.join(self.lines_dir, entry["file"]), "rb") as fh:
+            rows = jsoncodec.load(fh)
+        return [row_type.from_dict(r) if row_type else r for r in rows.values()]
+
+    def save_signatures(self, signatures: dict) -> None:
+        self._write_manifest(self.manifest().get("lines") or {}, signatures)
+
+
+def indexes(spec: PipelineSpec) -> bool:
+    return bool(spec.line_of and spec.baseline_lines)
+
+
+class IndexWriter:
+    """Collects a full run's rows by line; `commit()` replaces the index."""
+
+    def __init__(self, spec: PipelineSpec, directory: str):
+        self.spec = spec
+        self.index = HostIndex(directory, spec.name)
+        self.buckets: Dict[str, dict] = {}
+
+    def add(self, rows) -> None:
+        line_of, key = self.spec.line_of, self.spec.row_key
+        for row in rows:
+            self.buckets.setdefault(line_of(row), {})[str(row.get(key))] = row
+
+    def commit(self, baseline: Any) -> None:
+        self.index.write(self.buckets, self.spec.baseline_lines(baseline))
+        hosts = sum(len(b) for b in self.buckets.values())
+        print(f"[OK] {self.spec.name}: indexed {hosts} host(s) on {len(self.buckets)} line(s) "
+              f"in {self.index.root}")
+
+
+def reevaluate(spec: PipelineSpec, directory: str = HOST_INDEX_DIR, *, state_dir: Optional[str] = None,
+               batch_size: int = 500, refresh: Optional[str] = None,
+               compare_workers: Optional[int] = None) -> dict:
+    """Compare and ship only the indexed hosts on lines whose baseline changed."""
+    if not indexes(spec):
+        raise ValueError(f"platform {spec.name!r} has no line_of/baseline_lines")
+    t0 = time.perf_counter()
+    index = HostIndex(directory, spec.name)
+    summary = {"platform": spec.name, "lines": [], "rows": 0, "docs": 0, "seconds": 0.0}
+    if not index.manifest():
+        print(f"[WARN] {spec.name}: no host index in {index.root}; run a full pass with --index-dir first")
+        return summary
+
+    baseline = spec.load_baseline()
+    signatures = spec.baseline_lines(baseline)
+    changed = index.changed_lines(signatures)
+    if not changed:
+        print(f"[OK] {spec.name}: baseline unchanged on every indexed line; nothing to re-evaluate")
+        index.save_signatures(signatures)
+        summary["seconds"] = round(time.perf_counter() - t0, 3)
+        return summary
+
+    rows = [row for line in changed for row in index.load_line(line, spec.row_type)]
+    records = (r for r in compare_rows(spec.evaluate, baseline, rows, workers=compare_workers)
+               if r is not None)
+    engine = BulkEngine(spec.es_url, spec.api_key_b64, batch_size=batch_size, refresh=refresh,
+                        state_dir=state_dir or spec.ship_state())
+    builder = spec.builder
+    if partitioned(spec.settings):
+        # update the hosts in place in the run the alias points to
+        builder = retarget(builder, latest_alias(spec.dest_index))
+    stats = engine.ship(records, builder)
+    # only now: a failed ship above leaves the old signatures, so the next run retries these lines
+    index.save_signatures(signatures)
+    summary.update(lines=changed, rows=len(rows), docs=stats.docs, bulk=stats.as_dict(),
+                   seconds=round(time.perf_counter() - t0, 3))
+    print(f"[DONE] {spec.name}: baseline changed on {len(changed)} line(s) ({', '.join(changed)}); "
+          f"re-evaluated {len(rows)} host(s), shipped {stats.docs} doc(s) in {summary['seconds']:.2f}s")
+    return summary
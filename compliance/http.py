@@ -0,0 +1,115 @@
+# http.py
+"""
+One pooled `requests.Session` per process.
+
+Every outbound call goes through `get_session()` so TCP/TLS connections are
+reused across requests instead of being set up again for each `requests.get`.
+
+COMPLIANCE_HTTP_RECORD / COMPLIANCE_HTTP_REPLAY (or `set_transport()`) swap the
+session's transport for the cassette recorder / player in compliance.cassette.
+"""
+import atexit
+import os
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "16"))
+
+# cassette paths; replay wins when both are set
+_transport = {
+    "record": os.getenv("COMPLIANCE_HTTP_RECORD") or None,
+    "replay": os.getenv("COMPLIANCE_HTTP_REPLAY") or None,
+    "latency": os.getenv("COMPLIANCE_HTTP_REPLAY_LATENCY", "").lower() in ("1", "true", "yes"),
+}
+
+_session: Optional[requests.Session] = None
+_lock = threading.Lock()
+
+# Object with an add_bytes(sent, received) method that responses are counted into
+# (see `count_bytes_into`); contextvars follow asyncio.to_thread into worker threads.
+_byte_counter: ContextVar = ContextVar("byte_counter", default=None)
+
+
+def _count_bytes(resp, *args, **kwargs):
+    counter = _byte_counter.get()
+    if counter is not None:
+        body = resp.request.body
+        sent = len(body) if isinstance(body, (bytes, str)) else 0
+        counter.add_bytes(sent, len(resp.content))
+    return resp
+
+
+def count_sent(n: int) -> None:
+    """Count request bytes the response hook cannot see (streamed, generator bodies)."""
+    counter = _byte_counter.get()
+    if counter is not None:
+        counter.add_bytes(n, 0)
+
+
+@contextmanager
+def count_bytes_into(counter):
+    """Count request/response body bytes of the shared session into `counter` while active."""
+    token = _byte_counter.set(counter)
+    try:
+        yield counter
+    finally:
+        _byte_counter.reset(token)
+
+
+def _build_adapter():
+    if _transport["replay"]:
+        from .cassette import ReplayAdapter
+        return ReplayAdapter(_transport["replay"], latency=_transport["latency"])
+    if _transport["record"]:
+        from .cassette import RecordingAdapter
+        return RecordingAdapter(_transport["record"], pool_connections=POOL_MAXSIZE,
+                                pool_maxsize=POOL_MAXSIZE)
+    return HTTPAdapter(pool_connections=POOL_MAXSIZE, pool_maxsize=POOL_MAXSIZE)
+
+
+def _build_session() -> requests.Session:
+    s = requests.Session()
+    adapter = _build_adapter()
+    s.mount("http://", adapter)
+    s.mount("https://", adapter)
+    s.hooks["response"].append(_count_bytes)
+    return s
+
+
+def get_session() -> requests.Session:
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                _session = _build_session()
+                if _transport["record"] or _transport["replay"]:
+                    # the cassette is only complete once its gzip stream is closed
+                    atexit.register(close_session)
+    return _session
+
+
+def close_session() -> None:
+    global _session
+    with _lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+def set_transport(record: Optional[str] = None, replay: Optional[str] = None,
+                  replay_latency: Optional[bool] = None) -> None:
+    """Record to / replay from a cassette file from now on (closes the current session)."""
+    close_session()
+    _transport["record"] = record
+    _transport["replay"] = replay
+    if replay_latency is not None:
+        _transport["latency"] = replay_latency
+
+
+def auth_headers(api_key_b64: Optional[str]) -> dict:
+    return {"Authorization": f"ApiKey {api_key_b64}"} if api_key_b64 else {}
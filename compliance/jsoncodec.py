@@ -0,0 +1,73 @@
+# jsoncodec.py
+"""
+One JSON codec for every stage: orjson when it is installed, else the stdlib.
+
+    from compliance import jsoncodec
+    data = jsoncodec.loads(resp.content)            # instead of resp.json()
+    body = jsoncodec.dumps(doc)                     # bytes, compact, UTF-8
+    jsoncodec.dump(payload, fh, indent=True)        # files (text or binary handles)
+
+Encoding and decoding is the main CPU cost of the pipelines: search pages
+coming in, per-agent files written and read back, bulk docs going out. orjson
+does both several times faster than the stdlib. Output is the same for both
+backends — compact separators, non-ASCII kept as UTF-8, non-string dict keys
+(e.g. `{22631: 6060}`) turned into strings, 2-space indent when asked for — so
+files and bodies do not change with the backend.
+
+JSON_CODEC=json forces the stdlib (e.g. to compare them, see `python -m
+bench.run --codecs`); `auto` (default) and `orjson` use orjson when importable.
+"""
+import json
+import os
+from typing import Any, Callable, Optional
+
+try:
+    import orjson
+except ImportError:  # optional: pip install orjson
+    orjson = None
+
+JSON_CODEC = os.getenv("JSON_CODEC", "auto").strip().lower()
+if JSON_CODEC not in ("auto", "orjson", "json"):
+    raise ValueError(f"JSON_CODEC must be auto, orjson or json, got {JSON_CODEC!r}")
+if JSON_CODEC == "orjson" and orjson is None:
+    print("[WARN] JSON_CODEC=orjson but orjson is not installed; using the stdlib json module")
+
+NAME = "orjson" if orjson is not None and JSON_CODEC != "json" else "json"
+
+if NAME == "orjson":
+    _OPTS = orjson.OPT_NON_STR_KEYS
+
+    def dumps(obj: Any, *, indent: bool = False, sort_keys: bool = False,
+              default: Optional[Callable[[Any], Any]] = None) -> bytes:
+        opts = _OPTS | (orjson.OPT_INDENT_2 if indent else 0) | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+        return orjson.dumps(obj, default=default, option=opts)
+
+    loads = orjson.loads
+else:
+    def dumps(obj: Any, *, indent: bool = False, sort_keys: bool = False,
+              default: Optional[Callable[[Any], Any]] = None) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, indent=2 if indent else None, sort_keys=sort_keys,
+                          default=default, separators=(",", ": ") if indent else (",", ":")).encode("utf-8")
+
+    def loads(data):
+        return json.loads(data)
+
+
+def dumps_str(obj: Any, **kwargs) -> str:
+    return dumps(obj, **kwargs).decode("utf-8")
+
+
+def load(fh) -> Any:
+    """Parse a whole file object, text or binary."""
+    return loads(fh.read())
+
+
+def dump(obj: Any, fh, **kwargs) -> None:
+    """Write `obj` to a file object opened in text ("w") or binary ("wb") mode."""
+    data = dumps(obj, **kwargs)
+    fh.write(data.decode("utf-8") if hasattr(fh, "encoding") else data)
+
+
+def response_json(resp) -> Any:
+    """`resp.json()` through this codec (the body is already UTF-8 bytes)."""
+    return loads(resp.content)
@@ -0,0 +1,267 @@
+# lookup.py
+"""
+Local lookup service: "is host X up to date?" without querying Elasticsearch.
+
+    python -m compliance run --mode async --lookup-dir .lookup     # each run writes a snapshot
+    python -m compliance serve --lookup-dir .lookup --port 8088
+
+    GET  /host/<agent name | host id | host name>     -> {"host", "found", "result"}
+    GET  /hosts?name=a&name=b                         -> {"results": {"a": result | null, ...}}
+    POST /hosts  {"hosts": ["a", "b", ...]}           -> same, for long lists
+    GET  /health                                      -> hosts loaded, per-platform snapshot times
+    POST /reload                                      -> reload now
+
+An async run with a lookup directory writes one result per compared host to
+`<dir>/<platform>.jsonl` — status as in compliance.rollup (compliant / behind /
+unsupported / unknown), version, OS line, days behind, reason — into a temp
+file renamed into place when the run is done, so a changed snapshot always
+means a finished run. The server keeps every snapshot in one in-memory dict
+keyed by lower-cased agent name, host id and host name, with each result
+already JSON-encoded: a lookup is a dict hit plus a byte join. It checks the
+snapshots' mtime every `reload` seconds (and on SIGHUP / POST /reload), builds
+the new dict off to the side and swaps it in, so requests never wait on a load.
+When a name is in several snapshots, the most recently observed result wins.
+"""
+import os
+import signal
+import threading
+import time
+from datetime import datetime, timezone
+from glob import glob
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from . import jsoncodec
+from .pipeline import PipelineSpec
+
+LOOKUP_DIR = os.getenv("LOOKUP_DIR", "")
+LOOKUP_PORT = int(os.getenv("LOOKUP_PORT", "8088"))
+LOOKUP_RELOAD_SECONDS = float(os.getenv("LOOKUP_RELOAD_SECONDS", "5"))
+# row fields a host can be looked up by
+KEY_FIELDS = ("agent_name", "id", "host_name")
+
+
+def _iso_now() -> str:
+    return datetime.now(timezone.utc).replace(microsecond=0).isoformat().replace("+00:00", "Z")
+
+
+# --- writing (runs) ---------------------------------------------------------
+
+class SnapshotWriter:
+    """Streams one platform's results to `<dir>/<platform>.jsonl.tmp`; `commit()` renames it into place."""
+
+    def __init__(self, spec: PipelineSpec, directory: str):
+        if spec.rollup_of is None:
+            raise ValueError(f"platform {spec.name!r} has no rollup_of")
+        self.spec = spec
+        self.path = os.path.join(directory, f"{spec.name}.jsonl")
+        self.checked_at = _iso_now()
+        self.hosts = 0
+        os.makedirs(directory, exist_ok=True)
+        self.fh = open(self.path + ".tmp", "wb")
+
+    def add(self, row, record, baseline) -> None:
+        status, days, version = self.spec.rollup_of(row, record, baseline)
+        result = record[1] if isinstance(record, tuple) else record
+        entry = {
+            "platform": self.spec.name,
+            **{f: row.get(f) for f in KEY_FIELDS if row.get(f) is not None},
+            "status": status,
+            "up_to_date": status == "compliant",
+            "version": version,
+            "line": self.spec.line_of(row) if self.spec.line_of else None,
+            "days_behind": days,
+            "reason": result.get("reason") if result is not None else None,
+            "observed_at": row.get("timestamp"),
+            "checked_at": self.checked_at,
+        }
+        self.fh.write(jsoncodec.dumps(entry) + b"\n")
+        self.hosts += 1
+
+    def commit(self) -> None:
+        self.fh.close()
+        os.replace(self.path + ".tmp", self.path)
+        print(f"[OK] {self.spec.name}: lookup snapshot of {self.hosts} host(s) → {self.path}")
+
+    def abort(self) -> None:
+        self.fh.close()
+        try:
+            os.remove(self.path + ".tmp")
+        except OSError:
+            pass
+
+
+# --- serving ----------------------------------------------------------------
+
+class HostLookup:
+    """The in-memory index over every `<platform>.jsonl` in `directory`."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.index: Dict[str, bytes] = {}
+        self.snapshots: Dict[str, dict] = {}
+        self.signature = None
+        self.loaded_at = None
+        self.reloads = 0
+        self._lock = threading.Lock()     # one load at a time; readers never take it
+
+    def _files(self) -> list:
+        return sorted(glob(os.path.join(self.directory, "*.jsonl")))
+
+    def _signature(self, files: list) -> tuple:
+        sig = []
+        for path in files:
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            sig.append((path, st.st_mtime_ns, st.st_size))
+        return tuple(sig)
+
+    def reload(self, force: bool = False) -> bool:
+        """Rebuild the index if a snapshot changed; True when a new index was swapped in."""
+        with self._lock:
+            files = self._files()
+            sig = self._signature(files)
+            if not force and sig == self.signature:
+                return False
+            t0 = time.perf_counter()
+            index, observed, snapshots = {}, {}, {}
+            for path in files:
+                platform = os.path.basename(path)[:-len(".jsonl")]
+                hosts = 0
+                with open(path, "rb") as fh:
+                    for line in fh:
+                        try:
+                            entry = jsoncodec.loads(line)
+                        except ValueError:
+                            continue
+                        encoded = jsoncodec.dumps(entry)
+                        seen = entry.get("observed_at") or ""
+                        for f in KEY_FIELDS:
+                            key = entry.get(f)
+                            if key is None:
+                                continue
+                            key = str(key).lower()
+                            if key in index and observed[key] > seen:
+                                continue
+                            index[key] = encoded
+                            observed[key] = seen
+                        hosts += 1
+                snapshots[platform] = {"hosts": hosts, "modified_at": datetime.fromtimestamp(
+                    os.path.getmtime(path), timezone.utc).isoformat().replace("+00:00", "Z")}
+            # readers hold the old dict until they are done with it
+            self.index, self.snapshots, self.signature = index, snapshots, sig
+            self.loaded_at = _iso_now()
+            self.reloads += 1
+            print(f"[OK] lookup: loaded {sum(s['hosts'] for s in snapshots.values())} host(s) "
+                  f"from {len(snapshots)} snapshot(s) in {time.perf_counter() - t0:.2f}s")
+            return True
+
+    def get(self, name: str) -> Optional[bytes]:
+        return self.index.get(str(name).lower())
+
+    def many(self, names) -> bytes:
+        index = self.index
+        parts = [jsoncodec.dumps(str(n)) + b":" + (index.get(str(n).lower()) or b"null")
+                 for n in names]
+        return b'{"results":{' + b",".join(parts) + b"}}"
+
+    def health(self) -> dict:
+        return {"hosts": sum(s["hosts"] for s in self.snapshots.values()), "keys": len(self.index),
+                "loaded_at": self.loaded_at, "reloads": self.reloads,
+                "snapshots": self.snapshots}
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # headers and body are separate writes; with Nagle on, keep-alive clients wait ~40 ms on each
+    disable_nagle_algorithm = True
+    lookup: HostLookup = None  # set by make_server
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status: int, payload):
+        data = payload if isinstance(payload, bytes) else jsoncodec.dumps(payload)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        parts = [unquote(p) for p in url.path.split("/") if p]
+        if len(parts) == 2 and parts[0] == "host":
+            found = self.lookup.get(parts[1])
+            name = jsoncodec.dumps(parts[1])
+            if found is None:
+                return self._send(404, b'{"host":' + name + b',"found":false,"result":null}')
+            return self._send(200, b'{"host":' + name + b',"found":true,"result":' + found + b"}")
+        if parts == ["hosts"]:
+            return self._send(200, self.lookup.many(parse_qs(url.query).get("name", [])))
+        if parts == ["health"]:
+            return self._send(200, self.lookup.health())
+        self._send(404, {"error": f"no route GET {url.path}"})
+
+    def do_POST(self):
+        path = urlsplit(self.path).path.rstrip("/")
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if path == "/hosts":
+            try:
+                names = jsoncodec.loads(body or b"{}").get("hosts")
+            except (ValueError, AttributeError):
+                names = None
+            if not isinstance(names, list):
+                return self._send(400, {"error": 'expected {"hosts": [...]}'})
+            return self._send(200, self.lookup.many(names))
+        if path == "/reload":
+            changed = self.lookup.reload(force=True)
+            return self._send(200, {"reloaded": changed, **self.lookup.health()})
+        self._send(404, {"error": f"no route POST {path}"})
+
+
+def make_server(lookup: HostLookup, host: str = "127.0.0.1", port: int = LOOKUP_PORT) -> ThreadingHTTPServer:
+    handler = type("BoundHandler", (Handler,), {"lookup": lookup})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def serve(directory: str = LOOKUP_DIR, host: str = "127.0.0.1", port: int = LOOKUP_PORT,
+          reload_seconds: float = LOOKUP_RELOAD_SECONDS) -> int:
+    """Load the snapshots, answer lookups, and pick up new ones until SIGTERM / SIGINT."""
+    lookup = HostLookup(directory)
+    lookup.reload()
+    server = make_server(lookup, host, port)
+    stop = threading.Event()
+
+    def watch():
+        while not stop.wait(reload_seconds):
+            try:
+                lookup.reload()
+            except Exception as e:
+                print(f"[WARN] lookup: reload failed, still serving the previous index: {e!r}")
+
+    def on_signal(signum, _frame):
+        if signum == getattr(signal, "SIGHUP", None):
+            threading.Thread(target=lookup.reload, kwargs={"force": True}, daemon=True).start()
+            return
+        print(f"[LOOKUP] received {signal.Signals(signum).name}; shutting down")
+        stop.set()
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    for sig in ("SIGTERM", "SIGINT", "SIGHUP"):
+        if hasattr(signal, sig):
+            signal.signal(getattr(signal, sig), on_signal)
+    if reload_seconds > 0:
+        threading.Thread(target=watch, name="lookup-reload", daemon=True).start()
+    print(f"[LOOKUP] serving {directory} on http://{host}:{server.server_address[1]} "
+          f"(reload check every {reload_seconds}s)")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+    return 0
@@ -0,0 +1,241 @@
+# metrics.py
+"""
+Per-stage run metrics.
+
+    metrics = RunMetrics("windows")
+    with metrics.stage("fetch") as st:
+        rows = get_elastic_updates()
+        st.docs = len(rows)
+    metrics.emit()          # METRICS_INDEX and/or METRICS_TEXTFILE
+
+Each stage records wall time, docs and docs/sec, HTTP bytes sent/received on
+the shared session, bulk retries and the process peak RSS when it ended. The
+run is emitted as one structured record: indexed into a metrics index and/or
+written as a Prometheus textfile (node_exporter textfile collector).
+"""
+import os
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+try:
+    import resource  # not available on Windows
+except ImportError:  # pragma: no cover
+    resource = None
+
+from . import jsoncodec
+from .http import count_bytes_into, get_session, auth_headers
+
+METRICS_INDEX = os.getenv("METRICS_INDEX")
+METRICS_TEXTFILE = os.getenv("METRICS_TEXTFILE")
+# cluster for METRICS_INDEX when the caller does not pass one
+METRICS_ES_URL = os.getenv("METRICS_ES_URL") or os.getenv("ES_URL")
+METRICS_API_KEY = os.getenv("METRICS_API_KEY") or os.getenv("API_KEY_B64")
+
+
+def peak_rss_bytes() -> int:
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+@dataclass
+class StageMetrics:
+    name: str
+    status: str = "ok"
+    seconds: float = 0.0
+    docs: int = 0
+    bytes_sent: int = 0
+    bytes_received: int = 0
+    retries: int = 0
+    peak_rss_bytes: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add_bytes(self, sent: int, received: int) -> None:
+        with self._lock:
+            self.bytes_sent += sent
+            self.bytes_received += received
+
+    @property
+    def docs_per_sec(self) -> float:
+        return self.docs / self.seconds if self.seconds else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "status": self.status,
+            "seconds": round(self.seconds, 4),
+            "docs": self.docs,
+            "docs_per_sec": round(self.docs_per_sec, 1),
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            "retries": self.retries,
+            "peak_rss_bytes": self.peak_rss_bytes,
+        }
+
+
+class RunMetrics:
+    def __init__(self, platform: str, run_id: Optional[str] = None):
+        self.platform = platform
+        self.run_id = run_id or uuid.uuid4().hex[:12]
+        self.started_at = datetime.now(timezone.utc)
+        self._t0 = time.perf_counter()
+        self.wall_seconds: Optional[float] = None
+        self.stages: Dict[str, StageMetrics] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, name: str) -> StageMetrics:
+        with self._lock:
+            if name not in self.stages:
+                self.stages[name] = StageMetrics(name)
+            return self.stages[name]
+
+    @contextmanager
+    def stage(self, name: str):
+        st = self._get(name)
+        t0 = time.perf_counter()
+        try:
+            with count_bytes_into(st):
+                yield st
+        except BaseException:
+            st.status = "failed"
+            raise
+        finally:
+            st.seconds += time.perf_counter() - t0
+            st.peak_rss_bytes = peak_rss_bytes()
+
+    def record(self, name: str, **fields) -> StageMetrics:
+        """Add a stage measured elsewhere (e.g. the overlapped phases of the async pipeline)."""
+        st = self._get(name)
+        for k, v in fields.items():
+            setattr(st, k, getattr(st, k) + v if k != "status" else v)
+        st.peak_rss_bytes = peak_rss_bytes()
+        return st
+
+    def absorb(self, st: StageMetrics, result) -> None:
+        """Pull doc counts / retries / sub-stage timings out of a stage's return value."""
+        prefix = st.name.rsplit(".", 1)[0] + "." if "." in st.name else ""
+        bulk = result if hasattr(result, "encode_seconds") else None
+        if isinstance(result, dict) and isinstance(result.get("bulk"), dict):
+            # compliance.aio summary: phases overlap, so each gets its own entry
+            b = result["bulk"]
+            st.docs = result.get("rows", 0)
+            st.retries = b.get("retries", 0)
+            phase_docs = {"fetch": result.get("rows", 0), "compare": result.get("rows", 0),
+                          "serialize": b.get("docs", 0), "ship": b.get("docs", 0)}
+            for phase, secs in (result.get("phases") or {}).items():
+                self.record(prefix + phase, seconds=secs, docs=phase_docs.get(phase, 0))
+            # fan-in over several clusters: one entry per source
+            for src in result.get("sources") or []:
+                self.record(f"{prefix}fetch.{src['name']}", seconds=src["seconds"],
+                            docs=src["rows"], status=src["status"])
+        elif bulk is not None:
+            st.docs = bulk.docs
+            st.retries = bulk.retries
+            self.record(prefix + "serialize", seconds=bulk.encode_seconds, docs=bulk.docs)
+        elif isinstance(result, dict) and "total" in result:
+            st.docs = result["total"]
+        elif isinstance(result, (list, tuple, dict, set)):
+            st.docs = len(result)
+
+    def finish(self) -> "RunMetrics":
+        if self.wall_seconds is None:
+            self.wall_seconds = time.perf_counter() - self._t0
+        return self
+
+    # --- output -----------------------------------------------------------
+
+    def to_doc(self) -> dict:
+        self.finish()
+        return {
+            "@timestamp": self.started_at.isoformat(),
+            "event": {"kind": "metric", "dataset": "compliance.run"},
+            "run_id": self.run_id,
+            "platform": self.platform,
+            "status": "ok" if all(s.status == "ok" for s in self.stages.values()) else "failed",
+            "wall_seconds": round(self.wall_seconds, 4),
+            "peak_rss_bytes": peak_rss_bytes(),
+            "docs": sum(s.docs for n, s in self.stages.items() if n.endswith("ship")),
+            "bytes_sent": sum(s.bytes_sent for s in self.stages.values()),
+            "bytes_received": sum(s.bytes_received for s in self.stages.values()),
+            "retries": sum(s.retries for s in self.stages.values()),
+            "stages": {n: s.as_dict() for n, s in self.stages.items()},
+        }
+
+    def to_prometheus(self) -> str:
+        doc = self.to_doc()
+        plat = self.platform.replace('"', "")
+        out = []
+
+        def metric(name, help_, samples):
+            out.append(f"# HELP {name} {help_}")
+            out.append(f"# TYPE {name} gauge")
+            for labels, value in samples:
+                lbl = ",".join(f'{k}="{v}"' for k, v in labels.items())
+                out.append(f"{name}{{{lbl}}} {value}")
+
+        base = {"platform": plat}
+        metric("compliance_run_timestamp_seconds", "Start time of the last run.",
+               [(base, int(self.started_at.timestamp()))])
+        metric("compliance_run_seconds", "Wall time of the last run.", [(base, doc["wall_seconds"])])
+        metric("compliance_run_success", "1 if every stage of the last run succeeded.",
+               [(base, 1 if doc["status"] == "ok" else 0)])
+        metric("compliance_run_peak_rss_bytes", "Peak resident memory of the last run.",
+               [(base, doc["peak_rss_bytes"])])
+        for key, help_ in (
+            ("seconds", "Wall time per stage."),
+            ("docs", "Documents handled per stage."),
+            ("docs_per_sec", "Throughput per stage."),
+            ("bytes_sent", "HTTP request bytes per stage."),
+            ("bytes_received", "HTTP response bytes per stage."),
+            ("retries", "Bulk retries per stage."),
+        ):
+            metric(f"compliance_stage_{key}", help_,
+                   [({**base, "stage": n}, s[key]) for n, s in doc["stages"].items()])
+        return "\n".join(out) + "\n"
+
+    def write_prometheus(self, path: str) -> None:
+        # write-then-rename so the collector never scrapes a partial file
+        os.makedirs(os.path.dirname(os.path.abspath(path)) or ".", exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            fh.write(self.to_prometheus())
+        os.replace(tmp, path)
+        print(f"[OK] wrote run metrics to {path}")
+
+    def ship(self, es_url: str, api_key_b64: Optional[str], index: str) -> None:
+        doc = self.to_doc()
+        resp = get_session().post(
+            f"{es_url.rstrip('/')}/{index}/_doc",
+            data=jsoncodec.dumps(doc),
+            headers={"Content-Type": "application/json", **auth_headers(api_key_b64)},
+            timeout=30,
+        )
+        resp.raise_for_status()
+        print(f"[OK] shipped run metrics {self.run_id} to '{index}'")
+
+    def emit(self, *, es_url: Optional[str] = None, api_key_b64: Optional[str] = None,
+             index: Optional[str] = None, textfile: Optional[str] = None) -> dict:
+        """Write/ship the run record wherever configured; failures here never fail the run."""
+        index = index or METRICS_INDEX
+        textfile = textfile or METRICS_TEXTFILE
+        es_url = es_url or METRICS_ES_URL
+        api_key_b64 = api_key_b64 or METRICS_API_KEY
+        doc = self.to_doc()
+        if textfile:
+            try:
+                self.write_prometheus(textfile)
+            except OSError as e:
+                print(f"[WARN] could not write metrics textfile {textfile}: {e}")
+        if index and es_url:
+            try:
+                self.ship(es_url, api_key_b64, index)
+            except Exception as e:
+                print(f"[WARN] could not ship run metrics to '{index}': {e}")
+        return doc
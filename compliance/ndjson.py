@@ -0,0 +1,122 @@
+# ndjson.py
+"""
+Line-by-line JSON files (and pipes) between the Linux fetch → compare → ship
+scripts.
+
+    OUTFILE=- python linux/FetchOsFromElastic/ElasticOsFetch.py \\
+      | HOSTS=- OUTFILE=- SNAPSHOT=ubuntu_releases.json python linux/comparator/OSComparison.py \\
+      | INPUT=- ES_URL=... ES_INDEX=... python linux/shipper.py
+
+One object per line means each stage handles a host and hands it on without
+holding the file: memory stays flat however large the fleet, and in a pipe the
+next stage starts on the first host instead of waiting for the whole file.
+
+  - `-` as a path is stdin / stdout. While a stage writes to stdout, anything
+    else it prints goes to stderr (and `log` says where to print afterwards), so
+    stdout carries only data.
+  - Readers take either format: a file starting with `[` is the old JSON array
+    (read whole, for files written before this), anything else is NDJSON.
+  - IO_FORMAT=json writes the old indented JSON array instead (collected and
+    written at the end), for tools that still expect it.
+  - Files are written to `<path>.tmp` and renamed when the stage finishes, so a
+    stage that fails never leaves a truncated file for the next one.
+"""
+import os
+import sys
+from contextlib import contextmanager, redirect_stdout
+from typing import Any, Iterator
+
+from . import jsoncodec
+
+IO_FORMAT = os.getenv("IO_FORMAT", "ndjson").strip().lower()
+STDIO = "-"
+
+
+def out_format() -> str:
+    if IO_FORMAT not in ("ndjson", "json"):
+        raise ValueError(f"IO_FORMAT must be ndjson or json, got {IO_FORMAT!r}")
+    return IO_FORMAT
+
+
+def default_path(stem: str) -> str:
+    """`<stem>.ndjson`, or `<stem>.json` with IO_FORMAT=json."""
+    return f"{stem}.{out_format()}"
+
+
+def log(path: str):
+    """Where status lines go while `path` is written: stderr when it is stdout."""
+    return sys.stderr if path == STDIO else sys.stdout
+
+
+@contextmanager
+def reading(path: str):
+    """Binary handle on `path`, or on stdin for `-`."""
+    if path == STDIO:
+        yield sys.stdin.buffer
+        return
+    with open(path, "rb") as fh:
+        yield fh
+
+
+def read(fh) -> Iterator[Any]:
+    """Objects from an NDJSON stream, or the items of a JSON array file."""
+    for line in fh:
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith(b"["):
+            data = jsoncodec.loads(line + fh.read())
+            if not isinstance(data, list):
+                raise ValueError("expected a JSON array or one JSON object per line")
+            yield from data
+            return
+        yield jsoncodec.loads(line)
+
+
+class Writer:
+    """`write(obj)` one object at a time; IO_FORMAT=json keeps them for one array at `close()`."""
+
+    def __init__(self, fh, fmt: str):
+        self.fh = fh
+        self.fmt = fmt
+        self.items = [] if fmt == "json" else None
+        self.count = 0
+
+    def write(self, obj: Any) -> None:
+        if self.items is not None:
+            self.items.append(obj)
+        else:
+            self.fh.write(jsoncodec.dumps(obj) + b"\n")
+        self.count += 1
+
+    def close(self) -> None:
+        if self.items is not None:
+            jsoncodec.dump(self.items, self.fh, indent=True)
+            self.items = None
+        self.fh.flush()
+
+
+@contextmanager
+def writing(path: str, fmt: str = ""):
+    """Writer on `path` (via `<path>.tmp`, renamed on success) or on stdout for `-`."""
+    fmt = fmt or out_format()
+    if path == STDIO:
+        writer = Writer(sys.stdout.buffer, fmt)
+        with redirect_stdout(sys.stderr):
+            yield writer
+        writer.close()
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(path)) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    try:
+        with open(tmp, "wb") as fh:
+            writer = Writer(fh, fmt)
+            yield writer
+            writer.close()
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,140 @@
+# parallel.py
+"""
+Multi-core comparison: evaluate fetched rows in a process pool.
+
+    for record in compare_rows(evaluate_row, ms_latest, rows, workers=4):
+        ...                                   # same order as `rows`
+
+Rows are split into chunks of `chunk_size` and each chunk is one task, so
+pickling costs one round trip per chunk instead of per row. The baseline is
+handed to every worker once, by the pool initializer (pickled once per worker,
+not per chunk), and the compare function is re-imported from its file there.
+
+Workers are started with `forkserver` (`spawn` where that is missing), never
+`fork`: the runners call this from a process that already has threads (the DAG
+runner, the asyncio pipeline's to_thread workers, HTTP pools), and a forked
+child can inherit a lock some other thread was holding. COMPARE_START_METHOD
+overrides the choice. At most
+`workers * 2` chunks are in flight, and results are yielded in input order as
+soon as the head chunk is done, so memory stays bounded on large fleets.
+
+workers <= 1 evaluates in-process with no pool (the default).
+"""
+import asyncio
+import importlib
+import multiprocessing
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, List, Optional
+
+COMPARE_WORKERS = int(os.getenv("COMPARE_WORKERS", "0"))
+COMPARE_CHUNK_SIZE = int(os.getenv("COMPARE_CHUNK_SIZE", "500"))
+COMPARE_START_METHOD = os.getenv("COMPARE_START_METHOD", "")
+
+REPO_ROOT = str(Path(__file__).resolve().parent.parent)
+
+# per-worker state set by _init
+_func: Callable = None
+_baseline: Any = None
+_extra: tuple = ()
+
+
+def _func_ref(func: Callable) -> tuple:
+    """(directory, module, qualname) so a spawned worker can import `func` itself."""
+    path = func.__globals__.get("__file__")
+    if not path:
+        raise ValueError(f"{func!r} is not defined in a module file")
+    return os.path.dirname(os.path.abspath(path)), func.__module__, func.__qualname__
+
+
+def _init(ref, baseline, extra) -> None:
+    global _func, _baseline, _extra
+    directory, module, qualname = ref
+    for p in (REPO_ROOT, directory):
+        if p not in sys.path:
+            sys.path.insert(0, p)
+    func = importlib.import_module(module)
+    for part in qualname.split("."):
+        func = getattr(func, part)
+    _func, _baseline, _extra = func, baseline, extra
+
+
+def _context():
+    """forkserver, or spawn where there is none; never fork (see the module docstring)."""
+    method = COMPARE_START_METHOD
+    if not method:
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    if method == "fork":
+        raise ValueError("COMPARE_START_METHOD=fork is unsafe from the threaded runners; use forkserver or spawn")
+    return multiprocessing.get_context(method)
+
+
+def _eval_chunk(rows: List[dict]) -> list:
+    return [_func(row, _baseline, *_extra) for row in rows]
+
+
+def _chunks(rows: Iterable, size: int) -> Iterator[list]:
+    it = iter(rows)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class ComparePool:
+    """A process pool bound to one compare function and baseline."""
+
+    def __init__(self, func: Callable, baseline: Any, *, workers: int = COMPARE_WORKERS,
+                 chunk_size: int = COMPARE_CHUNK_SIZE, extra: tuple = ()):
+        self.workers = max(1, workers)
+        self.chunk_size = max(1, chunk_size)
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=_context(), initializer=_init,
+                                         initargs=(_func_ref(func), baseline, tuple(extra)))
+
+    def map(self, rows: Iterable) -> Iterator:
+        """Results in input order, streamed; at most workers * 2 chunks in flight."""
+        window = deque()
+        for chunk in _chunks(rows, self.chunk_size):
+            window.append(self._pool.submit(_eval_chunk, chunk))
+            if len(window) >= self.workers * 2:
+                yield from window.popleft().result()
+        while window:
+            yield from window.popleft().result()
+
+    async def map_async(self, rows: list) -> list:
+        """All of `rows`, in order, without blocking the event loop."""
+        futures = [asyncio.wrap_future(self._pool.submit(_eval_chunk, chunk))
+                   for chunk in _chunks(rows, self.chunk_size)]
+        out = []
+        for part in await asyncio.gather(*futures):
+            out.extend(part)
+        return out
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def compare_rows(func: Callable, baseline: Any, rows: Iterable, *, workers: Optional[int] = None,
+                 chunk_size: int = COMPARE_CHUNK_SIZE, extra: tuple = ()) -> Iterator:
+    """
+    `func(row, baseline, *extra)` for every row, in order; in a process pool when
+    workers > 1 (None: $COMPARE_WORKERS).
+    """
+    workers = COMPARE_WORKERS if workers is None else workers
+    if workers <= 1:
+        for row in rows:
+            yield func(row, baseline, *extra)
+        return
+    with ComparePool(func, baseline, workers=workers, chunk_size=chunk_size, extra=extra) as pool:
+        yield from pool.map(rows)
@@ -0,0 +1,141 @@
+# partition.py
+"""
+Append-only, time-partitioned destination indices.
+
+    PARTITION_MODE=run python -m compliance run --mode async
+
+Instead of overwriting documents by `_id` in one ever-growing index, every run
+writes into its own index, `<dest>-run-<UTC yyyymmdd-hhmmss>`, with `create`
+ops: the index is new, so nothing is overwritten and no earlier version has to
+be looked up and deleted. Once the whole run is acknowledged without rejected
+items, the partition is refreshed and the `<dest>-latest` alias is moved to it
+in one `_aliases` call, so readers switch from one complete run to the next and
+never see a half-written one. Then all but the newest PARTITION_RETENTION
+partitions are deleted (never the one the alias points to). A run that fails
+leaves its partition unaliased; retention removes it later. A run with no
+documents to write (e.g. a Linux fleet with every host up to date) still gets
+its partition, created empty through the template, so `-latest` shows that.
+
+Queries for the current state go to `<dest>-latest` (one run's documents);
+history stays queryable through `<dest>-run-*` for as long as it is retained.
+`_id`s are kept, so a retried batch gets 409s for documents that had already
+landed, which compliance.bulk counts as `existing`, not failed.
+"""
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from . import jsoncodec
+from .bulk import BulkStats
+from .http import auth_headers, get_session
+from .pipeline import Settings
+
+STAMP = "%Y%m%d-%H%M%S"
+
+
+def partitioned(settings: Optional[Settings] = None) -> bool:
+    """PARTITION_MODE=run in `settings` (a spec's, else the current environment's)."""
+    mode = (settings or Settings.from_env()).partition_mode
+    if mode not in ("", "off", "run"):
+        raise ValueError(f"PARTITION_MODE must be 'run' or empty, got {mode!r}")
+    return mode == "run"
+
+
+class Partition:
+    def __init__(self, es_url: str, api_key_b64: Optional[str], base_index: str, *,
+                 retention: Optional[int] = None, now: Optional[datetime] = None):
+        self.es_url = es_url.rstrip("/")
+        self.headers = {"Content-Type": "application/json", **auth_headers(api_key_b64)}
+        self.base = base_index
+        self.prefix = f"{base_index}-run-"
+        self.index = self.prefix + (now or datetime.now(timezone.utc)).strftime(STAMP)
+        self.alias = latest_alias(base_index)
+        self.retention = max(1, Settings.from_env().partition_retention if retention is None else retention)
+
+    def wrap(self, builder):
+        """Builder → same docs as `create` ops into this run's partition."""
+        return retarget(builder, self.index, op="create")
+
+    # --- cluster calls ------------------------------------------------------
+
+    def _call(self, method: str, path: str, body=None, missing_ok: bool = False):
+        """JSON response; None for a 404 when `missing_ok` (no such index / alias)."""
+        resp = get_session().request(method, f"{self.es_url}/{path}", headers=self.headers, timeout=60,
+                                     data=jsoncodec.dumps(body) if body is not None else None)
+        if resp.status_code == 404 and missing_ok:
+            return None
+        if not resp.ok:
+            raise RuntimeError(f"{method} /{path}: HTTP {resp.status_code} {resp.text[:300]}")
+        return jsoncodec.response_json(resp) if resp.content else {}
+
+    def create(self) -> bool:
+        """PUT this run's partition (the index template applies); False when it already exists."""
+        resp = get_session().put(f"{self.es_url}/{self.index}", headers=self.headers, timeout=60)
+        if resp.status_code == 400 and "resource_already_exists" in resp.text:
+            return False
+        if not resp.ok:
+            raise RuntimeError(f"PUT /{self.index}: HTTP {resp.status_code} {resp.text[:300]}")
+        return True
+
+    def partitions(self) -> List[str]:
+        """This destination's run partitions, oldest first (the stamp sorts by time)."""
+        rows = self._call("GET", f"_cat/indices/{self.prefix}*?format=json&h=index&expand_wildcards=open",
+                          missing_ok=True)
+        return sorted(r["index"] for r in rows or [] if r.get("index", "").startswith(self.prefix))
+
+    def aliased(self) -> List[str]:
+        found = self._call("GET", f"_alias/{self.alias}", missing_ok=True)
+        return sorted(i for i, v in (found or {}).items() if self.alias in (v.get("aliases") or {}))
+
+    # --- end of run ---------------------------------------------------------
+
+    def commit(self, stats: Optional[BulkStats] = None) -> bool:
+        """Point `<dest>-latest` at this run's partition and prune old ones; False if the run is incomplete."""
+        if stats is not None and (stats.failed or stats.dead_lettered):
+            print(f"[WARN] {self.index}: {stats.failed} rejected / {stats.dead_lettered} dead-lettered "
+                  f"item(s); '{self.alias}' stays where it is")
+            return False
+        # nothing was written (no docs this run): the alias needs the index to exist
+        if self.create():
+            print(f"[INFO] {self.index}: no documents this run; created it empty")
+        self._call("POST", f"{self.index}/_refresh", missing_ok=True)
+        previous = [i for i in self.aliased() if i != self.index]
+        actions = [{"remove": {"index": i, "alias": self.alias}} for i in previous]
+        actions.append({"add": {"index": self.index, "alias": self.alias}})
+        self._call("POST", "_aliases", {"actions": actions})
+        print(f"[OK] '{self.alias}' → {self.index}" + (f" (was {', '.join(previous)})" if previous else ""))
+        self.prune()
+        return True
+
+    def prune(self) -> List[str]:
+        parts = self.partitions()
+        keep = set(parts[-self.retention:]) | {self.index}
+        drop = [p for p in parts if p not in keep]
+        if drop:
+            self._call("DELETE", ",".join(drop), missing_ok=True)
+            print(f"[OK] retention {self.retention}: deleted {len(drop)} old partition(s) of '{self.base}'")
+        return drop
+
+
+def latest_alias(base_index: str) -> str:
+    return f"{base_index}-latest"
+
+
+def retarget(builder, index: str, op: Optional[str] = None):
+    """Builder → same docs into `index` (and as `op` ops when given)."""
+    def retargeted(record):
+        item = builder(record)
+        if item is None:
+            return None
+        action, doc = item
+        (old_op, meta), = action.items()
+        return {op or old_op: {**meta, "_index": index}}, doc
+    return retargeted
+
+
+def for_run(es_url: str, api_key_b64: Optional[str], base_index: str,
+            settings: Optional[Settings] = None) -> Optional[Partition]:
+    """A Partition for this run when PARTITION_MODE=run in `settings` (see `partitioned`), else None."""
+    settings = settings or Settings.from_env()
+    if not partitioned(settings):
+        return None
+    return Partition(es_url, api_key_b64, base_index, retention=settings.partition_retention)
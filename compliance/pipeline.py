@@ -0,0 +1,99 @@
+# pipeline.py
+"""
+What a platform plugs into the shared runners.
+
+Each platform folder has a `pipeline.py` with a `spec()` function returning a
+`PipelineSpec`; the runners (asyncio mode, DAG runner, ...) only talk to that.
+
+The destination settings a platform's `.env` may set (PARTITION_MODE,
+ROLLUP_INDEX, INDEX_SHARDS, ...) travel in `spec.settings`, read by the
+platform's config when its `.env` is loaded: compliance.platforms loads
+several platforms into one process, so module-level constants would keep
+whichever platform was imported first.
+"""
+import os
+from dataclasses import dataclass, field
+from typing import Any, Callable, List, Optional, Set, Tuple
+
+from .bulk.state import STATE_DIRNAME
+
+
+@dataclass(frozen=True)
+class Settings:
+    # compliance.partition: "" = write into the destination index; "run" = one index per run
+    partition_mode: str = ""
+    partition_retention: int = 14
+    # compliance.rollup: "" = "<dest_index>-rollup"
+    rollup_index: str = ""
+    rollup_top_versions: int = 50
+    # compliance.templates
+    index_templates: str = "install"
+    index_shards: int = 1
+    index_replicas: str = ""            # "" = cluster default
+    index_refresh_interval: str = "30s"
+    index_template_priority: int = 200
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        """The settings in `os.environ` now; call it while the platform's `.env` is loaded."""
+        env = os.environ
+        return cls(
+            partition_mode=env.get("PARTITION_MODE", "").strip().lower(),
+            partition_retention=int(env.get("PARTITION_RETENTION", "14")),
+            rollup_index=env.get("ROLLUP_INDEX", ""),
+            rollup_top_versions=int(env.get("ROLLUP_TOP_VERSIONS", "50")),
+            index_templates=env.get("INDEX_TEMPLATES", "install").strip().lower(),
+            index_shards=int(env.get("INDEX_SHARDS", "1")),
+            index_replicas=env.get("INDEX_REPLICAS", ""),
+            index_refresh_interval=env.get("INDEX_REFRESH_INTERVAL", "30s"),
+            index_template_priority=int(env.get("INDEX_TEMPLATE_PRIORITY", "200")),
+        )
+
+
+@dataclass
+class PipelineSpec:
+    name: str
+    es_url: str
+    api_key_b64: Optional[str]
+    source_index: str
+    dest_index: str
+    # Server-side filter and `_source` fields for the fetch
+    query: Optional[dict]
+    source_fields: Optional[List[str]]
+    # () -> baseline, e.g. {build: latest_ubr} for Windows
+    load_baseline: Callable[[], Any]
+    # (hits, seen) -> rows (compliance.records types); `seen` is shared across pages for per-host dedup
+    rows_from_hits: Callable[[list, set], list]
+    # (row, baseline) -> record to ship, or None
+    evaluate: Callable[[Any, Any], Optional[Any]]
+    # record -> (action, doc), see compliance.bulk.builders
+    builder: Callable[[Any], Optional[Tuple[dict, dict]]]
+    # keyword field hashed by compliance.shard for `--shard i/N` runs
+    shard_field: Optional[str] = None
+    # row field identifying a host, for the newest-per-host merge across sources
+    row_key: Optional[str] = None
+    # compliance.sources.Source list; None/one entry = es_url + source_index above
+    sources: Optional[list] = None
+    # compliance.hostindex: row -> OS line, baseline -> {line: value} (plus "*"), and the
+    # compliance.records row class the index files are read back into
+    line_of: Optional[Callable[[Any], str]] = None
+    baseline_lines: Optional[Callable[[Any], dict]] = None
+    row_type: Optional[type] = None
+    # compliance.rollup: (row, record or None, baseline) -> (status, days_behind, version)
+    rollup_of: Optional[Callable[[Any, Any, Any], Tuple[str, Optional[int], Optional[str]]]] = None
+    # compliance.templates: destination doc fields -> mapping, and the keyword field to sort the index by
+    mappings: Optional[dict] = None
+    index_sort: Optional[str] = None
+    # compliance.bulk checkpoint + dead letters, shared with the platform's own shipper
+    # (`<out_dir>/.ship_state`); None = `.ship_state/<name>` under the working directory
+    state_dir: Optional[str] = None
+    # (actions, positions not indexed) after each bulk batch of a run; every position when the
+    # whole batch failed (compliance.daemon.HostStateFilter.settle)
+    on_batch: Optional[Callable[[List[dict], Set[int]], None]] = None
+    # partition / rollup / template settings from the platform's config (Settings.from_env)
+    settings: Settings = field(default_factory=Settings.from_env)
+    extra: dict = field(default_factory=dict)
+
+    def ship_state(self, *sub: str) -> str:
+        """The bulk state directory, or a subdirectory of it for runs that ship on their own (tail, shards)."""
+        return os.path.abspath(os.path.join(self.state_dir or os.path.join(STATE_DIRNAME, self.name), *sub))
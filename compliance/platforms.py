@@ -0,0 +1,71 @@
+# platforms.py
+"""
+Load the platform folders side by side in one process.
+
+Windows/ and macOS/ (and the linux/ scripts) are written as standalone script
+folders, so they share top-level module names like `config`, `fetch_from_elastic`,
+`create_json` and `pipeline`. `load_platform()` imports one folder with its
+own directory at the front of `sys.path`, then takes those modules back out of
+`sys.modules` so the next platform gets its own copies. `os.environ` is restored
+after the import too, so one platform's `.env` (read by its config.py at import
+time) does not leak into the next platform's config. Settings the shared
+`compliance` modules use (PARTITION_MODE, ROLLUP_INDEX, INDEX_SHARDS, ...) reach
+them through each platform's `spec().settings`, captured by its config while
+its `.env` was loaded, never through module constants.
+"""
+import importlib
+import os
+import sys
+import threading
+from pathlib import Path
+from types import ModuleType
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+PLATFORM_DIRS = {
+    "windows": [REPO_ROOT / "Windows"],
+    "macos": [REPO_ROOT / "macOS"],
+    "linux": [
+        REPO_ROOT / "linux",
+        REPO_ROOT / "linux" / "FetchOsFromElastic",
+        REPO_ROOT / "linux" / "comparator",
+        REPO_ROOT / "linux" / "FetchFromDistro",
+    ],
+}
+PLATFORMS = tuple(PLATFORM_DIRS)
+
+_lock = threading.Lock()
+_loaded: dict = {}
+
+
+def load_platform(name: str, module: str = "pipeline") -> ModuleType:
+    """Import `module` (default: the platform's pipeline.py) from platform `name`."""
+    name = name.lower()
+    if name not in PLATFORM_DIRS:
+        raise ValueError(f"unknown platform {name!r}; known: {', '.join(PLATFORMS)}")
+    key = (name, module)
+    with _lock:
+        if key in _loaded:
+            return _loaded[key]
+
+        dirs = [str(d) for d in PLATFORM_DIRS[name]]
+        local = {p.stem for d in PLATFORM_DIRS[name] for p in d.glob("*.py")}
+        saved = {n: sys.modules.pop(n) for n in local if n in sys.modules}
+        saved_env = dict(os.environ)
+        sys.path[:0] = dirs
+        try:
+            mod = importlib.import_module(module)
+            # keep the platform's other modules reachable as attributes for callers
+            mod_set = {n: sys.modules[n] for n in local if n in sys.modules}
+        finally:
+            for d in dirs:
+                sys.path.remove(d)
+            for n in local:
+                sys.modules.pop(n, None)
+            sys.modules.update(saved)
+            os.environ.clear()
+            os.environ.update(saved_env)
+
+        mod.platform_modules = mod_set
+        _loaded[key] = mod
+        return mod
@@ -0,0 +1,109 @@
+# profiling.py
+"""
+Per-stage CPU and allocation profiles.
+
+    profiler = StageProfiler("profiles/20251020-101500")
+    with profiler.stage("compare"):
+        ...
+    profiler.close()
+
+For every stage the output directory gets:
+  <stage>.pstats       raw cProfile data (snakeviz, `python -m pstats`)
+  <stage>.txt          top functions by cumulative and by own time
+  <stage>.alloc.txt    peak traced memory and the source lines that grew the most
+
+Nothing here is imported or run unless profiling was asked for; callers pass
+`profiler=None` otherwise. cProfile only sees the thread that runs the stage
+(on Python < 3.12), so the DAG runners execute stages one at a time while
+profiling, and in async mode the work done in `asyncio.to_thread` workers shows
+up as time waiting on the event loop.
+"""
+import cProfile
+import io
+import os
+import pstats
+import re
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+TOP_FUNCTIONS = int(os.getenv("PROFILE_TOP", "40"))
+TOP_ALLOCATIONS = 25
+
+
+def _safe(name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", name)
+
+
+class StageProfiler:
+    def __init__(self, out_dir: str, *, trace_frames: int = 1):
+        self.out_dir = os.path.abspath(out_dir)
+        os.makedirs(self.out_dir, exist_ok=True)
+        self._started_tracemalloc = not tracemalloc.is_tracing()
+        if self._started_tracemalloc:
+            tracemalloc.start(trace_frames)
+        self._lock = threading.Lock()
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name: str):
+        prof = cProfile.Profile()
+        try:
+            prof.enable()
+        except ValueError:
+            # Python 3.12+: another stage's profiler is already active
+            prof = None
+        with self._lock:
+            tracemalloc.reset_peak()
+            before = tracemalloc.take_snapshot()
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - t0
+            if prof is not None:
+                prof.disable()
+            with self._lock:
+                after = tracemalloc.take_snapshot()
+                current, peak = tracemalloc.get_traced_memory()
+            self._write(name, prof, seconds, before, after, current, peak)
+
+    def _write(self, name, prof, seconds, before, after, current, peak) -> None:
+        base = os.path.join(self.out_dir, _safe(name))
+        if prof is not None:
+            prof.dump_stats(base + ".pstats")
+            buf = io.StringIO()
+            buf.write(f"stage {name}: {seconds:.3f}s wall\n\n")
+            stats = pstats.Stats(prof, stream=buf).strip_dirs()
+            buf.write("== by cumulative time ==\n")
+            stats.sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+            buf.write("== by own time ==\n")
+            stats.sort_stats("tottime").print_stats(TOP_FUNCTIONS)
+            with open(base + ".txt", "w", encoding="utf-8") as fh:
+                fh.write(buf.getvalue())
+
+        # leave out the profiler's own bookkeeping (e.g. the previous stage's report)
+        filters = [tracemalloc.Filter(False, f) for f in
+                   (tracemalloc.__file__, pstats.__file__, cProfile.__file__, __file__,
+                    "<frozen importlib._bootstrap>")]
+        diff = after.filter_traces(filters).compare_to(before.filter_traces(filters), "lineno")
+        diff = sorted((d for d in diff if d.size_diff > 0), key=lambda d: d.size_diff, reverse=True)
+        with open(base + ".alloc.txt", "w", encoding="utf-8") as fh:
+            fh.write(f"stage {name}: peak traced {peak / 2**20:.1f} MiB, "
+                     f"still allocated at end {current / 2**20:.1f} MiB\n\n")
+            fh.write(f"== top {TOP_ALLOCATIONS} lines by memory growth ==\n")
+            for stat in diff[:TOP_ALLOCATIONS]:
+                fh.write(f"{stat}\n")
+        self.stages.append(name)
+        print(f"[PROFILE] {name}: {seconds:.2f}s, peak traced {peak / 2**20:.1f} MiB → {base}.*")
+
+    def close(self) -> None:
+        if self._started_tracemalloc and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        print(f"[PROFILE] {len(self.stages)} stage report(s) in {self.out_dir}")
+
+
+def default_dir(base: str = ".") -> str:
+    """profiles/<timestamp> next to the run output."""
+    return os.path.join(base, "profiles", time.strftime("%Y%m%d-%H%M%S"))
@@ -0,0 +1,143 @@
+# records.py
+"""
+Compact per-host record types.
+
+Fetched rows and compare results used to be one dict per host, each carrying
+its own key table, and every host holding its own copy of strings like
+"Ubuntu", "24.04.3 LTS (Noble Numbat)" or "2025-10-19T06:35:51.475Z". These
+classes use `__slots__` (no per-instance dict) and intern the values many hosts
+share, so a million-host fleet keeps one copy of each OS name / version /
+build / report timestamp.
+
+They keep a small dict-like surface — `get()`, `as_dict()`, `from_dict()` — so
+code that reads JSON files of the same shape (and the document builders) works
+with either. Serialize with `as_dict()`.
+"""
+import sys
+from typing import Any, Optional
+
+_ints: dict = {}
+
+
+def intern_str(s):
+    return sys.intern(s) if type(s) is str else s
+
+
+def intern_int(i):
+    return _ints.setdefault(i, i) if type(i) is int else i
+
+
+class Record:
+    __slots__ = ()
+
+    def get(self, name: str, default: Any = None) -> Any:
+        return getattr(self, name) if name in self.__slots__ else default
+
+    def __getitem__(self, name: str) -> Any:
+        if name not in self.__slots__:
+            raise KeyError(name)
+        return getattr(self, name)
+
+    def as_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "Record":
+        return cls(**{name: d.get(name) for name in cls.__slots__})
+
+    def __eq__(self, other):
+        return type(other) is type(self) and all(
+            getattr(self, n) == getattr(other, n) for n in self.__slots__)
+
+    __hash__ = None
+
+    def __repr__(self):
+        fields = ", ".join(f"{n}={getattr(self, n)!r}" for n in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+# --- fetched rows -------------------------------------------------------------
+
+class WindowsRow(Record):
+    __slots__ = ("agent_name", "build", "revision", "timestamp")
+
+    def __init__(self, agent_name: Optional[str], build: Optional[int], revision: Optional[int],
+                 timestamp: Optional[str]):
+        self.agent_name = agent_name
+        self.build = intern_int(build)
+        self.revision = intern_int(revision)
+        self.timestamp = intern_str(timestamp)
+
+
+class MacRow(Record):
+    __slots__ = ("agent_name", "version", "timestamp")
+
+    def __init__(self, agent_name: Optional[str], version: Optional[str], timestamp: Optional[str]):
+        self.agent_name = agent_name
+        self.version = intern_str(version)
+        self.timestamp = intern_str(timestamp)
+
+
+class LinuxHost(Record):
+    __slots__ = ("id", "timestamp", "host_name", "os_name", "os_version")
+
+    def __init__(self, id: Optional[str], timestamp: Optional[str], host_name: Optional[str],
+                 os_name: Optional[str], os_version: Optional[str]):
+        self.id = id
+        self.timestamp = intern_str(timestamp)
+        self.host_name = host_name
+        self.os_name = intern_str(os_name)
+        self.os_version = intern_str(os_version)
+
+
+# --- compare results ----------------------------------------------------------
+
+class WindowsResult(Record):
+    __slots__ = ("agent_name", "timestamp", "build", "revision", "baseline_revision", "updated", "reason",
+                 "patches_behind", "days_behind", "latest_kb")
+
+    def __init__(self, agent_name, timestamp, build, revision, baseline_revision, updated, reason,
+                 patches_behind=None, days_behind=None, latest_kb=None):
+        self.agent_name = agent_name
+        self.timestamp = intern_str(timestamp)
+        self.build = intern_int(build)
+        self.revision = intern_int(revision)
+        self.baseline_revision = intern_int(baseline_revision)
+        self.updated = intern_str(updated)
+        self.reason = intern_str(reason)
+        self.patches_behind = patches_behind
+        self.days_behind = days_behind
+        self.latest_kb = intern_str(latest_kb)
+
+
+class MacResult(Record):
+    __slots__ = ("agent_name", "agent_version_raw", "agent_version", "branch_major",
+                 "is_maintained_major", "branch_latest_version", "is_updated", "reason",
+                 "observed_at", "checked_at", "known_versions_behind", "known_days_behind")
+
+    # known_*: lower bounds, counted over the versions compliance.release_history has seen
+    def __init__(self, agent_name, agent_version_raw, agent_version, branch_major, is_maintained_major,
+                 branch_latest_version, is_updated, reason, observed_at, checked_at,
+                 known_versions_behind=None, known_days_behind=None):
+        self.agent_name = agent_name
+        self.agent_version_raw = intern_str(agent_version_raw)
+        self.agent_version = intern_str(agent_version)
+        self.branch_major = intern_str(branch_major)
+        self.is_maintained_major = is_maintained_major
+        self.branch_latest_version = intern_str(branch_latest_version)
+        self.is_updated = is_updated
+        self.reason = intern_str(reason)
+        self.observed_at = intern_str(observed_at)
+        self.checked_at = intern_str(checked_at)
+        self.known_versions_behind = known_versions_behind
+        self.known_days_behind = known_days_behind
+
+
+class LinuxResult(Record):
+    __slots__ = ("id", "os_name", "current_version", "latest_version")
+
+    def __init__(self, id, os_name, current_version, latest_version):
+        self.id = id
+        self.os_name = intern_str(os_name)
+        self.current_version = intern_str(current_version)
+        self.latest_version = intern_str(latest_version)
@@ -0,0 +1,156 @@
+# release_history.py
+"""
+Release histories, for "how far behind is this host".
+
+    history = WindowsReleaseHistory({26100: 6899})   # build -> latest UBR (summary table)
+    history.add(26100, 6584, "2025-09-09", "KB5065426")
+    history.add(26100, 6899, "2025-10-14", "KB5066835")
+    history.freeze()
+    history.behind(26100, 6584)    # -> (1, <days since 2025-10-14>, "KB5066835")
+
+    history = MacReleaseHistory()
+    history.add("15", "15.7", "2025-09-15", maintained=True)
+    history.add("15", "15.7.1", "2025-09-29", maintained=True)
+    history.freeze()
+    list(history)                  # -> ["15.7.1"], the maintained latest versions
+    history.behind("15.7")         # -> (1, <days since 2025-09-29>)
+
+Each is still the baseline its comparator always got — Windows' {build:
+latest_ubr} dict, macOS' ["26.0.1", "15.7.1", ...] list — so code that only
+wants the latest does not change. Histories are sorted parallel lists per build
+line / major, so `behind()` is one bisect: O(log n) per host.
+
+endoflife.date only publishes the latest version of each macOS release, so that
+history is whatever has been seen so far; macOS/fetch_latest_version.py keeps it
+in a file and adds every new latest version it sees. Patches released between
+two fetches are never seen, so macOS `behind()` counts are lower bounds (the
+`known_versions_behind` / `known_days_behind` fields).
+
+The classes live here rather than in the platform folders so a baseline
+unpickles the same way in the compare pool's spawned workers whichever runner
+loaded the platform.
+"""
+from bisect import bisect_right
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+
+class WindowsReleaseHistory(dict):
+    def __init__(self, latest=(), as_of: Optional[date] = None):
+        super().__init__(latest)
+        self.as_of = (as_of or date.today()).toordinal()
+        self.ubrs: Dict[int, List[int]] = {}     # build -> ascending UBRs
+        self.days: Dict[int, List[int]] = {}     # build -> release date ordinals, aligned with ubrs
+        self.kbs: Dict[int, List[str]] = {}      # build -> KB articles, aligned with ubrs
+        self._pending: Dict[int, Dict[int, Tuple[int, str]]] = {}
+
+    def add(self, build: int, ubr: int, released: str, kb: Optional[str] = None) -> None:
+        """One history row; duplicates keep the earliest date (24H2/25H2 tables overlap)."""
+        day = date.fromisoformat(released).toordinal()
+        per_build = self._pending.setdefault(build, {})
+        prev = per_build.get(ubr)
+        if prev is None or day < prev[0]:
+            per_build[ubr] = (day, kb or (prev[1] if prev else ""))
+
+    def freeze(self) -> "WindowsReleaseHistory":
+        """Sort what add() collected; builds missing from the summary table take their newest row."""
+        for build, per_build in self._pending.items():
+            ubrs = sorted(per_build)
+            self.ubrs[build] = ubrs
+            self.days[build] = [per_build[u][0] for u in ubrs]
+            self.kbs[build] = [per_build[u][1] for u in ubrs]
+            self.setdefault(build, ubrs[-1])
+        self._pending = {}
+        return self
+
+    def behind(self, build: Optional[int], ubr: Optional[int]) -> Tuple[Optional[int], Optional[int], Optional[str]]:
+        """
+        (updates released after `ubr` up to the build's latest, days since the
+        oldest of them came out, KB of the latest) — (None, None, None) when
+        the build has no history.
+        """
+        ubrs = self.ubrs.get(build)
+        if not ubrs or ubr is None:
+            return None, None, None
+        end = bisect_right(ubrs, self[build])
+        k = bisect_right(ubrs, ubr, 0, end)
+        missing = end - k
+        days = max(0, self.as_of - self.days[build][k]) if missing else 0
+        return missing, days, (self.kbs[build][end - 1] or None) if end else None
+
+
+def mac_version_key(v: str) -> tuple:
+    parts = []
+    for p in (v or "").split("."):
+        if not p.isdigit():
+            break
+        parts.append(int(p))
+    while len(parts) < 3:
+        parts.append(0)
+    return tuple(parts)
+
+
+class MacReleaseHistory(list):
+    def __init__(self, as_of: Optional[date] = None):
+        super().__init__()
+        self.as_of = (as_of or date.today()).toordinal()
+        self.keys: Dict[str, List[tuple]] = {}    # major -> ascending version keys
+        self.days: Dict[str, List[int]] = {}      # major -> release date ordinals, aligned with keys
+        self.names: Dict[str, List[str]] = {}     # major -> version strings, aligned with keys
+        self.maintained: Dict[str, bool] = {}     # major -> still maintained
+        self._pending: Dict[str, Dict[tuple, Tuple[str, int]]] = {}
+
+    def add(self, major: str, version: str, released: Optional[str], maintained: Optional[bool] = None) -> None:
+        if maintained is not None:
+            self.maintained[major] = maintained
+        else:
+            self.maintained.setdefault(major, False)
+        if not version or not released:
+            return
+        self._pending.setdefault(major, {})[mac_version_key(version)] = (version, date.fromisoformat(released[:10]).toordinal())
+
+    def freeze(self) -> "MacReleaseHistory":
+        """Sort what add() collected; the list becomes the maintained majors' latest versions."""
+        for major, per_major in self._pending.items():
+            merged = dict(zip(self.keys.get(major, []), zip(self.names.get(major, []), self.days.get(major, []))))
+            merged.update(per_major)
+            keys = sorted(merged)
+            self.keys[major] = keys
+            self.names[major] = [merged[k][0] for k in keys]
+            self.days[major] = [merged[k][1] for k in keys]
+        self._pending = {}
+        latest = [self.names[m][-1] for m, on in self.maintained.items() if on and self.names.get(m)]
+        self[:] = sorted(latest, key=mac_version_key, reverse=True)   # newest major first, as endoflife.date lists them
+        return self
+
+    def behind(self, version: Optional[str]) -> Tuple[Optional[int], Optional[int]]:
+        """
+        (known versions of the same major newer than `version`, days since the
+        oldest of them came out) — both lower bounds, see the module docstring;
+        (None, None) when the major has no history.
+        """
+        if not version:
+            return None, None
+        major = version.split(".", 1)[0]
+        keys = self.keys.get(major)
+        if not keys:
+            return None, None
+        k = bisect_right(keys, mac_version_key(version))
+        missing = len(keys) - k
+        return missing, (max(0, self.as_of - self.days[major][k]) if missing else 0)
+
+    # --- persistence (the incremental cache file) ---------------------------
+
+    def to_json(self) -> dict:
+        return {m: {"maintained": self.maintained.get(m, False),
+                    "versions": [[n, date.fromordinal(d).isoformat()] for n, d in zip(self.names[m], self.days[m])]}
+                for m in self.keys}
+
+    @classmethod
+    def from_json(cls, data: dict) -> "MacReleaseHistory":
+        history = cls()
+        for major, entry in (data or {}).items():
+            for name, released in entry.get("versions") or []:
+                history.add(major, name, released)
+            history.maintained[major] = bool(entry.get("maintained"))
+        return history.freeze()
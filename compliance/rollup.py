@@ -0,0 +1,160 @@
+# rollup.py
+"""
+Per-run fleet rollup: one summary document instead of aggregating every
+per-agent document on each dashboard load.
+
+    rollup = Rollup.of(spec)
+    for row, record in zip(rows, records):
+        rollup.add(row, record, baseline)
+    rollup.ship(spec)                   # one doc into the spec's ROLLUP_INDEX
+
+A sharded run ships nothing per shard: each shard's summary carries its rollup
+doc and `merge-shards` ships the sum (`merge_docs`).
+
+Counts are kept while the run compares rows, by
+  - status: compliant / behind / unsupported (no baseline for the host's line,
+    e.g. an unmaintained macOS major) / unknown (no usable version reported),
+  - OS line (`spec.line_of`: Windows build, macOS major, distro + series),
+    with the same status split per line,
+  - version (the ROLLUP_TOP_VERSIONS most common, the rest as "other"),
+  - days behind, bucketed (DAYS_BUCKETS; compliant hosts count as 0).
+
+The platform says what one result means through `spec.rollup_of(row, record,
+baseline) -> (status, days_behind, version)`. Breakdowns with open-ended keys
+(lines, versions) are lists of {key, hosts} objects, so versions such as
+"26100.6899" do not turn into object paths in the index mapping.
+"""
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from .bulk import BulkEngine, BulkStats
+from .pipeline import PipelineSpec, Settings
+
+STATUSES = ("compliant", "behind", "unsupported", "unknown")
+# (label, upper bound in days, inclusive)
+DAYS_BUCKETS = (("0", 0), ("1-30", 30), ("31-90", 90), ("91-180", 180), ("181+", None))
+
+
+def rollup_index(spec: PipelineSpec) -> str:
+    """spec.settings.rollup_index (ROLLUP_INDEX); "" = "<dest_index>-rollup"."""
+    return spec.settings.rollup_index or f"{spec.dest_index}-rollup"
+
+
+def days_bucket(days) -> str:
+    if days is None:
+        return "unknown"
+    for label, upper in DAYS_BUCKETS:
+        if upper is None or days <= upper:
+            return label
+    return DAYS_BUCKETS[-1][0]
+
+
+class Rollup:
+    def __init__(self, platform: str, rollup_of=None, line_of=None, run_id: Optional[str] = None,
+                 top_versions: Optional[int] = None):
+        self.platform = platform
+        self.top_versions = Settings.from_env().rollup_top_versions if top_versions is None else top_versions
+        self.rollup_of = rollup_of
+        self.line_of = line_of
+        self.run_id = run_id or uuid.uuid4().hex[:12]
+        self.started_at = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+        self.total = 0
+        self.status = Counter()
+        self.days = Counter()
+        self.versions = Counter()
+        self.lines = {}                 # line -> Counter(status)
+
+    @classmethod
+    def of(cls, spec: PipelineSpec) -> "Rollup":
+        return cls(spec.name, spec.rollup_of, spec.line_of, top_versions=spec.settings.rollup_top_versions)
+
+    @classmethod
+    def from_doc(cls, doc: dict) -> "Rollup":
+        r = cls(doc["platform"], run_id=doc.get("run_id"))
+        r.started_at = doc.get("@timestamp") or r.started_at
+        r.total = doc.get("total", 0)
+        r.status.update(doc.get("by_status") or {})
+        r.days.update(doc.get("by_days_behind") or {})
+        r.versions.update({v["version"]: v["hosts"] for v in doc.get("by_version") or []})
+        for entry in doc.get("by_line") or []:
+            r.lines[entry["line"]] = Counter({s: entry.get(s, 0) for s in STATUSES})
+        return r
+
+    def add(self, row, record, baseline) -> None:
+        status, days, version = self.rollup_of(row, record, baseline)
+        if status == "compliant" and days is None:
+            days = 0
+        self.total += 1
+        self.status[status] += 1
+        self.days[days_bucket(days)] += 1
+        self.versions[version or "unknown"] += 1
+        if self.line_of is not None:
+            self.lines.setdefault(self.line_of(row), Counter())[status] += 1
+
+    def merge(self, other: "Rollup") -> "Rollup":
+        """Add another rollup's counts into this one (e.g. the shards of a run)."""
+        self.started_at = min(self.started_at, other.started_at)
+        self.total += other.total
+        self.status.update(other.status)
+        self.days.update(other.days)
+        self.versions.update(other.versions)
+        for line, counts in other.lines.items():
+            self.lines.setdefault(line, Counter()).update(counts)
+        return self
+
+    def doc(self, top_versions: Optional[int] = None) -> dict:
+        top_versions = self.top_versions if top_versions is None else top_versions
+        top = [(v, n) for v, n in self.versions.most_common() if v != "other"][:top_versions]
+        other = self.total - sum(n for _, n in top)
+        by_version = [{"version": v, "hosts": n} for v, n in top]
+        if other:
+            by_version.append({"version": "other", "hosts": other})
+        compliant = self.status["compliant"]
+        return {
+            "@timestamp": self.started_at,
+            "doc_type": "fleet_rollup",
+            "platform": self.platform,
+            "run_id": self.run_id,
+            "total": self.total,
+            "compliant": compliant,
+            "compliance_pct": round(100.0 * compliant / self.total, 2) if self.total else None,
+            "by_status": {s: self.status[s] for s in STATUSES},
+            "by_days_behind": {label: self.days[label] for label, _ in DAYS_BUCKETS}
+                              | {"unknown": self.days["unknown"]},
+            "by_line": [{"line": line, "hosts": sum(c.values()), **{s: c[s] for s in STATUSES}}
+                        for line, c in sorted(self.lines.items())],
+            "by_version": by_version,
+        }
+
+    def ship(self, spec: PipelineSpec, engine: Optional[BulkEngine] = None) -> dict:
+        """
+        Index the rollup doc into `rollup_index(spec)`; the `_id` makes a retried ship overwrite,
+        not duplicate. RuntimeError when Elasticsearch rejects it (dead-lettered when the engine
+        has a state directory).
+        """
+        index = rollup_index(spec)
+        engine = engine or BulkEngine(spec.es_url, spec.api_key_b64)
+        doc = self.doc(spec.settings.rollup_top_versions)
+        action = {"index": {"_index": index, "_id": f"{self.platform}-{self.run_id}"}}
+        stats = BulkStats()
+        failed = engine.ship_batch([action], [doc], stats)
+        if failed or stats.failed:
+            error = failed[0][1] if failed else "rejected"
+            print(f"[ERROR] {self.platform}: rollup {self.run_id} rejected by '{index}': {error}")
+            raise RuntimeError(f"rollup {self.platform}-{self.run_id} rejected by '{index}': {error}")
+        print(f"[OK] {self.platform}: rollup {self.run_id} → '{index}': {self.total} host(s), "
+              f"{doc['compliant']} compliant ({doc['compliance_pct']}%)")
+        return doc
+
+
+def merge_docs(docs: List[dict], run_id: Optional[str] = None) -> Optional[Rollup]:
+    """One rollup from several partial docs (the shards of a sharded run), under `run_id` or a new one."""
+    if not docs:
+        return None
+    merged = Rollup(docs[0]["platform"], run_id=run_id)
+    merged.started_at = docs[0]["@timestamp"]
+    for d in docs:
+        merged.merge(Rollup.from_doc(d))
+    return merged
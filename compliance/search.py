@@ -0,0 +1,128 @@
+# search.py
+"""
+Paged `_search` over a point-in-time (PIT) with `search_after`.
+
+The platform fetchers ask for `size=10000` in one request, which caps the fleet
+size and keeps the whole response in memory. `PagedSearch` walks the index a
+page at a time instead, so callers can start working on page 1 while page 2
+is still in flight.
+"""
+from typing import Iterator, List, Optional
+
+import requests
+
+from . import jsoncodec
+from .http import get_session, auth_headers
+
+DEFAULT_SORT = [{"@timestamp": "desc"}]
+
+
+class PagedSearch:
+    """
+    Iterate `index` page by page, newest `@timestamp` first.
+
+    use_pit=True opens a PIT so pages are consistent and `_shard_doc` can act as
+    the tiebreaker. With use_pit=False the index itself is searched and
+    `search_after` relies on the sort values alone.
+    """
+
+    def __init__(
+        self,
+        es_url: str,
+        index: str,
+        api_key_b64: Optional[str] = None,
+        *,
+        query: Optional[dict] = None,
+        source: Optional[List[str]] = None,
+        sort: Optional[List[dict]] = None,
+        page_size: int = 1000,
+        use_pit: bool = True,
+        keep_alive: str = "2m",
+        timeout: float = 30,
+        session: Optional[requests.Session] = None,
+    ):
+        self.es_url = es_url.rstrip("/")
+        self.index = index
+        self.headers = {"Content-Type": "application/json", **auth_headers(api_key_b64)}
+        self.query = query
+        self.source = source
+        self.sort = list(sort or DEFAULT_SORT)
+        self.page_size = page_size
+        self.use_pit = use_pit
+        self.keep_alive = keep_alive
+        self.timeout = timeout
+        self.session = session or get_session()
+
+        self.pit_id: Optional[str] = None
+        self.search_after = None
+        self.done = False
+        self.pages = 0
+        self.hits = 0
+        self.bytes_received = 0
+
+    def _open_pit(self) -> None:
+        resp = self.session.post(f"{self.es_url}/{self.index}/_pit",
+                                 params={"keep_alive": self.keep_alive},
+                                 headers=self.headers, timeout=self.timeout)
+        resp.raise_for_status()
+        self.pit_id = jsoncodec.response_json(resp)["id"]
+
+    def next_page(self) -> list:
+        """Return the next page of hits, or [] once the index is exhausted."""
+        if self.done:
+            return []
+        if self.use_pit and self.pit_id is None:
+            self._open_pit()
+
+        body = {"size": self.page_size, "sort": self.sort, "track_total_hits": False}
+        if self.query:
+            body["query"] = self.query
+        if self.source is not None:
+            body["_source"] = self.source
+        if self.search_after is not None:
+            body["search_after"] = self.search_after
+
+        if self.use_pit:
+            body["pit"] = {"id": self.pit_id, "keep_alive": self.keep_alive}
+            body["sort"] = self.sort + [{"_shard_doc": "asc"}]
+            url = f"{self.es_url}/_search"
+        else:
+            url = f"{self.es_url}/{self.index}/_search"
+
+        resp = self.session.post(url, json=body, headers=self.headers, timeout=self.timeout,
+                                 params={"filter_path": "pit_id,hits.hits._source,hits.hits.sort"})
+        resp.raise_for_status()
+        self.bytes_received += len(resp.content)
+        data = jsoncodec.response_json(resp)
+
+        # PIT ids may change between pages; always continue with the newest one
+        self.pit_id = data.get("pit_id") or self.pit_id
+        hits = (data.get("hits") or {}).get("hits") or []
+        self.pages += 1
+        self.hits += len(hits)
+        if len(hits) < self.page_size:
+            self.done = True
+        if hits:
+            self.search_after = hits[-1].get("sort")
+        return hits
+
+    def close(self) -> None:
+        if self.pit_id is None:
+            return
+        try:
+            self.session.delete(f"{self.es_url}/_pit", json={"id": self.pit_id},
+                                headers=self.headers, timeout=self.timeout)
+        except requests.RequestException as e:
+            print(f"[WARN] could not close PIT: {e}")
+        self.pit_id = None
+
+    def __iter__(self) -> Iterator[list]:
+        try:
+            while True:
+                hits = self.next_page()
+                if hits:
+                    yield hits
+                if self.done or not hits:
+                    break
+        finally:
+            self.close()
@@ -0,0 +1,214 @@
+# shard.py
+"""
+Hash-sharded runs: split one fleet across N workers.
+
+    python main.py --mode async --shard 0/4          # on four runners, 0..3
+    python -m compliance merge-shards shards/
+
+Each worker adds a server-side script filter to the platform query so
+Elasticsearch only returns the hosts whose key (`agent.name` or `host.id`)
+hashes into its shard:
+
+    Math.floorMod(doc[field].value.hashCode(), N) == i
+
+`hashCode()` is Java's String hash, so `java_string_hash()` gives the same
+split client-side. Every shard compares and ships on its own and writes its
+summary to `<dir>/<platform>-<i>-of-<N>.json`; `merge_summaries()` adds them up.
+
+Summaries carry the run they belong to: `--run-id` / SHARD_RUN_ID, the same on
+every runner (default: the UTC day, enough for one sharded run a day). A shard
+that did not run this time leaves last run's file behind; `merge_dir` merges
+only the summaries of one run (the newest, unless asked for another) and
+reports the shards it lacks instead of adding stale counts to the fleet.
+"""
+import dataclasses
+import glob
+import os
+import re
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from . import jsoncodec
+from .pipeline import PipelineSpec
+from .rollup import merge_docs
+
+SHARD_DIR = os.getenv("SHARD_DIR", "shards")
+SHARD_RUN_ID = os.getenv("SHARD_RUN_ID", "")
+
+_PAINLESS = (
+    "def v = doc[params.field]; "
+    "return v.size() > 0 && Math.floorMod(v.value.hashCode(), params.n) == params.i;"
+)
+
+
+@dataclass(frozen=True)
+class Shard:
+    index: int
+    count: int
+
+    @classmethod
+    def parse(cls, raw: str) -> "Shard":
+        m = re.fullmatch(r"\s*(\d+)\s*/\s*(\d+)\s*", raw or "")
+        if not m:
+            raise ValueError(f"shard must look like i/N, got {raw!r}")
+        i, n = int(m.group(1)), int(m.group(2))
+        if n < 1 or not 0 <= i < n:
+            raise ValueError(f"shard index must be in 0..{n - 1}, got {raw!r}")
+        return cls(i, n)
+
+    def __str__(self):
+        return f"{self.index}/{self.count}"
+
+
+def java_string_hash(s: str) -> int:
+    """Java's String.hashCode() (over UTF-16 code units, 32-bit signed)."""
+    h = 0
+    data = s.encode("utf-16-be")
+    for k in range(0, len(data), 2):
+        h = (31 * h + ((data[k] << 8) | data[k + 1])) & 0xFFFFFFFF
+    return h - 0x100000000 if h & 0x80000000 else h
+
+
+def in_shard(value: str, shard: Shard) -> bool:
+    return java_string_hash(value) % shard.count == shard.index  # Python % is floorMod
+
+
+def shard_filter(field: str, shard: Shard) -> dict:
+    return {"script": {"script": {"lang": "painless", "source": _PAINLESS,
+                                  "params": {"field": field, "n": shard.count, "i": shard.index}}}}
+
+
+def shard_query(query: Optional[dict], field: str, shard: Shard) -> dict:
+    """`query` AND the shard filter."""
+    filters = [shard_filter(field, shard)]
+    if query:
+        filters.insert(0, query)
+    return {"bool": {"filter": filters}}
+
+
+def with_shard(spec: PipelineSpec, shard: Shard) -> PipelineSpec:
+    if not spec.shard_field:
+        raise ValueError(f"platform {spec.name!r} has no shard_field")
+    return dataclasses.replace(spec, query=shard_query(spec.query, spec.shard_field, shard))
+
+
+# --- summaries -------------------------------------------------------------
+
+def run_id(raw: Optional[str] = None) -> str:
+    """The sharded run's id: `raw`, SHARD_RUN_ID, or today's UTC date."""
+    return raw or SHARD_RUN_ID or datetime.now(timezone.utc).strftime("%Y%m%d")
+
+
+def summary_path(directory: str, platform: str, shard: Shard) -> str:
+    return os.path.join(directory, f"{platform}-{shard.index}-of-{shard.count}.json")
+
+
+def write_summary(directory: str, summary: dict, shard: Shard, run: Optional[str] = None) -> str:
+    os.makedirs(directory, exist_ok=True)
+    path = summary_path(directory, summary["platform"], shard)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as fh:
+        jsoncodec.dump({**summary, "shard": {"index": shard.index, "count": shard.count, "run_id": run_id(run)}},
+                       fh, indent=True)
+    os.replace(tmp, path)
+    print(f"[OK] shard {shard} summary of run {run_id(run)} written to {path}")
+    return path
+
+
+def run_shard(spec: PipelineSpec, shard: Shard, directory: str = SHARD_DIR, run: Optional[str] = None,
+              **aio_kwargs) -> dict:
+    """Fetch → compare → ship this shard's hosts (async pipeline) and write its summary."""
+    from . import aio
+    aio_kwargs.setdefault("index_dir", None)   # a shard only sees part of the host index
+    aio_kwargs.setdefault("ship_rollup", False)  # merge-shards ships the whole fleet's rollup
+    aio_kwargs.setdefault("lookup_dir", None)     # a snapshot would only hold this shard's hosts
+    aio_kwargs.setdefault("partition", False)     # a partition would only hold this shard's hosts
+    # shards running side by side on one machine must not claim each other's dead letters
+    aio_kwargs.setdefault("state_dir", spec.ship_state(f"shard-{shard.index}-of-{shard.count}"))
+    summary = aio.run(with_shard(spec, shard), **aio_kwargs)
+    write_summary(directory, summary, shard, run)
+    return summary
+
+
+def merge_summaries(summaries: List[dict]) -> dict:
+    """Counters add up; wall time is the slowest shard (they run side by side). One run's summaries only."""
+    if not summaries:
+        return {}
+    runs = {s["shard"].get("run_id") for s in summaries}
+    if len(runs) != 1:
+        raise ValueError(f"summaries come from different runs: {sorted(map(str, runs))}")
+    run = runs.pop()
+    counts = {s["shard"]["count"] for s in summaries}
+    if len(counts) != 1:
+        raise ValueError(f"summaries come from different shard counts: {sorted(counts)}")
+    count = counts.pop()
+    have = sorted(s["shard"]["index"] for s in summaries)
+    if len(have) != len(set(have)):
+        raise ValueError(f"summaries repeat a shard: {have}")
+    merged = {
+        "platform": summaries[0]["platform"],
+        "shards": {"count": count, "run_id": run, "merged": have,
+                   "missing": [i for i in range(count) if i not in have]},
+        "seconds": max(s.get("seconds", 0) for s in summaries),
+        "phases": {},
+        "bulk": {},
+    }
+    for key in ("pages", "hits", "rows"):
+        merged[key] = sum(s.get(key, 0) for s in summaries)
+    for s in summaries:
+        for k, v in (s.get("phases") or {}).items():
+            merged["phases"][k] = round(merged["phases"].get(k, 0) + v, 4)
+        for k, v in (s.get("bulk") or {}).items():
+            if k in ("seconds", "docs_per_sec"):
+                continue
+            merged["bulk"][k] = merged["bulk"].get(k, 0) + v
+    rollups = [s["rollup"] for s in summaries if s.get("rollup")]
+    if rollups:
+        # the run's id as the rollup's: merging the same run again overwrites its fleet doc
+        merged["rollup"] = merge_docs(rollups, run_id=run).doc()
+    docs = merged["bulk"].get("docs", 0)
+    merged["bulk"]["seconds"] = merged["seconds"]
+    merged["bulk"]["docs_per_sec"] = round(docs / merged["seconds"], 1) if merged["seconds"] else 0.0
+    return merged
+
+
+def merge_dir(directory: str = SHARD_DIR, platforms: Optional[List[str]] = None,
+              run: Optional[str] = None) -> Dict[str, dict]:
+    """
+    Merge the `<platform>-<i>-of-<N>.json` of one run in `directory`: run `run`, else each
+    platform's most recently written run. Writes `<platform>-merged.json`.
+    """
+    by_platform: Dict[str, List[tuple]] = {}
+    for path in sorted(glob.glob(os.path.join(directory, "*-of-*.json"))):
+        with open(path, "rb") as fh:
+            s = jsoncodec.load(fh)
+        if platforms and s.get("platform") not in platforms:
+            continue
+        by_platform.setdefault(s["platform"], []).append((os.stat(path).st_mtime_ns, path, s))
+
+    out = {}
+    for platform, found in by_platform.items():
+        want = run or max(found, key=lambda f: f[0])[2]["shard"].get("run_id")
+        summaries = [s for _, _, s in found if s["shard"].get("run_id") == want]
+        stale = [os.path.basename(p) for _, p, s in found if s["shard"].get("run_id") != want]
+        if stale:
+            print(f"[WARN] {platform}: skipping {len(stale)} summary file(s) of other runs than {want}: "
+                  f"{', '.join(stale)}")
+        if not summaries:
+            print(f"[WARN] {platform}: no summary of run {want} in {directory}")
+            continue
+        merged = merge_summaries(summaries)
+        if merged["shards"]["missing"]:
+            print(f"[WARN] {platform}: no summary for shard(s) {merged['shards']['missing']} "
+                  f"of {merged['shards']['count']}")
+        path = os.path.join(directory, f"{platform}-merged.json")
+        with open(path, "wb") as fh:
+            jsoncodec.dump(merged, fh, indent=True)
+        print(f"[OK] {platform}: run {want}, {len(summaries)} shard(s), {merged['hits']} hit(s), "
+              f"{merged['rows']} host(s), {merged['bulk'].get('docs', 0)} doc(s) shipped, "
+              f"slowest shard {merged['seconds']:.2f}s → {path}")
+        out[platform] = merged
+    if not out:
+        print(f"[WARN] no shard summaries found in {directory}")
+    return out
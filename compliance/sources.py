@@ -0,0 +1,192 @@
+# sources.py
+"""
+Fan-in over several clusters / source indices.
+
+    ES_SOURCES='[
+      {"name": "eu", "url": "https://eu.example:9243", "index": "logs-osquery*", "api_key_env": "EU_KEY"},
+      {"name": "us", "url": "https://us.example:9243", "index": "logs-osquery*", "api_key": "..."}
+    ]'
+
+Without ES_SOURCES the single ES_URL / SOURCE_INDEX / API key of the platform
+is used, as before. Every source is fetched concurrently and timed on its own;
+a source that fails is reported and left out while the others carry on (the
+run only fails when no source answered). Rows are merged keeping the newest
+record per host across all sources; timestamps are compared as instants
+(`epoch_millis`), since clusters may report them with different UTC offsets,
+precisions or as epoch millis.
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Iterable, List, NamedTuple, Optional, Tuple
+
+from . import jsoncodec
+
+
+@dataclass(frozen=True)
+class Source:
+    name: str
+    es_url: str
+    index: str
+    api_key_b64: Optional[str] = None
+
+    def __str__(self):
+        return f"{self.name} ({self.es_url}/{self.index})"
+
+
+class Fetched(NamedTuple):
+    rows: list
+    hits: int
+    pages: int = 1
+
+
+@dataclass
+class SourceReport:
+    name: str
+    status: str = "ok"          # ok | failed
+    seconds: float = 0.0
+    pages: int = 0
+    hits: int = 0
+    rows: int = 0
+    error: Optional[str] = None
+
+    def as_dict(self) -> dict:
+        d = asdict(self)
+        d["seconds"] = round(self.seconds, 4)
+        return d
+
+
+class NoSourceError(RuntimeError):
+    """No source is configured, or every configured source failed."""
+
+
+def load_sources(raw: Optional[str] = None, *, es_url: Optional[str] = None,
+                 index: Optional[str] = None, api_key_b64: Optional[str] = None) -> List[Source]:
+    """
+    Sources from `raw` (ES_SOURCES JSON list) or, when it is empty, the single
+    es_url/index/api_key_b64 given. An entry's key comes from `api_key` or from
+    the environment variable named by `api_key_env`, so the list itself can be
+    kept free of secrets.
+    """
+    raw = raw if raw is not None else os.getenv("ES_SOURCES", "")
+    if not raw.strip():
+        if not es_url or not index:
+            return []
+        return [Source("default", es_url.rstrip("/"), index, api_key_b64)]
+    entries = jsoncodec.loads(raw)
+    if isinstance(entries, dict):
+        entries = [entries]
+    out = []
+    for n, e in enumerate(entries):
+        key = e.get("api_key")
+        if key is None and e.get("api_key_env"):
+            key = os.getenv(e["api_key_env"])
+        url = e.get("url") or e.get("es_url") or es_url
+        idx = e.get("index") or index
+        if not url or not idx:
+            raise ValueError(f"ES_SOURCES entry #{n} needs a url and an index: {e}")
+        out.append(Source(e.get("name") or f"source{n}", url.rstrip("/"), idx,
+                          key if key is not None else api_key_b64))
+    names = [s.name for s in out]
+    if len(names) != len(set(names)):
+        raise ValueError(f"ES_SOURCES names must be unique: {names}")
+    return out
+
+
+def fetch_timed(source: Source, fetch: Callable[[Source], Fetched]) -> Tuple[list, SourceReport]:
+    """Run `fetch(source)`; never raises, the report carries the error."""
+    report = SourceReport(source.name)
+    t0 = time.perf_counter()
+    try:
+        rows, report.hits, report.pages = fetch(source)
+        report.rows = len(rows)
+    except BaseException as e:  # the platform fetchers sys.exit() on HTTP errors
+        if isinstance(e, KeyboardInterrupt):
+            raise
+        rows = []
+        report.status = "failed"
+        report.error = f"{e.__class__.__name__}: {e}"
+    report.seconds = time.perf_counter() - t0
+    if report.status == "ok":
+        print(f"[OK] source {source}: {report.hits} hit(s), {report.rows} row(s) in {report.seconds:.2f}s")
+    else:
+        print(f"[WARN] source {source} failed after {report.seconds:.2f}s: {report.error}")
+    return rows, report
+
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MS = timedelta(milliseconds=1)
+
+
+def epoch_millis(value, default: Optional[int] = None) -> Optional[int]:
+    """
+    A source timestamp → epoch milliseconds: ISO-8601 with any UTC offset (no offset = UTC),
+    or epoch millis as a number or digit string. `default` when missing or unreadable.
+    """
+    if value is None or value == "" or isinstance(value, bool):
+        return default
+    if isinstance(value, (int, float)):
+        return int(value)
+    s = str(value).strip()
+    if s.lstrip("-").isdigit():
+        return int(s)
+    try:
+        dt = datetime.fromisoformat(s.replace("Z", "+00:00").replace("z", "+00:00"))
+    except ValueError:
+        return default
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return (dt - _EPOCH) // _MS
+
+
+def merge_newest(row_lists: Iterable[list], key: str, ts: str = "timestamp") -> list:
+    """One row per `row[key]`, the one with the latest `row[ts]` (see `epoch_millis`; unreadable = oldest)."""
+    newest = {}
+    for rows in row_lists:
+        for row in rows:
+            k = row.get(key)
+            ms = epoch_millis(row.get(ts), -1 << 63)
+            prev = newest.get(k)
+            if prev is None or ms > prev[0]:
+                newest[k] = (ms, row)
+    return [row for _, row in newest.values()]
+
+
+def check_reports(reports: List[SourceReport]) -> None:
+    if reports and all(r.status == "failed" for r in reports):
+        raise NoSourceError("; ".join(f"{r.name}: {r.error}" for r in reports))
+
+
+def fan_in(sources: List[Source], fetch: Callable[[Source], Fetched], *, key: str,
+           ts: str = "timestamp", max_workers: Optional[int] = None) -> Tuple[list, List[SourceReport]]:
+    """Fetch every source concurrently and merge; raises NoSourceError if none is set or none answered."""
+    if not sources:
+        raise NoSourceError("no sources configured (set ES_URL and SOURCE_INDEX, or ES_SOURCES)")
+    with ThreadPoolExecutor(max_workers=max_workers or max(1, len(sources))) as pool:
+        results = list(pool.map(lambda s: fetch_timed(s, fetch), sources))
+    reports = [r for _, r in results]
+    check_reports(reports)
+    rows = merge_newest((rows for rows, _ in results), key, ts)
+    if len(sources) > 1:
+        print(f"[OK] merged {sum(r.rows for r in reports)} row(s) from {len(sources)} source(s) "
+              f"into {len(rows)} host(s)")
+    return rows, reports
+
+
+def paged_fetcher(rows_from_hits: Callable[[list, set], list], *, query: Optional[dict] = None,
+                  source_fields: Optional[List[str]] = None, page_size: int = 1000,
+                  use_pit: bool = True) -> Callable[[Source], Fetched]:
+    """fetch(source) that walks the source index with compliance.search.PagedSearch."""
+    from .search import PagedSearch
+
+    def fetch(source: Source):
+        search = PagedSearch(source.es_url, source.index, source.api_key_b64, query=query,
+                             source=source_fields, page_size=page_size, use_pit=use_pit)
+        seen, rows = set(), []
+        for hits in search:
+            rows.extend(rows_from_hits(hits, seen))
+        return Fetched(rows, search.hits, search.pages)
+
+    return fetch
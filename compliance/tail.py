@@ -0,0 +1,288 @@
+# tail.py
+"""
+Near-real-time mode: follow the source index and ship each host's new result
+within seconds.
+
+    python -m compliance tail --platforms windows,macos --poll 1 --max-latency 2
+
+Every `poll` seconds the source index is read oldest-first with `search_after`
+on `@timestamp` (compliance.search.PagedSearch, no PIT so new documents show
+up), starting a little before the newest result already handled: results can
+become searchable after later ones (ingest and refresh lag), so each poll
+re-reads an `overlap` window and drops rows that are not newer than what that
+host already had. New rows are compared against the cached baseline (refreshed
+after `baseline_ttl`) and their documents collected into small bulk batches.
+A batch goes out once it has `max_batch` documents, or when waiting for the
+next poll would keep its oldest document past `max_latency`; an unchanged
+result for a host is not shipped again (compliance.daemon.HostStateFilter).
+A batch that fails after its retries, or items Elasticsearch rejects, go to
+the dead-letter file in `spec.ship_state("tail")`, which the next start
+replays, and those hosts are not treated as shipped.
+
+The latency reported is from a result's `@timestamp` to the `_bulk`
+acknowledgement of its document (p50 / p95 / max over the last
+LATENCY_WINDOW documents), printed every `report_every` seconds and written to
+a Prometheus textfile when one is configured. SIGTERM / SIGINT stop after the
+current poll.
+"""
+import os
+import re
+import signal
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Optional
+
+from .bulk import BulkEngine, BulkFlushError, BulkStats
+from .daemon import HostStateFilter, TTLCache
+from .pipeline import PipelineSpec
+from .search import PagedSearch
+from .sources import epoch_millis
+from .templates import ensure as ensure_template
+
+TAIL_POLL_SECONDS = float(os.getenv("TAIL_POLL_SECONDS", "1"))
+TAIL_MAX_BATCH = int(os.getenv("TAIL_MAX_BATCH", "200"))
+TAIL_MAX_LATENCY = float(os.getenv("TAIL_MAX_LATENCY", "2"))
+TAIL_OVERLAP_SECONDS = float(os.getenv("TAIL_OVERLAP_SECONDS", "30"))
+TAIL_METRICS_TEXTFILE = os.getenv("TAIL_METRICS_TEXTFILE")
+LATENCY_WINDOW = 10000
+
+ASC = [{"@timestamp": "asc"}]
+
+
+def parse_ts(value) -> Optional[float]:
+    """`@timestamp` (ISO-8601 or epoch millis, see compliance.sources.epoch_millis) → epoch seconds."""
+    ms = epoch_millis(value)
+    return None if ms is None else ms / 1000
+
+
+def iso(epoch: float) -> str:
+    return datetime.fromtimestamp(epoch, timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+def parse_since(raw: str) -> float:
+    """"now", seconds, or 30s / 15m / 2h / 1d back from now → epoch seconds."""
+    raw = (raw or "now").strip().lower()
+    if raw == "now":
+        return time.time()
+    m = re.fullmatch(r"(\d+(?:\.\d+)?)\s*([smhd]?)", raw)
+    if not m:
+        raise ValueError(f"--since must be now, N, or N followed by s/m/h/d, got {raw!r}")
+    return time.time() - float(m.group(1)) * {"": 1, "s": 1, "m": 60, "h": 3600, "d": 86400}[m.group(2)]
+
+
+def _quantile(sorted_values: list, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+class Tailer:
+    def __init__(
+        self,
+        spec: PipelineSpec,
+        *,
+        poll: float = TAIL_POLL_SECONDS,
+        max_batch: int = TAIL_MAX_BATCH,
+        max_latency: float = TAIL_MAX_LATENCY,
+        overlap: float = TAIL_OVERLAP_SECONDS,
+        since: Optional[float] = None,
+        baseline_ttl: float = 3600,
+        ship_unchanged: bool = False,
+        page_size: int = 1000,
+        state_dir: Optional[str] = None,
+    ):
+        self.spec = spec
+        self.poll = poll
+        self.max_batch = max(1, max_batch)
+        self.max_latency = max_latency
+        self.overlap = overlap
+        self.watermark = time.time() if since is None else since
+        self.page_size = page_size
+        self.baseline = TTLCache(spec.load_baseline, baseline_ttl)
+        self.host_state = None if ship_unchanged else HostStateFilter()
+        self.builder = spec.builder if self.host_state is None else self.host_state.wrap(spec.builder)
+        # its own dead-letter file: a cron or daemon run of the platform may replay the shared one
+        self.engine = BulkEngine(spec.es_url, spec.api_key_b64, batch_size=self.max_batch,
+                                 state_dir=state_dir or spec.ship_state("tail"))
+        self.stats = BulkStats()
+
+        self.last_seen = {}              # host key -> newest @timestamp handled (epoch)
+        self.pending = []                # (action, doc, event epoch)
+        self.pending_since = None        # monotonic time the oldest pending doc was queued
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.polls = 0
+        self.rows = 0
+        self.errors = 0
+
+    # --- one poll -----------------------------------------------------------
+
+    def _query(self) -> dict:
+        window = {"range": {"@timestamp": {"gte": iso(self.watermark - self.overlap)}}}
+        return {"bool": {"filter": [self.spec.query, window] if self.spec.query else [window]}}
+
+    def poll_once(self) -> int:
+        """Read what is new, compare, queue; ship whatever is due. Returns new rows."""
+        self.polls += 1
+        search = PagedSearch(self.spec.es_url, self.spec.source_index, self.spec.api_key_b64,
+                             query=self._query(), source=self.spec.source_fields, sort=ASC,
+                             page_size=self.page_size, use_pit=False)
+        baseline = self.baseline()
+        new = 0
+        for hits in search:
+            # rows_from_hits keeps the first hit per host: hand it newest-first
+            for row in self.spec.rows_from_hits(hits[::-1], set()):
+                ts = parse_ts(row.get("timestamp"))
+                key = row.get(self.spec.row_key)
+                if ts is None or ts <= self.last_seen.get(key, float("-inf")):
+                    continue
+                self.last_seen[key] = ts
+                self.watermark = max(self.watermark, ts)
+                new += 1
+                self._queue(self.spec.evaluate(row, baseline), ts)
+        self.rows += new
+        self._ship_due()
+        return new
+
+    def _queue(self, record, ts: float) -> None:
+        if record is None:
+            return
+        item = self.builder(record)
+        if item is None:
+            return
+        if not self.pending:
+            self.pending_since = time.monotonic()
+        self.pending.append((item[0], item[1], ts))
+        if len(self.pending) >= self.max_batch:
+            self.flush()
+
+    def _ship_due(self) -> None:
+        """Flush unless the oldest pending doc can still wait one more poll."""
+        if self.pending and time.monotonic() + self.poll - self.pending_since >= self.max_latency:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self.pending:
+            return
+        batch, self.pending = self.pending, []
+        actions = [a for a, _, _ in batch]
+        try:
+            rejected = self.engine.ship_batch(actions, [d for _, d, _ in batch], self.stats)
+        except BulkFlushError as e:
+            self.errors += 1
+            self._settle(actions, set(range(len(actions))))
+            print(f"[ERROR] {self.spec.name}: tail batch of {len(batch)} dead-lettered to "
+                  f"{self.engine.state_dir}: {e}")
+            return
+        failed = {i for i, _ in rejected}
+        self._settle(actions, failed)
+        acked = time.time()
+        self.latencies.extend(acked - ts for i, (_, _, ts) in enumerate(batch) if i not in failed)
+
+    def _settle(self, actions: list, failed: set) -> None:
+        # hosts whose doc did not land are not "unchanged" next time they report
+        if self.host_state is not None:
+            self.host_state.settle(actions, failed)
+
+    # --- reporting ----------------------------------------------------------
+
+    def latency(self) -> dict:
+        values = sorted(self.latencies)
+        return {"p50": round(_quantile(values, 0.50), 3), "p95": round(_quantile(values, 0.95), 3),
+                "max": round(values[-1], 3) if values else 0.0}
+
+    def report(self) -> str:
+        lat = self.latency()
+        return (f"[TAIL] {self.spec.name}: {self.polls} poll(s), {self.rows} new result(s), "
+                f"{self.stats.docs} doc(s) shipped, latency p50 {lat['p50']}s p95 {lat['p95']}s "
+                f"max {lat['max']}s, watermark {iso(self.watermark)}")
+
+    def prometheus(self) -> str:
+        plat = self.spec.name.replace('"', "")
+        lat = self.latency()
+        lines = [
+            "# HELP compliance_tail_latency_seconds Result @timestamp to bulk acknowledgement.",
+            "# TYPE compliance_tail_latency_seconds gauge",
+        ]
+        lines += [f'compliance_tail_latency_seconds{{platform="{plat}",quantile="{q}"}} {v}'
+                  for q, v in (("0.5", lat["p50"]), ("0.95", lat["p95"]), ("1", lat["max"]))]
+        for name, help_, value in (
+            ("compliance_tail_docs_total", "Documents shipped by the tailer.", self.stats.docs),
+            ("compliance_tail_results_total", "New results seen by the tailer.", self.rows),
+            ("compliance_tail_polls_total", "Polls of the source index.", self.polls),
+            ("compliance_tail_lag_seconds", "Now minus the newest result handled.",
+             round(max(0.0, time.time() - self.watermark), 3)),
+        ):
+            lines += [f"# HELP {name} {help_}", f"# TYPE {name} gauge", f'{name}{{platform="{plat}"}} {value}']
+        return "\n".join(lines) + "\n"
+
+    # --- loop ---------------------------------------------------------------
+
+    def run(self, stop: threading.Event, *, max_polls: Optional[int] = None, report_every: float = 60,
+            on_report=None) -> None:
+        print(f"[TAIL] {self.spec.name}: following {self.spec.source_index} from {iso(self.watermark)} "
+              f"(poll {self.poll}s, batch {self.max_batch}, latency budget {self.max_latency}s)")
+        ensure_template(self.spec)
+        try:
+            self.engine.replay_dead_letters(self.stats)
+        except BulkFlushError as e:
+            self.errors += 1
+            print(f"[WARN] {self.spec.name}: dead letters not replayed, kept for the next start: {e}")
+        next_report = time.monotonic() + report_every
+        try:
+            while not stop.is_set():
+                started = time.monotonic()
+                try:
+                    self.poll_once()
+                except Exception as e:
+                    self.errors += 1
+                    print(f"[WARN] {self.spec.name}: poll {self.polls} failed: {e!r}")
+                if time.monotonic() >= next_report:
+                    next_report += report_every
+                    print(self.report())
+                    if on_report:
+                        on_report()
+                if max_polls is not None and self.polls >= max_polls:
+                    break
+                stop.wait(max(0.0, self.poll - (time.monotonic() - started)))
+        finally:
+            self.flush()
+            print(self.report())
+
+
+def tail(specs: list, *, metrics_textfile: Optional[str] = TAIL_METRICS_TEXTFILE, max_polls: Optional[int] = None,
+         report_every: float = 60, **kwargs) -> int:
+    """Tail every spec in its own thread until SIGTERM / SIGINT (or `max_polls`)."""
+    stop = threading.Event()
+    tailers = [Tailer(spec, **kwargs) for spec in specs]
+
+    def write_metrics():
+        if not metrics_textfile:
+            return
+        tmp = metrics_textfile + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as fh:
+                fh.write("".join(t.prometheus() for t in tailers))
+            os.replace(tmp, metrics_textfile)
+        except OSError as e:
+            print(f"[WARN] could not write tail metrics to {metrics_textfile}: {e}")
+
+    def on_signal(signum, _frame):
+        print(f"[TAIL] received {signal.Signals(signum).name}; stopping after the current poll")
+        stop.set()
+
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGTERM, on_signal)
+        signal.signal(signal.SIGINT, on_signal)
+    threads = [threading.Thread(target=t.run, args=(stop,), name=f"tail-{t.spec.name}", daemon=True,
+                                kwargs={"max_polls": max_polls, "report_every": report_every,
+                                        "on_report": write_metrics})
+               for t in tailers]
+    for th in threads:
+        th.start()
+    while any(th.is_alive() for th in threads):
+        for th in threads:
+            th.join(0.5)
+    write_metrics()
+    return 1 if any(t.errors for t in tailers) else 0
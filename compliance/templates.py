@@ -0,0 +1,193 @@
+# templates.py
+"""
+Index template for each platform's destination index, installed and checked
+before the first write of a run.
+
+    INDEX_TEMPLATES=install   (default) put the template when it is missing or differs
+    INDEX_TEMPLATES=verify    only check, and warn about what differs
+    INDEX_TEMPLATES=off       leave the cluster alone
+
+Without a template the destination index is created by the first bulk write
+with dynamic mappings: every string (`agent_name`, `build`, `reason`, ...)
+becomes text + keyword, so it is indexed twice, and the index gets the
+cluster's default shard count. The template `<dest>-template` covers the
+destination index and its per-run partitions (`<dest>-run-*`,
+compliance.partition) with
+  - the platform's explicit keyword / numeric / date / boolean mappings
+    (`spec.mappings`); other strings are mapped as keyword only,
+  - free-text fields such as `reason` kept in `_source` but not indexed,
+  - the index sorted by `spec.index_sort` (agent name / host id), so one host's
+    docs sit next to each other on disk and compress better,
+  - INDEX_SHARDS primaries (default 1), INDEX_REFRESH_INTERVAL (default 30s),
+    INDEX_REPLICAS when set, and `best_compression`.
+These settings come from `spec.settings`, i.e. the platform's own environment.
+
+A template only applies to indices created after it; when the destination
+index already exists with other mappings, `ensure` says so (partitioned runs
+pick the template up with the next run, otherwise reindex the index). The
+checked result is cached per process, so the daemon and sharded runs call
+`ensure` every cycle for free. A cluster that refuses the template (e.g. an API
+key without `manage_index_templates`) is reported and the run goes on.
+"""
+import hashlib
+import threading
+from typing import Dict, List, Optional
+
+import requests
+
+from . import jsoncodec
+from .http import auth_headers, get_session
+from .pipeline import PipelineSpec
+
+# field mappings for PipelineSpec.mappings
+KEYWORD = {"type": "keyword", "ignore_above": 1024}
+INTEGER = {"type": "integer"}
+BOOLEAN = {"type": "boolean"}
+# source timestamps are whatever osquery reported; a bad one must not reject the doc
+DATE = {"type": "date", "ignore_malformed": True}
+# shown, never searched or aggregated on
+FREE_TEXT = {"type": "keyword", "index": False, "doc_values": False}
+
+# fields compliance.bulk.AgentReportBuilder adds to every Windows / macOS report
+REPORT_FIELDS = {"@timestamp": DATE, "ingested_at": DATE, "source_file": KEYWORD}
+
+_checked: Dict[tuple, dict] = {}
+_lock = threading.Lock()
+
+
+def template_name(dest_index: str) -> str:
+    return f"{dest_index}-template"
+
+
+def template_body(spec: PipelineSpec) -> dict:
+    settings = spec.settings
+    index = {"number_of_shards": settings.index_shards, "refresh_interval": settings.index_refresh_interval,
+             "codec": "best_compression"}
+    if settings.index_replicas:
+        index["number_of_replicas"] = int(settings.index_replicas)
+    if spec.index_sort:
+        index["sort"] = {"field": spec.index_sort, "order": "asc"}
+    body = {
+        "index_patterns": [spec.dest_index, f"{spec.dest_index}-run-*"],
+        "priority": settings.index_template_priority,
+        "template": {
+            "settings": {"index": index},
+            "mappings": {
+                "dynamic_templates": [{"strings_as_keyword": {
+                    "match_mapping_type": "string", "mapping": KEYWORD}}],
+                "properties": spec.mappings,
+            },
+        },
+    }
+    checksum = hashlib.sha1(jsoncodec.dumps(body, sort_keys=True)).hexdigest()[:16]
+    body["_meta"] = {"managed_by": "os-version-checker", "platform": spec.name, "checksum": checksum}
+    return body
+
+
+def field_types(properties: Optional[dict], prefix: str = "") -> Dict[str, str]:
+    """Mapping properties → {"host.id": "keyword", ...} (object fields are walked, not listed)."""
+    out = {}
+    for name, m in (properties or {}).items():
+        if "properties" in m:
+            out.update(field_types(m["properties"], f"{prefix}{name}."))
+        else:
+            out[prefix + name] = m.get("type", "object")
+    return out
+
+
+def _diff(want: Dict[str, str], have: Dict[str, str]) -> List[str]:
+    return [f"{f}: {have[f]} (want {t})" for f, t in sorted(want.items()) if f in have and have[f] != t]
+
+
+class _Cluster:
+    def __init__(self, spec: PipelineSpec):
+        self.es_url = spec.es_url.rstrip("/")
+        self.headers = {"Content-Type": "application/json", **auth_headers(spec.api_key_b64)}
+
+    def call(self, method: str, path: str, body=None, missing_ok: bool = False):
+        """JSON response; None for a 404 when `missing_ok`."""
+        resp = get_session().request(method, f"{self.es_url}/{path}", headers=self.headers, timeout=60,
+                                     data=jsoncodec.dumps(body) if body is not None else None)
+        if resp.status_code == 404 and missing_ok:
+            return None
+        if not resp.ok:
+            raise RuntimeError(f"{method} /{path}: HTTP {resp.status_code} {resp.text[:300]}")
+        return jsoncodec.response_json(resp) if resp.content else {}
+
+
+def _verify(es: _Cluster, spec: PipelineSpec, body: dict) -> List[str]:
+    """What a new destination index would really get (a higher-priority template may win)."""
+    issues = []
+    sim = es.call("POST", f"_index_template/_simulate_index/{spec.dest_index}") or {}
+    resolved = sim.get("template") or {}
+    have = field_types((resolved.get("mappings") or {}).get("properties"))
+    want = field_types(spec.mappings)
+    issues += [f"new indices would map {d}" for d in _diff(want, have)]
+    unmapped = sorted(set(want) - set(have))
+    if unmapped:
+        issues.append(f"new indices would map {len(unmapped)} field(s) dynamically: "
+                      f"{', '.join(unmapped[:5])}" + (", ..." if len(unmapped) > 5 else ""))
+    sort = (((resolved.get("settings") or {}).get("index") or {}).get("sort") or {}).get("field")
+    if spec.index_sort and sort not in (spec.index_sort, [spec.index_sort]):
+        issues.append(f"new indices would be sorted by {sort!r}, not {spec.index_sort!r}")
+    others = [o.get("name") for o in sim.get("overlapping") or []]
+    if issues and others:
+        issues.append(f"overlapping template(s): {', '.join(others)}")
+    return issues
+
+
+def _existing(es: _Cluster, spec: PipelineSpec) -> List[str]:
+    """Fields the existing destination index maps differently (created before the template)."""
+    found = es.call("GET", f"{spec.dest_index}/_mapping", missing_ok=True) or {}
+    want = field_types(spec.mappings)
+    issues = []
+    for index, m in sorted(found.items()):
+        diff = _diff(want, field_types((m.get("mappings") or {}).get("properties")))
+        if diff:
+            issues.append(f"existing index '{index}' maps {'; '.join(diff[:5])}"
+                          + (f" (+{len(diff) - 5} more)" if len(diff) > 5 else ""))
+    return issues
+
+
+def ensure(spec: PipelineSpec, mode: Optional[str] = None) -> dict:
+    """Install (or only verify) `spec`'s destination template; cached per process. Default mode: spec.settings."""
+    mode = mode or spec.settings.index_templates
+    if mode not in ("install", "verify", "off"):
+        raise ValueError(f"INDEX_TEMPLATES must be install, verify or off, got {mode!r}")
+    name = template_name(spec.dest_index)
+    if mode == "off" or not spec.mappings or not spec.dest_index:
+        return {"template": name, "action": "skipped", "issues": []}
+    body = template_body(spec)
+    key = (spec.es_url, name, body["_meta"]["checksum"], mode)
+    with _lock:
+        if key in _checked:
+            return _checked[key]
+        es = _Cluster(spec)
+        try:
+            found = es.call("GET", f"_index_template/{name}", missing_ok=True)
+            current = next((t.get("index_template") or {} for t in (found or {}).get("index_templates") or []
+                            if t.get("name") == name), None)
+            have = ((current or {}).get("_meta") or {}).get("checksum")
+            if have == body["_meta"]["checksum"]:
+                action = "current"
+            elif mode == "install":
+                es.call("PUT", f"_index_template/{name}", body)
+                action = "installed" if current is None else "updated"
+            else:
+                action = "missing" if current is None else "differs"
+            issues = _verify(es, spec, body) + _existing(es, spec)
+        except (RuntimeError, requests.RequestException) as e:
+            print(f"[WARN] {spec.name}: index template '{name}' not checked, new indices get dynamic "
+                  f"mappings: {e}")
+            return {"template": name, "action": "failed", "issues": [str(e)]}
+        result = {"template": name, "action": action, "issues": issues}
+        _checked[key] = result
+
+    if action in ("missing", "differs"):
+        print(f"[WARN] {spec.name}: index template '{name}' {action} (INDEX_TEMPLATES=verify)")
+    else:
+        print(f"[OK] {spec.name}: index template '{name}' {action} "
+              f"({len(field_types(spec.mappings))} field(s), sort {spec.index_sort or '-'})")
+    for issue in issues:
+        print(f"[WARN] {spec.name}: {issue}")
+    return result
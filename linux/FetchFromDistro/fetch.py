@@ -13,12 +13,20 @@ TO ADD A NEW DISTRO
   2) Run with DIWA_DISTRO=<your_key>
 """
 
-import json
 import os
 import re
 import sys
-from urllib.request import urlopen
-from urllib.error import URLError, HTTPError
+from pathlib import Path
+
+import requests
+
+# Repo root on sys.path so the shared `compliance` package imports when run directly
+_REPO_ROOT = Path(__file__).resolve().parents[2]
+if str(_REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(_REPO_ROOT))
+
+from compliance import jsoncodec
+from compliance.http import get_session
 
 
 # =========================
@@ -75,8 +83,8 @@ def _save_snapshot(snapshot: dict, outfile: str):
     outdir = os.path.dirname(os.path.abspath(outfile)) or "."
     os.makedirs(outdir, exist_ok=True)
     tmp = outfile + ".tmp"
-    with open(tmp, "w", encoding="utf-8") as f:
-        json.dump(snapshot, f, indent=2, ensure_ascii=False)
+    with open(tmp, "wb") as f:
+        jsoncodec.dump(snapshot, f, indent=True)
     os.replace(tmp, outfile)
     print(f"[OK] wrote {outfile}")
 
@@ -151,10 +159,10 @@ def fetch_latest_for_distro(
     endpoint = f"{diwa_base.rstrip('/')}/{slug}"
 
     try:
-        with urlopen(endpoint, timeout=timeout_sec) as r:
-            raw = r.read().decode("utf-8", "replace")
-        payload = json.loads(raw)
-    except (URLError, HTTPError, json.JSONDecodeError) as e:
+        r = get_session().get(endpoint, timeout=timeout_sec)
+        r.raise_for_status()
+        payload = jsoncodec.loads(r.content.decode("utf-8", "replace"))
+    except (requests.RequestException, ValueError) as e:
         print(f"[ERR] fetch failed from {endpoint}: {e}", file=sys.stderr)
         return None
 
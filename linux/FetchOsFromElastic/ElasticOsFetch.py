@@ -1,96 +1,88 @@
 
-import os
-import sys
-import requests
-import json
 #!/usr/bin/env python3
 import os
 import sys
-import base64
-import requests
-def getLogs():
-    api_key_b64 = ""
-    ES_URL = ("").rstrip("/")
-    INDEX = ""
+from pathlib import Path
 
-    OUTFILE = os.environ.get("OUTFILE", "hosts_latest.json")
+import requests
 
-    url = f"{ES_URL}/{INDEX}/_search"
-    print(url)
+# Repo root on sys.path for the shared `compliance` package
+_REPO_ROOT = str(Path(__file__).resolve().parents[2])
+if _REPO_ROOT not in sys.path:
+    sys.path.insert(0, _REPO_ROOT)
+from compliance import ndjson
+from compliance.records import LinuxHost
+from compliance.search import PagedSearch
+from compliance.sources import epoch_millis, fan_in, load_sources, paged_fetcher
 
-    params = {
-        "size": 1000,  # fetch enough to cover all hosts; adjust as you like
-        "sort": "@timestamp:desc",
-        "filter_path": (
-            "hits.hits._source.@timestamp,"
-            "hits.hits._source.host.id,"
-            "hits.hits._source.host.name,"
-            "hits.hits._source.host.os.name,"
-            "hits.hits._source.host.os.version"
-        ),
-    }
+SOURCE_FIELDS = ["@timestamp", "host.id", "host.name", "host.os.name", "host.os.version"]
 
-    headers = {"Authorization": f"ApiKey {api_key_b64}"} if api_key_b64 else {}
+def getLogs():
+    """
+    Newest OS row per host.id across every source, written to OUTFILE.
+
+    ENV
+      ES_URL, ES_API_KEY, SOURCE_INDEX   one cluster + index (same as pipeline.py / shipper.py)
+      ES_SOURCES                         or a JSON list of {name, url, index, api_key | api_key_env}
+      OUTFILE                            default hosts_latest.ndjson; "-" = stdout
+      IO_FORMAT                          ndjson (default, one host per line) or json (one array)
+
+    With one source the hosts are written page by page as they arrive (the search
+    is already newest first); several sources are merged in memory first.
+    """
+    OUTFILE = os.environ.get("OUTFILE") or ndjson.default_path("hosts_latest")
+    out = ndjson.log(OUTFILE)
+    sources = load_sources(
+        os.environ.get("ES_SOURCES", ""),
+        es_url=os.environ.get("ES_URL", ""),
+        index=os.environ.get("SOURCE_INDEX", ""),
+        api_key_b64=os.environ.get("ES_API_KEY", ""),
+    )
+    if not sources:
+        print("[ERR] set ES_URL and SOURCE_INDEX (or ES_SOURCES)", file=sys.stderr)
+        sys.exit(2)
 
     try:
-        resp = requests.get(url, params=params, headers=headers, timeout=30)
-        resp.raise_for_status()
-        data = resp.json()
-
-        maybe_hits = data.get("hits", [])
-        docs = maybe_hits.get("hits", []) if isinstance(maybe_hits, dict) else maybe_hits
-
-        # Keep only the most recent doc per unique host.id
-        latest_by_id = {}  # id -> {"ts": ts, "host_name": ..., "os_name": ..., "os_version": ...}
-
-        for doc in docs:
-            src = (doc.get("_source") or {})
-            ts = src.get("@timestamp") or src.get("timestamp")
-            host = (src.get("host") or {})
-            host_id = host.get("id")
-            host_name = host.get("name")
-            osinfo = (host.get("os") or {})
-            os_name = osinfo.get("name")
-            os_version = osinfo.get("version")
-
-            if not host_id or not ts:
-                continue  # skip incomplete rows
-
-            # ISO8601 'Z' timestamps compare correctly as strings; newest is "greater"
-            prev = latest_by_id.get(host_id)
-            if (prev is None) or (ts > prev["ts"]):
-                latest_by_id[host_id] = {
-                    "ts": ts,
-                    "host_name": host_name,
-                    "os_name": os_name,
-                    "os_version": os_version,
-                }
-
-        # Build sorted list (newest first) for JSON output
-        rows = [
-            {
-                "id": hid,
-                "timestamp": row["ts"],
-                "host_name": row["host_name"],
-                "os_name": row["os_name"],
-                "os_version": row["os_version"],
-            }
-            for hid, row in sorted(latest_by_id.items(), key=lambda kv: kv[1]["ts"], reverse=True)
-        ]
-
-        # --- write OUTFILE just like in the distrowatch script ---
-        outdir = os.path.dirname(os.path.abspath(OUTFILE)) or "."
-        os.makedirs(outdir, exist_ok=True)
-        with open(OUTFILE, "w", encoding="utf-8") as f:
-            json.dump(rows, f, indent=2, ensure_ascii=False)
-        print(f"[OK] wrote {OUTFILE} ({len(rows)} hosts)")
-
-    except requests.exceptions.RequestException as e:
+        with ndjson.writing(OUTFILE) as writer:
+            if len(sources) == 1:
+                _stream_source(sources[0], writer, out)
+            else:
+                rows, _ = fan_in(sources, paged_fetcher(rows_from_hits, source_fields=SOURCE_FIELDS), key="id")
+                # Newest first, like one source's search (sources may differ in offset / precision)
+                rows.sort(key=lambda r: epoch_millis(r.timestamp, -1 << 63), reverse=True)
+                for r in rows:
+                    writer.write(r.as_dict())
+    except (RuntimeError, requests.RequestException) as e:
         print(f"HTTP error: {e}", file=sys.stderr)
         sys.exit(1)
-    except ValueError:
-        print("Failed to parse JSON response.", file=sys.stderr)
-        sys.exit(1)
+    print(f"[OK] wrote {OUTFILE} ({writer.count} hosts)", file=out)
+
+def _stream_source(source, writer, out):
+    """One source: each page's new hosts go straight to `writer`."""
+    search = PagedSearch(source.es_url, source.index, source.api_key_b64, source=SOURCE_FIELDS)
+    seen_ids = set()
+    for hits in search:
+        for r in rows_from_hits(hits, seen_ids):
+            writer.write(r.as_dict())
+    print(f"[OK] source {source}: {search.hits} hit(s), {writer.count} row(s)", file=out)
+
+def rows_from_hits(hits, seen_ids):
+    """
+    LinuxHost rows from `_search` hits sorted by @timestamp desc: the first hit per
+    host.id is its newest. `seen_ids` is updated in place (shared across pages).
+    """
+    rows = []
+    for doc in hits:
+        src = (doc.get("_source") or {})
+        ts = src.get("@timestamp") or src.get("timestamp")
+        host = (src.get("host") or {})
+        host_id = host.get("id")
+        if not host_id or not ts or host_id in seen_ids:
+            continue
+        seen_ids.add(host_id)
+        osinfo = (host.get("os") or {})
+        rows.append(LinuxHost(host_id, ts, host.get("name"), osinfo.get("name"), osinfo.get("version")))
+    return rows
 
 def main():
     getLogs()
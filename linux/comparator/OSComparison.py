@@ -11,32 +11,33 @@ Compare OS versions from two local JSON files:
         "22": {"version": "22.04.5", ...}
       }
     }
-- HOSTS: Most-recent OS info per host.id from your ES fetch (default: ./hosts_latest.json)
-  Expected shape (array of objects):
-    [
-      {
-        "id": "c205f951-...",
-        "timestamp": "2025-10-19T06:35:51.475Z",
-        "host_name": "PC-01",
-        "os_name": "Ubuntu",
-        "os_version": "24.04.3 LTS (Noble Numbat)"
-      },
-      ...
-    ]
-Outputs OUTFILE (default: ./out_of_date_hosts.json) as an array:
-  [
-    {"id": "...", "os_name": "Ubuntu", "current_version": "24.04.2", "latest_version": "24.04.3"},
+- HOSTS: Most-recent OS info per host.id from your ES fetch ("-" = stdin)
+  One object per line (NDJSON, what ElasticOsFetch writes), or a JSON array:
+    {"id": "c205f951-...", "timestamp": "2025-10-19T06:35:51.475Z", "host_name": "PC-01",
+     "os_name": "Ubuntu", "os_version": "24.04.3 LTS (Noble Numbat)"}
     ...
-  ]
+Hosts are compared as they are read, so memory does not grow with the fleet.
+Outputs OUTFILE (default: ./out_of_date_hosts.ndjson, "-" = stdout), one line per host:
+    {"id": "...", "os_name": "Ubuntu", "current_version": "24.04.2", "latest_version": "24.04.3"}
+    ...
+IO_FORMAT=json writes a JSON array (./out_of_date_hosts.json) as before.
 """
 
-import os, sys, json, re
+import os, sys, re
 from pathlib import Path
+from typing import Iterator
+
+# Repo root on sys.path for the shared `compliance` package
+_REPO_ROOT = str(Path(__file__).resolve().parents[2])
+if _REPO_ROOT not in sys.path:
+    sys.path.insert(0, _REPO_ROOT)
+from compliance import jsoncodec, ndjson
+from compliance.records import LinuxHost, LinuxResult
 
 # ---------- config via env (matches your previous scripts) ----------
 SNAPSHOT = os.environ.get("SNAPSHOT", "")
 HOSTS    = os.environ.get("HOSTS", "")
-OUTFILE  = os.environ.get("OUTFILE", "out_of_date_hosts.json")
+OUTFILE  = os.environ.get("OUTFILE") or ndjson.default_path("out_of_date_hosts")
 
 VERSION_RE = re.compile(r'(\d{2}\.\d{2}(?:\.\d+)?)')
 
@@ -53,7 +54,7 @@ def extract_ubuntu_version(s: str | None) -> str | None:
 
 def load_snapshot(path: str) -> dict:
     try:
-        data = json.loads(Path(path).read_text(encoding="utf-8"))
+        data = jsoncodec.loads(Path(path).read_bytes())
     except Exception as e:
         print(f"[ERR] failed to read SNAPSHOT '{path}': {e}", file=sys.stderr)
         sys.exit(1)
@@ -65,49 +66,46 @@ def load_snapshot(path: str) -> dict:
             latest[major] = info["version"]
     return latest  # e.g. {"25":"25.10","24":"24.04.3","22":"22.04.5"}
 
-def load_hosts(path: str) -> list:
+def load_hosts(path: str) -> Iterator[LinuxHost]:
+    """LinuxHost rows from HOSTS, one at a time."""
     try:
-        rows = json.loads(Path(path).read_text(encoding="utf-8"))
-        if not isinstance(rows, list):
-            raise ValueError("HOSTS file must be a JSON array")
-        return rows
+        with ndjson.reading(path) as fh:
+            for r in ndjson.read(fh):
+                yield LinuxHost.from_dict(r)
     except Exception as e:
         print(f"[ERR] failed to read HOSTS '{path}': {e}", file=sys.stderr)
         sys.exit(1)
 
+def compare_row(row: LinuxHost, latest_series: dict) -> LinuxResult | None:
+    """Return the out-of-date record for one host row, or None if it is current / not comparable."""
+    os_name = (row.os_name or "").strip()
+    if os_name.lower() != "ubuntu":
+        return None  # only compare Ubuntu
+
+    installed_raw = row.os_version
+    installed = extract_ubuntu_version(installed_raw)
+    if not installed:
+        return None  # can't parse version, skip
+
+    major = installed.split(".", 1)[0]  # "24" from "24.04.3"
+    expected = latest_series.get(major)
+    if not expected:
+        return None  # no known latest for this series
+
+    if version_key(installed) < version_key(expected):
+        return LinuxResult(row.id, os_name, installed, expected)
+    return None
+
 def main():
     latest_series = load_snapshot(SNAPSHOT)
-    hosts = load_hosts(HOSTS)
-
-    out = []
-    for row in hosts:
-        os_name = (row.get("os_name") or "").strip()
-        if os_name.lower() != "ubuntu":
-            continue  # only compare Ubuntu
-
-        installed_raw = row.get("os_version")
-        installed = extract_ubuntu_version(installed_raw)
-        if not installed:
-            continue  # can't parse version, skip
-
-        major = installed.split(".", 1)[0]  # "24" from "24.04.3"
-        expected = latest_series.get(major)
-        if not expected:
-            continue  # no known latest for this series
-
-        if version_key(installed) < version_key(expected):
-            out.append({
-                "id": row.get("id"),
-                "os_name": os_name,
-                "current_version": installed,
-                "latest_version": expected,
-            })
-
-    # Write output JSON
-    outdir = os.path.dirname(os.path.abspath(OUTFILE)) or "."
-    os.makedirs(outdir, exist_ok=True)
-    Path(OUTFILE).write_text(json.dumps(out, indent=2, ensure_ascii=False), encoding="utf-8")
-    print(f"[OK] wrote {OUTFILE} ({len(out)} out-of-date host(s))")
+
+    # Write output as the hosts stream in
+    with ndjson.writing(OUTFILE) as out:
+        for row in load_hosts(HOSTS):
+            res = compare_row(row, latest_series)
+            if res is not None:
+                out.write(res.as_dict())
+    print(f"[OK] wrote {OUTFILE} ({out.count} out-of-date host(s))", file=ndjson.log(OUTFILE))
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
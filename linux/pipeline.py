@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Linux plug-in for the shared runners (see compliance.pipeline), plus an
+asyncio entry point that runs fetch → compare → ship in one process instead
+of handing files between the FetchOsFromElastic / comparator / shipper scripts.
+
+ENV
+  ES_URL, ES_API_KEY            cluster + base64 ApiKey (same as shipper.py)
+  SOURCE_INDEX                  osquery results index to read hosts from
+  ES_SOURCES                    optional JSON list of {name, url, index, api_key | api_key_env}
+                                to read several clusters at once (newest row per host wins)
+  ES_INDEX                      destination index (same as shipper.py)
+  SNAPSHOT                      Diwa snapshot file; if unset the baseline is fetched
+  DIWA_BASE, DIWA_DISTRO        used when SNAPSHOT is unset (same as FetchFromDistro/fetch.py)
+"""
+import os, sys
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+for p in (HERE.parent, HERE / "FetchOsFromElastic", HERE / "comparator", HERE / "FetchFromDistro"):
+    if str(p) not in sys.path:
+        sys.path.insert(0, str(p))
+
+from compliance.pipeline import PipelineSpec, Settings
+from compliance.bulk import BulkEngine, LinuxHostBuilder, STATE_DIRNAME
+from compliance.dag import Stage
+from compliance.parallel import compare_rows
+from compliance.partition import for_run
+from compliance.records import LinuxHost
+from compliance.rollup import Rollup
+from compliance import templates
+from compliance.templates import DATE, KEYWORD
+from compliance.sources import fan_in, load_sources, paged_fetcher
+from ElasticOsFetch import rows_from_hits
+from OSComparison import compare_row, extract_ubuntu_version, load_snapshot
+from fetch import DISTROS, fetch_latest_for_distro
+
+ES_URL       = os.environ.get("ES_URL", "").rstrip("/")
+ES_APIKEY    = os.environ.get("ES_API_KEY", "")
+SOURCE_INDEX = os.environ.get("SOURCE_INDEX", "")
+ES_INDEX     = os.environ.get("ES_INDEX", "")
+SNAPSHOT     = os.environ.get("SNAPSHOT", "")
+DIWA_BASE    = os.environ.get("DIWA_BASE", "http://127.0.0.1:8000/api/distribution")
+DIWA_DISTRO  = os.environ.get("DIWA_DISTRO", "ubuntu").lower()
+SOURCES      = load_sources(os.environ.get("ES_SOURCES", ""), es_url=ES_URL, index=SOURCE_INDEX,
+                            api_key_b64=ES_APIKEY)
+
+SETTINGS     = Settings.from_env()   # partition / rollup / template settings
+
+SOURCE_FIELDS = ["@timestamp", "host.id", "host.name", "host.os.name", "host.os.version"]
+
+# compliance.templates: LinuxHostBuilder's ECS-ish doc
+MAPPINGS = {
+    "@timestamp": DATE,
+    "status": KEYWORD,
+    "source": KEYWORD,
+    "host": {"properties": {"id": KEYWORD}},
+    "os": {"properties": {"name": KEYWORD, "version": KEYWORD, "expected": KEYWORD}},
+}
+
+def load_baseline() -> dict:
+    """{major: latest_version} from SNAPSHOT, or straight from Diwa when unset."""
+    if SNAPSHOT:
+        return load_snapshot(SNAPSHOT)
+    snap = fetch_latest_for_distro(DIWA_BASE, DISTROS[DIWA_DISTRO])
+    if snap is None:
+        raise RuntimeError(f"could not fetch {DIWA_DISTRO} releases from {DIWA_BASE}")
+    return {major: info["version"] for major, info in (snap.get("series") or {}).items()}
+
+def line_of(row) -> str:
+    """OS line for compliance.hostindex: distro + series, e.g. "ubuntu-24"."""
+    name = (row.os_name or "").strip().lower()
+    installed = extract_ubuntu_version(row.os_version)
+    return f"{name}-{installed.split('.', 1)[0]}" if installed else name
+
+def baseline_lines(latest_series: dict) -> dict:
+    return {f"ubuntu-{major}": version for major, version in latest_series.items()}
+
+def rollup_of(row, record, latest_series):
+    """compliance.rollup: compare_row only returns out-of-date hosts, so the rest is sorted out here."""
+    installed = extract_ubuntu_version(row.os_version)
+    if record is not None:
+        return "behind", None, record.current_version
+    if (row.os_name or "").strip().lower() != "ubuntu" or not installed:
+        return "unknown", None, installed
+    if not latest_series.get(installed.split(".", 1)[0]):
+        return "unsupported", None, installed
+    return "compliant", 0, installed
+
+def spec(dest_index: str = ES_INDEX) -> PipelineSpec:
+    return PipelineSpec(
+        name="linux",
+        es_url=ES_URL,
+        api_key_b64=ES_APIKEY,
+        source_index=SOURCE_INDEX,
+        dest_index=dest_index,
+        query=None,
+        source_fields=SOURCE_FIELDS,
+        load_baseline=load_baseline,
+        rows_from_hits=rows_from_hits,
+        evaluate=compare_row,
+        builder=LinuxHostBuilder(dest_index),
+        shard_field="host.id",
+        row_key="id",
+        sources=SOURCES,
+        line_of=line_of,
+        baseline_lines=baseline_lines,
+        row_type=LinuxHost,
+        rollup_of=rollup_of,
+        mappings=MAPPINGS,
+        index_sort="host.id",
+        state_dir=str(HERE / STATE_DIRNAME),   # same as ship()'s
+        settings=SETTINGS,
+    )
+
+def fetch_hosts() -> list:
+    """Newest OS row per host.id across SOURCES, paging each source index newest-first."""
+    rows, _ = fan_in(SOURCES, paged_fetcher(rows_from_hits, source_fields=SOURCE_FIELDS), key="id")
+    print(f"[OK] fetched {len(rows)} host(s) from {len(SOURCES)} source(s)")
+    return rows
+
+def compare(hosts: list, latest_series: dict, workers: int = None, rollup: Rollup = None) -> list:
+    out = []
+    for row, res in zip(hosts, compare_rows(compare_row, latest_series, hosts, workers=workers)):
+        if rollup is not None:
+            rollup.add(row, res, latest_series)
+        if res is not None:
+            out.append(res)
+    print(f"[OK] {len(out)} out-of-date host(s)")
+    return out
+
+def ship(rows: list, dest_index: str = ES_INDEX):
+    engine = BulkEngine(ES_URL, ES_APIKEY, state_dir=str(HERE / STATE_DIRNAME))
+    builder = LinuxHostBuilder(dest_index)
+    partition = for_run(ES_URL, ES_APIKEY, dest_index, SETTINGS)   # PARTITION_MODE=run
+    if partition is not None:
+        builder, dest_index = partition.wrap(builder), partition.index
+    stats = engine.ship(rows, builder)
+    print(f"[OK] shipped {stats.docs} doc(s) to '{dest_index}'")
+    if partition is not None:
+        partition.commit(stats)
+    return stats
+
+def stages(dest_index: str = ES_INDEX, compare_workers: int = None) -> list:
+    """
+    hosts ∥ baseline → compare → ship → rollup, for compliance.dag (ship after the
+    index template check). Same steps as the FetchOsFromElastic → comparator →
+    shipper scripts, handing data over in memory.
+    compare_workers > 1 compares in a process pool (default: $COMPARE_WORKERS).
+    """
+    run_spec = spec(dest_index)
+    rollup = Rollup.of(run_spec)
+    return [
+        Stage("fetch", lambda r: fetch_hosts()),
+        Stage("baseline", lambda r: load_baseline()),
+        Stage("template", lambda r: templates.ensure(run_spec)),
+        Stage("compare", lambda r: compare(r["fetch"], r["baseline"], compare_workers, rollup),
+              deps=("fetch", "baseline")),
+        Stage("ship", lambda r: ship(r["compare"], dest_index), deps=("compare", "template")),
+        Stage("rollup", lambda r: rollup.ship(run_spec), deps=("compare", "ship")),
+    ]
+
+def main():
+    import argparse
+    from contextlib import nullcontext
+    from compliance import aio
+    ap = argparse.ArgumentParser(description="Linux fetch → compare → ship in one process")
+    ap.add_argument("--profile", nargs="?", const="", default=None, metavar="DIR",
+                    help="write cProfile + tracemalloc reports (default DIR: profiles/<timestamp>)")
+    ap.add_argument("--compare-workers", type=int, default=None,
+                    help="compare rows in a process pool of this size (default: $COMPARE_WORKERS, off)")
+    ap.add_argument("--shard", default=None, metavar="i/N",
+                    help="only handle the hosts whose host.id hashes into shard i of N (0-based)")
+    ap.add_argument("--shard-dir", default=None,
+                    help="where the shard summary is written (default: $SHARD_DIR or shards/)")
+    ap.add_argument("--run-id", default=None,
+                    help="same id on every shard of one run (default: $SHARD_RUN_ID or the UTC date)")
+    args = ap.parse_args()
+    if args.shard:
+        from compliance.shard import Shard
+        try:
+            args.shard = Shard.parse(args.shard)
+        except ValueError as e:
+            ap.error(str(e))
+    if not SOURCES:
+        print("[ERR] set ES_URL and SOURCE_INDEX (or ES_SOURCES)", file=sys.stderr); return 2
+    profiler = None
+    if args.profile is not None:
+        from compliance.profiling import StageProfiler, default_dir
+        profiler = StageProfiler(args.profile or default_dir(str(HERE)))
+    kwargs = {} if args.compare_workers is None else {"compare_workers": args.compare_workers}
+    with profiler.stage("pipeline") if profiler else nullcontext():
+        if args.shard:
+            from compliance.shard import SHARD_DIR, run_shard
+            run_shard(spec(), args.shard, args.shard_dir or SHARD_DIR, args.run_id, **kwargs)
+        else:
+            aio.run(spec(), **kwargs)
+    if profiler is not None:
+        profiler.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,66 +1,50 @@
-import os, sys, json, datetime, requests
+import os, sys
+from pathlib import Path
 
-ES_URL    = os.environ.get("ES_URL", ").rstrip("/")
+# Repo root on sys.path for the shared `compliance` package
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from compliance import ndjson
+from compliance.bulk import BulkEngine, BulkFlushError, LinuxHostBuilder, STATE_DIRNAME
+
+ES_URL    = os.environ.get("ES_URL", "").rstrip("/")
 ES_INDEX  = os.environ.get("ES_INDEX", "")
 ES_APIKEY = os.environ.get("ES_API_KEY", "")         # base64 ApiKey
-INPUT     = os.environ.get("INPUT", "")
+INPUT     = os.environ.get("INPUT", "")              # NDJSON or JSON array; "-" = stdin
+BATCH     = int(os.environ.get("BULK_BATCH_SIZE", "500"))
+STATE_DIR = os.environ.get("SHIP_STATE_DIR") or os.path.join(os.path.dirname(os.path.abspath(INPUT or ".")), STATE_DIRNAME)
 
 def main():
     if not ES_URL:
         print("[ERR] set ES_URL", file=sys.stderr); return 2
 
-    try:
-        rows = json.loads(open(INPUT, "r", encoding="utf-8").read())
-    except FileNotFoundError:
+    if INPUT != ndjson.STDIO and not os.path.exists(INPUT):
         print(f"[OK] '{INPUT}' not found; nothing to ship"); return 0
-    except Exception as e:
-        print(f"[ERR] reading {INPUT}: {e}", file=sys.stderr); return 1
-
-    if not rows:
-        print("[OK] empty file; nothing to ship"); return 0
 
-    now = datetime.datetime.utcnow().isoformat() + "Z"
-    ndjson = []
-    for r in rows:
-        host_id = r.get("id")
-        os_name = r.get("os_name")
-        cur     = r.get("current_version")
-        exp     = r.get("latest_version")
+    engine = BulkEngine(ES_URL, ES_APIKEY, batch_size=BATCH, timeout=30, state_dir=STATE_DIR)
+    read = [0]
 
-        # ECS-ish document
-        doc = {
-            "@timestamp": now,
-            "status": "out_of_date",
-            "source": "comparator",
-            "host": {"id": host_id},
-            "os": {
-                "name": os_name,
-                "version": cur,
-                "expected": exp,   # custom field alongside os.version
-            },
-        }
-
-        # deterministic _id so re-running upserts same host+current_version
-        ndjson.append(json.dumps({"index": {"_index": ES_INDEX, "_id": f"{host_id}-{cur}"}}))
-        ndjson.append(json.dumps(doc))
-
-    headers = {"Content-Type": "application/x-ndjson"}
-    if ES_APIKEY: headers["Authorization"] = f"ApiKey {ES_APIKEY}"
+    def rows():
+        # one comparator row at a time, NDJSON or a JSON array
+        with ndjson.reading(INPUT) as fh:
+            for row in ndjson.read(fh):
+                read[0] += 1
+                yield row
 
     try:
-        res = requests.post(f"{ES_URL}/_bulk", data="\n".join(ndjson) + "\n", headers=headers, timeout=30)
-        res.raise_for_status()
-        body = res.json()
-    except requests.exceptions.RequestException as e:
-        print(f"[ERR] ES HTTP error: {e}", file=sys.stderr); return 1
-    except ValueError:
-        print("[ERR] ES returned non-JSON", file=sys.stderr); return 1
+        stats = engine.ship(rows(), LinuxHostBuilder(ES_INDEX))
+    except BulkFlushError as e:
+        print(f"[ERR] ES bulk error: {e}", file=sys.stderr); return 1
+    except (OSError, ValueError) as e:
+        print(f"[ERR] reading {INPUT}: {e}", file=sys.stderr); return 1
+
+    if not read[0]:
+        print("[OK] empty input; nothing to ship"); return 0
 
-    if body.get("errors"):
-        fails = sum(1 for it in body.get("items", []) if it.get("index", {}).get("error"))
-        print(f"[WARN] shipped with {fails} failure(s)")
-    print(f"[OK] shipped {len(rows)} doc(s) to '{ES_INDEX}'")
+    if stats.failed:
+        print(f"[WARN] shipped with {stats.failed} failure(s)")
+    print(f"[OK] shipped {read[0]} doc(s) to '{ES_INDEX}'")
     return 0
 
 if __name__ == "__main__":
-    sys.exit(main())
\ No newline at end of file
+    sys.exit(main())
@@ -1,14 +1,26 @@
 # config.py
 from pathlib import Path
 from dotenv import load_dotenv
-import os, re, ast
+import os, re, ast, sys
 
 # Always resolve path so it works no matter where you run from
 ENV_PATH = Path(__file__).resolve().parent / ".env"
 load_dotenv(dotenv_path=ENV_PATH)  # set override=True if you want .env to win over OS env
 
+# Repo root on sys.path so the shared `compliance` package imports from here too
+REPO_ROOT = Path(__file__).resolve().parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from compliance.pipeline import Settings
+
+# Partition / rollup / template settings, read while this .env is loaded (compliance.pipeline.Settings)
+SETTINGS = Settings.from_env()
+
 
 ES_URL = (os.getenv("ES_URL"))
 SOURCE_INDEX = os.getenv("SOURCE_INDEX")
 API_KEY_B64 = os.getenv("API_KEY_B64")
+# Optional JSON list of {name, url, index, api_key | api_key_env} to read several clusters
+ES_SOURCES = os.getenv("ES_SOURCES", "")
 DEST_INDEX = os.getenv("DEST_INDEX")
\ No newline at end of file
@@ -1,10 +1,12 @@
 import os
 import re
-import json
 from datetime import datetime, timezone
 from fetch_from_elastic import get_elastic_updates
 from fetch_latest_version import get_maintained_macos_latest_simple
 from config import  SOURCE_INDEX, ES_URL
+from compliance import jsoncodec
+from compliance.parallel import compare_rows
+from compliance.records import MacResult
 
 def normalize_version(v: str) -> str:
     """
@@ -26,73 +28,115 @@ def sanitize_filename(name: str) -> str:
 
 # --- Main function -----------------------------------------------------------
 
-def generate_agent_update_reports(rows,latest_versions, output_dir: str = "agent_update_reports") -> None:
+def build_baseline(latest_versions) -> dict:
     """
-    - Fetches agent macOS versions from Elastic
-    - Fetches latest maintained macOS versions from endoflife.date
-    - For each agent, writes <output_dir>/<agent_name>.json with enriched fields:
-        {
-          agent_name, agent_version_raw, agent_version, branch_major,
-          is_maintained_major, branch_latest_version,
-          is_updated (1/0), reason, observed_at, checked_at, sources
-        }
+    Precompute the lookups every agent row is compared against, from a list like
+    ["26.0.1", "15.7.1", "14.8.1"] (a MacReleaseHistory also gives versions/days behind).
     """
-    rows = rows  # [{agent_name, version, timestamp}, ...]
-    latest_versions = latest_versions  # ["26.0.1", "15.7.1", "14.8.1"]
-
     # Normalize latest list, then build quick lookups
     normalized_latest = [normalize_version(v) for v in latest_versions]
-    latest_set = set(normalized_latest)
     major_to_latest = {}
     for v in normalized_latest:
         mj = major_of(v)
         if mj:
             major_to_latest[mj] = v  # maintained major -> its latest version
+    return {
+        "normalized_latest": normalized_latest,
+        "latest_set": set(normalized_latest),
+        "major_to_latest": major_to_latest,
+        "maintained_branches": ", ".join(sorted(major_to_latest.keys(), key=int, reverse=True)),
+        "history": latest_versions if hasattr(latest_versions, "behind") else None,
+    }
+
+def build_record(row, baseline: dict, checked_at: str) -> MacResult:
+    """Compare one MacRow (agent_name, version, timestamp) against `build_baseline()` output."""
+    major_to_latest = baseline["major_to_latest"]
+
+    agent_name = row.agent_name or "unknown"
+    raw_version = row.version or ""
+    observed_at = row.timestamp
+
+    agent_version = normalize_version(raw_version)
+    agent_major = major_of(agent_version)
+    is_maintained_major = agent_major in major_to_latest
+    branch_latest = major_to_latest.get(agent_major)
+
+    is_updated = (agent_version in baseline["latest_set"])
+    history = baseline.get("history")
+    # lower bounds: the history only holds the versions endoflife.date has listed as latest so far
+    known_versions_behind, known_days_behind = (history.behind(agent_version) if history is not None
+                                                else (None, None))
+
+    if not agent_version:
+        reason = "No version reported by agent."
+    elif is_updated:
+        reason = f"{agent_version} is the latest for maintained branch {agent_major}."
+    elif is_maintained_major:
+        reason = f"{agent_version} is behind the maintained branch {agent_major} (latest is {branch_latest})."
+        if known_versions_behind:
+            reason += (f" At least {known_versions_behind} newer version(s), the first released at least "
+                       f"{known_days_behind} day(s) ago.")
+    else:
+        reason = (
+            f"{agent_version} is on non-maintained branch {agent_major}; "
+            f"maintained branches are {baseline['maintained_branches']} "
+            f"with latest versions {', '.join(baseline['normalized_latest'])}."
+        )
+
+    return MacResult(
+        agent_name,
+        raw_version,
+        agent_version or None,
+        agent_major or None,
+        bool(is_maintained_major),
+        branch_latest,
+        is_updated,
+        reason,
+        observed_at,
+        checked_at,
+        known_versions_behind,
+        known_days_behind,
+    )
+
+def generate_agent_update_reports(rows,latest_versions, output_dir: str = "agent_update_reports",
+                                  workers: int | None = None, rollup=None) -> dict:
+    """
+    - Fetches agent macOS versions from Elastic
+    - Fetches latest maintained macOS versions from endoflife.date
+    - For each agent, writes <output_dir>/<agent_name>.json with enriched fields:
+        {
+          agent_name, agent_version_raw, agent_version, branch_major,
+          is_maintained_major, branch_latest_version,
+          is_updated (1/0), reason, observed_at, checked_at, sources,
+          known_versions_behind, known_days_behind (lower bounds, see compliance.release_history)
+        }
+
+    workers > 1 compares in a process pool (default: $COMPARE_WORKERS).
+    rollup: optional compliance.rollup.Rollup, counted as the records go by.
+
+    Returns a small summary dict (plus "rollup" when one is given).
+    """
+    # rows: [MacRow(agent_name, version, timestamp), ...]
+    # latest_versions: ["26.0.1", "15.7.1", "14.8.1"]
+    baseline = build_baseline(latest_versions)
 
     os.makedirs(output_dir, exist_ok=True)
     checked_at = datetime.now(timezone.utc).isoformat()
 
-    for row in rows:
-        agent_name = row.get("agent_name") or "unknown"
-        raw_version = row.get("version") or ""
-        observed_at = row.get("timestamp")
-
-        agent_version = normalize_version(raw_version)
-        agent_major = major_of(agent_version)
-        is_maintained_major = agent_major in major_to_latest
-        branch_latest = major_to_latest.get(agent_major)
-
-        is_updated = (agent_version in latest_set)
-
-        if not agent_version:
-            reason = "No version reported by agent."
-        elif is_updated:
-            reason = f"{agent_version} is the latest for maintained branch {agent_major}."
-        elif is_maintained_major:
-            reason = f"{agent_version} is behind the maintained branch {agent_major} (latest is {branch_latest})."
-        else:
-            maintained_branches = ", ".join(sorted(major_to_latest.keys(), key=int, reverse=True))
-            reason = (
-                f"{agent_version} is on non-maintained branch {agent_major}; "
-                f"maintained branches are {maintained_branches} "
-                f"with latest versions {', '.join(normalized_latest)}."
-            )
-
-        record = {
-            "agent_name": agent_name,
-            "agent_version_raw": raw_version,
-            "agent_version": agent_version or None,
-            "branch_major": agent_major or None,
-            "is_maintained_major": bool(is_maintained_major),
-            "branch_latest_version": branch_latest,
-            "is_updated": is_updated,  
-            "reason": reason,
-            "observed_at": observed_at,
-            "checked_at": checked_at,
-            
-        }
-        outfile = os.path.join(output_dir, f"{sanitize_filename(agent_name)}.json")
-        with open(outfile, "w", encoding="utf-8") as fh:
-            json.dump(record, fh, indent=2, ensure_ascii=False)
+    summary = {"total": 0, "yes": 0, "no": 0}
+    records = compare_rows(build_record, baseline, rows, workers=workers, extra=(checked_at,))
+    for row, record in zip(rows, records):
+        fname = f"{sanitize_filename(record.agent_name)}.json"
+        with open(os.path.join(output_dir, fname), "wb") as fh:
+            fh.write(jsoncodec.dumps(record.as_dict(), indent=True))
+
+        summary["total"] += 1
+        summary["yes" if record.is_updated else "no"] += 1
+        if rollup is not None:
+            rollup.add(row, (fname, record), baseline)
+
+    if rollup is not None:
+        summary["rollup"] = rollup
+    return summary
 
 # --- Optional CLI ------------------------------------------------------------
@@ -1,56 +1,38 @@
 import sys
 import requests
 import sys
-from config import ES_URL, SOURCE_INDEX, API_KEY_B64
+from config import ES_URL, SOURCE_INDEX, API_KEY_B64, ES_SOURCES
+from compliance import jsoncodec
+from compliance.http import get_session
+from compliance.records import MacRow
+from compliance.sources import Fetched, fan_in, load_sources
+
+# resolved at import: api_key_env names may come from this folder's .env
+SOURCES = load_sources(ES_SOURCES, es_url=ES_URL, index=SOURCE_INDEX, api_key_b64=API_KEY_B64)
 
 
 def get_elastic_updates():
-    url = f"{ES_URL.rstrip('/')}/{SOURCE_INDEX}/_search"
+    """Rows from every configured source (ES_SOURCES, else ES_URL/SOURCE_INDEX), newest per agent."""
+    rows, _ = fan_in(SOURCES, fetch_source, key="agent_name")
+    return rows
+
+
+def fetch_source(source):
+    url = f"{source.es_url}/{source.index}/_search"
     params = {
         "size": 10000,
         "filter_path": "hits.hits"
     }
-    headers = {"Authorization": f"ApiKey {API_KEY_B64}"}
+    headers = {"Authorization": f"ApiKey {source.api_key_b64}"}
 
     try:
-        resp = requests.get(url, params=params, headers=headers, timeout=30)
+        resp = get_session().get(url, params=params, headers=headers, timeout=30)
         resp.raise_for_status()
-        data = resp.json()
+        data = jsoncodec.response_json(resp)
         hits = data.get("hits", {}).get("hits", [])
         print(f"Retrieved {len(hits)} os_version docs")
 
-        rows = []
-        seen_agents = set()
-
-        for doc in hits:
-            src = doc.get("_source", {}) or {}
-            host = src.get("host", {}) or {}
-            os_ = host.get("os", {}) or {}
-            os_name = os_.get("name")
-            action = src.get("action_data") or {}
-
-            agent = src.get("agent") or {}
-            agent_name = agent.get("name")
-
-            if os_name != "macOS" or not action:
-                continue
-
-            if action.get("query") != "SELECT * from os_version;":
-                continue
-
-            if agent_name in seen_agents:
-                continue
-            seen_agents.add(agent_name)
-            osquery = src.get("osquery") or {}
-            version = osquery.get("version")
-
-            rows.append({
-                "agent_name": agent_name,
-                "version": version,
-                "timestamp": src.get("@timestamp")
-            })
-
-        return rows
+        return Fetched(rows_from_hits(hits, set()), len(hits))
 
     except requests.exceptions.RequestException as e:
         print(f" Elastic HTTP error: {e}", file=sys.stderr)
@@ -59,3 +41,34 @@ def get_elastic_updates():
         print(" Failed to parse Elastic JSON.", file=sys.stderr)
         sys.exit(1)
 
+
+def rows_from_hits(hits, seen_agents):
+    """
+    Turn raw `_search` hits into macOS os_version rows (MacRow), one per agent.
+    `seen_agents` is updated in place so it can be shared across pages.
+    """
+    rows = []
+    for doc in hits:
+        src = doc.get("_source", {}) or {}
+        host = src.get("host", {}) or {}
+        os_ = host.get("os", {}) or {}
+        os_name = os_.get("name")
+        action = src.get("action_data") or {}
+
+        agent = src.get("agent") or {}
+        agent_name = agent.get("name")
+
+        if os_name != "macOS" or not action:
+            continue
+
+        if action.get("query") != "SELECT * from os_version;":
+            continue
+
+        if agent_name in seen_agents:
+            continue
+        seen_agents.add(agent_name)
+        osquery = src.get("osquery") or {}
+        version = osquery.get("version")
+
+        rows.append(MacRow(agent_name, version, src.get("@timestamp")))
+    return rows
@@ -1,26 +1,84 @@
-import json
-from urllib.request import Request, urlopen
+import os
+import time
+from pathlib import Path
 from typing import List
 
-URL = "https://endoflife.date/api/v1/products/macos/"
+import requests
+
+from compliance import jsoncodec
+from compliance.http import get_session
+from compliance.release_history import MacReleaseHistory
+
+URL = os.getenv("MACOS_EOL_URL", "https://endoflife.date/api/v1/products/macos/")
+# Version history seen so far, grown by every fetch; re-fetched once older than
+# the TTL (seconds). 0 fetches every time and keeps no file (latest versions only).
+HISTORY_FILE = os.getenv("MACOS_HISTORY_FILE") or str(Path(__file__).resolve().parent / ".macos_history.json")
+HISTORY_TTL = float(os.getenv("MACOS_EOL_CACHE_TTL", "21600"))
 
 def get_maintained_macos_latest_simple() -> List[str]:
     """
     Returns a list like ["26.0.1", "15.7.1", "14.8.1"] for all maintained
-    macOS releases (e.g., Tahoe, Sequoia, Sonoma).
+    macOS releases (e.g., Tahoe, Sequoia, Sonoma). It is a MacReleaseHistory,
+    so it also carries the per-major version history (see load_macos_history).
+    """
+    return load_macos_history()
+
+def load_macos_history() -> MacReleaseHistory:
     """
-    req = Request(URL, headers={"Accept": "application/json"})
-    with urlopen(req, timeout=20) as resp:
-        if resp.status != 200:
-            raise RuntimeError(f"Fetch failed: {resp.status} {resp.reason}")
-        data = json.load(resp)
+    The cached history from HISTORY_FILE while it is fresh; otherwise fetch
+    endoflife.date and add each release's latest version to it. If the fetch
+    fails, the cached copy is used.
+    """
+    cached = _read_history()
+    now = time.time()
+    if cached is not None and now - cached.get("fetched_at", 0) < HISTORY_TTL:
+        print(f"[OK] macOS history: cached {int(now - cached['fetched_at'])}s ago")
+        return MacReleaseHistory.from_json(cached.get("majors"))
+
+    try:
+        resp = get_session().get(URL, headers={"Accept": "application/json"}, timeout=20)
+        if resp.status_code != 200:
+            raise RuntimeError(f"Fetch failed: {resp.status_code} {resp.reason}")
+        data = jsoncodec.response_json(resp)
+    except (requests.RequestException, RuntimeError, ValueError) as e:
+        if cached is None:
+            raise
+        print(f"[WARN] macOS history: fetch failed ({e}); using copy from "
+              f"{int(now - cached.get('fetched_at', 0))}s ago")
+        return MacReleaseHistory.from_json(cached.get("majors"))
 
+    history = MacReleaseHistory.from_json((cached or {}).get("majors"))
+    before = sum(len(v) for v in history.keys.values())
     releases = (data.get("result") or {}).get("releases") or []
-    versions = []
     for r in releases:
         latest = r.get("latest") or {}
-        if r.get("isMaintained") and latest.get("name"):
-            v = str(latest["name"]).strip()
-            if v not in versions:  # de-dupe, preserve order
-                versions.append(v)
-    return versions
+        name = str(latest.get("name") or "").strip()
+        major = str(r.get("name") or name.split(".", 1)[0]).strip()
+        history.add(major, name, latest.get("date"), maintained=bool(r.get("isMaintained")))
+    history.freeze()
+    added = sum(len(v) for v in history.keys.values()) - before
+    if added:
+        print(f"[OK] macOS history: {added} new version(s)")
+    _write_history({"url": URL, "fetched_at": now, "majors": history.to_json()})
+    return history
+
+def _read_history():
+    if HISTORY_TTL <= 0:
+        return None
+    try:
+        with open(HISTORY_FILE, "rb") as fh:
+            data = jsoncodec.load(fh)
+        return data if data.get("url") == URL else None
+    except (OSError, ValueError):
+        return None
+
+def _write_history(data: dict) -> None:
+    if HISTORY_TTL <= 0:
+        return
+    try:
+        tmp = HISTORY_FILE + ".tmp"
+        with open(tmp, "wb") as fh:
+            jsoncodec.dump(data, fh, indent=True)
+        os.replace(tmp, HISTORY_FILE)
+    except OSError as e:
+        print(f"[WARN] could not write {HISTORY_FILE}: {e}")
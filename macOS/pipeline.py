@@ -0,0 +1,141 @@
+# pipeline.py
+"""macOS plug-in for the shared runners (see compliance.pipeline)."""
+from datetime import datetime, timezone
+from pathlib import Path
+
+from config import ES_URL, SOURCE_INDEX, API_KEY_B64, DEST_INDEX, SETTINGS
+from compliance.pipeline import PipelineSpec
+from compliance.bulk import AgentReportBuilder, STATE_DIRNAME, ship_dir_to_elastic
+from compliance.dag import Stage
+from compliance.records import MacRow
+from compliance.rollup import Rollup
+from compliance import templates
+from compliance.templates import BOOLEAN, DATE, FREE_TEXT, INTEGER, KEYWORD, REPORT_FIELDS
+from fetch_from_elastic import SOURCES, get_elastic_updates, rows_from_hits
+from fetch_latest_version import get_maintained_macos_latest_simple
+from create_json import (build_baseline, build_record, major_of, normalize_version, sanitize_filename,
+                         generate_agent_update_reports)
+
+OUT_DIR = str(Path(__file__).resolve().parent / "agent_update_reports")
+
+# Only what rows_from_hits() reads; the os_version query check stays client-side
+QUERY = {"bool": {"filter": [{"match": {"host.os.name": "macOS"}}]}}
+SOURCE_FIELDS = [
+    "@timestamp",
+    "agent.name",
+    "host.os.name",
+    "action_data.query",
+    "osquery.version",
+]
+
+# compliance.templates: one MacResult per agent (see compliance.records)
+MAPPINGS = {
+    **REPORT_FIELDS,
+    "agent_name": KEYWORD,
+    "agent_version_raw": KEYWORD,
+    "agent_version": KEYWORD,
+    "branch_major": KEYWORD,
+    "is_maintained_major": BOOLEAN,
+    "branch_latest_version": KEYWORD,
+    "is_updated": BOOLEAN,
+    "reason": FREE_TEXT,
+    "observed_at": DATE,
+    "checked_at": DATE,
+    "known_versions_behind": INTEGER,
+    "known_days_behind": INTEGER,
+}
+
+
+def load_baseline() -> dict:
+    baseline = build_baseline(get_maintained_macos_latest_simple())
+    baseline["checked_at"] = datetime.now(timezone.utc).isoformat()
+    return baseline
+
+
+def evaluate(row, baseline):
+    """(filename, record) — the same shape ship_dir_to_elastic reads back from disk."""
+    record = build_record(row, baseline, baseline["checked_at"])
+    return sanitize_filename(record.agent_name) + ".json", record
+
+
+def line_of(row) -> str:
+    """OS line for compliance.hostindex: the major (15, 26, ...)."""
+    return f"major-{major_of(normalize_version(row.version))}"
+
+
+def baseline_lines(baseline) -> dict:
+    """
+    Maintained majors depend on their own latest only; every other major's
+    reason lists all maintained branches, so they share the "*" value.
+    """
+    lines = {f"major-{m}": v for m, v in baseline["major_to_latest"].items()}
+    lines["*"] = ",".join(baseline["normalized_latest"])
+    return lines
+
+
+def rollup_of(row, record, baseline):
+    """compliance.rollup: (status, days behind, version) of one compared agent; days are a lower bound."""
+    result = record[1]
+    if not result.agent_version:
+        return "unknown", None, None
+    if result.is_updated:
+        return "compliant", 0, result.agent_version
+    if result.is_maintained_major:
+        return "behind", result.known_days_behind, result.agent_version
+    return "unsupported", result.known_days_behind, result.agent_version
+
+
+def spec(dest_index: str = DEST_INDEX) -> PipelineSpec:
+    return PipelineSpec(
+        name="macos",
+        es_url=ES_URL,
+        api_key_b64=API_KEY_B64,
+        source_index=SOURCE_INDEX,
+        dest_index=dest_index,
+        query=QUERY,
+        source_fields=SOURCE_FIELDS,
+        load_baseline=load_baseline,
+        rows_from_hits=rows_from_hits,
+        evaluate=evaluate,
+        builder=AgentReportBuilder(dest_index),
+        shard_field="agent.name",
+        row_key="agent_name",
+        sources=SOURCES,
+        line_of=line_of,
+        baseline_lines=baseline_lines,
+        row_type=MacRow,
+        rollup_of=rollup_of,
+        mappings=MAPPINGS,
+        index_sort="agent_name",
+        state_dir=str(Path(OUT_DIR) / STATE_DIRNAME),   # same as ship_dir_to_elastic's
+        settings=SETTINGS,
+    )
+
+
+def stages(dest_index: str = DEST_INDEX, out_dir: str = OUT_DIR, compare_workers: int = None) -> list:
+    """
+    fetch ∥ baseline → compare (per-agent files) → ship → rollup, for compliance.dag;
+    ship also waits for the index template check (compliance.templates).
+    compare_workers > 1 compares in a process pool (default: $COMPARE_WORKERS).
+    """
+    run_spec = spec(dest_index)
+    return [
+        Stage("fetch", lambda r: get_elastic_updates()),
+        Stage("baseline", lambda r: get_maintained_macos_latest_simple()),
+        Stage("template", lambda r: templates.ensure(run_spec)),
+        Stage("compare", lambda r: generate_agent_update_reports(
+            r["fetch"], r["baseline"], output_dir=out_dir, workers=compare_workers,
+            rollup=Rollup.of(run_spec)),
+              deps=("fetch", "baseline")),
+        Stage("ship", lambda r: ship_dir_to_elastic(
+            directory=out_dir,
+            dest_index=dest_index,
+            es_url=run_spec.es_url,
+            api_key_b64=run_spec.api_key_b64,
+            settings=run_spec.settings,
+            refresh="wait_for",   # optional: make searchable before returning
+            batch_size=500,
+            id_field="agent_name",  # or None to let ES autogenerate IDs
+        ), deps=("compare", "template")),
+        Stage("rollup", lambda r: r["compare"]["rollup"].ship(run_spec), deps=("compare", "ship")),
+    ]
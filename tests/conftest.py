@@ -0,0 +1,87 @@
+import os
+import sys
+import threading
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from bench import stub_es  # noqa: E402
+
+
+class Stub:
+    """bench.stub_es served from a thread; `state` is its StubState."""
+
+    def __init__(self):
+        self.server = stub_es.make_server(track_ids=True)
+        self.state = self.server.RequestHandlerClass.state
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def acked(self, index: str) -> set:
+        with self.state.lock:
+            return set(self.state.acked.get(index, ()))
+
+    def fail_bulk(self, n: int) -> None:
+        with self.state.lock:
+            self.state.bulk_errors = n
+
+    def truncate_bulk(self, n: int) -> None:
+        with self.state.lock:
+            self.state.bulk_truncated = n
+
+    def reject(self, *ids) -> None:
+        with self.state.lock:
+            self.state.reject_ids = set(ids)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub():
+    s = Stub()
+    yield s
+    s.close()
+
+
+def _host_ids(hits, seen):
+    rows = []
+    for h in hits:
+        host_id = h["_source"]["host"]["id"]
+        if host_id not in seen:
+            seen.add(host_id)
+            rows.append({"id": host_id, "timestamp": h["_source"]["@timestamp"]})
+    return rows
+
+
+@pytest.fixture
+def host_spec(stub, tmp_path):
+    """PipelineSpec over the stub's synthetic Linux fleet: every host is shipped as {"id": ...}."""
+    from compliance.pipeline import PipelineSpec
+
+    def make(hosts: int = 10, dest: str = "out", **kw) -> PipelineSpec:
+        return PipelineSpec(
+            name="test", es_url=stub.url, api_key_b64=None,
+            source_index=f"bench-linux-{hosts}", dest_index=dest,
+            query=None, source_fields=None,
+            load_baseline=lambda: {},
+            rows_from_hits=_host_ids,
+            evaluate=lambda row, baseline: row,
+            builder=lambda r: ({"index": {"_index": dest, "_id": r["id"]}}, {"host": {"id": r["id"]}}),
+            row_key="id",
+            state_dir=str(tmp_path / "state"),
+            **kw,
+        )
+    return make
+
+
+@pytest.fixture
+def no_backoff(monkeypatch):
+    """Bulk retries without sleeping."""
+    import compliance.bulk.engine as engine
+    monkeypatch.setattr(engine.time, "sleep", lambda s: None)
@@ -0,0 +1,33 @@
+import os
+
+import pytest
+
+from compliance import aio
+from compliance.bulk import BulkFlushError, state
+
+
+def run(spec, **kw):
+    kw.setdefault("index_dir", None)
+    kw.setdefault("lookup_dir", None)
+    return aio.run(spec, ship_concurrency=1, batch_size=4, **kw)
+
+
+def test_failed_batch_is_dead_lettered_and_replayed(stub, host_spec, no_backoff):
+    spec = host_spec(hosts=10)
+    stub.fail_bulk(3)       # the first batch exhausts its retries
+    with pytest.raises(BulkFlushError):
+        run(spec)
+    dead_letters = os.path.join(spec.state_dir, state.DEAD_LETTER_FILE)
+    assert os.path.exists(dead_letters)
+    assert len(stub.acked("out")) == 6
+
+    summary = run(spec)
+    assert summary["bulk"]["replayed"] == 4
+    assert len(stub.acked("out")) == 10
+    assert not os.path.exists(dead_letters)
+
+
+def test_default_state_dir_is_the_specs(host_spec):
+    spec = host_spec()
+    assert spec.ship_state() == os.path.abspath(spec.state_dir)
+    assert spec.ship_state("tail").endswith(os.path.join("state", "tail"))
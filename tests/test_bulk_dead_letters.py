@@ -0,0 +1,92 @@
+import os
+
+import pytest
+
+from compliance import jsoncodec
+from compliance.bulk import BulkEngine, BulkFlushError, state
+
+
+def build(record):
+    return {"index": {"_index": "t", "_id": record}}, {"n": record}
+
+
+def engine(stub, state_dir, **kw):
+    return BulkEngine(stub.url, batch_size=kw.pop("batch_size", 2), retry_backoff_sec=0,
+                      state_dir=str(state_dir), **kw)
+
+
+def lines(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, "rb") as fh:
+        return [jsoncodec.loads(line) for line in fh if line.strip()]
+
+
+def test_failed_batch_is_dead_lettered_and_replayed(stub, tmp_path):
+    stub.fail_bulk(3)   # every attempt of the first batch
+    with pytest.raises(BulkFlushError):
+        engine(stub, tmp_path).ship(["a", "b", "c"], build)
+    parked = lines(tmp_path / state.DEAD_LETTER_FILE)
+    assert [e["action"]["index"]["_id"] for e in parked] == ["a", "b"]
+    assert all(e["attempts"] == 0 for e in parked)   # no answer is not a rejection
+    assert stub.acked("t") == set()
+
+    stats = engine(stub, tmp_path).ship([], build)
+    assert stats.replayed == 2
+    assert stub.acked("t") == {"a", "b"}
+    assert not os.listdir(tmp_path)
+
+
+def test_rejected_items_end_in_poison_file(stub, tmp_path, monkeypatch):
+    monkeypatch.setattr(state, "DEAD_LETTER_MAX_ATTEMPTS", 2)
+    stub.reject("bad")
+    stats = engine(stub, tmp_path).ship(["ok", "bad"], build)
+    assert stats.failed == 1 and stats.dead_lettered == 1
+    assert [e["attempts"] for e in lines(tmp_path / state.DEAD_LETTER_FILE)] == [1]
+
+    engine(stub, tmp_path).ship([], build)      # rejected again: second attempt
+    assert lines(tmp_path / state.DEAD_LETTER_FILE) == []
+    poison = lines(tmp_path / state.POISON_FILE)
+    assert [(e["doc"]["n"], e["attempts"]) for e in poison] == [("bad", 2)]
+
+    stats = engine(stub, tmp_path).ship([], build)
+    assert stats.replayed == 0
+    assert len(lines(tmp_path / state.POISON_FILE)) == 1
+
+
+def test_interrupted_replay_keeps_unsent_items(stub, tmp_path, monkeypatch):
+    state.write_dead_letters(str(tmp_path), *zip(*[build(r) for r in "abcde"]), ["x"] * 5)
+    eng = engine(stub, tmp_path)
+    real_flush = eng.flush
+    calls = []
+
+    def flush(actions, docs, stats):
+        calls.append(1)
+        if len(calls) == 2:
+            raise KeyboardInterrupt
+        return real_flush(actions, docs, stats)
+
+    monkeypatch.setattr(eng, "flush", flush)
+    with pytest.raises(KeyboardInterrupt):
+        eng.ship([], build)
+    assert stub.acked("t") == {"a", "b"}
+    claimed = lines(tmp_path / (state.DEAD_LETTER_FILE + ".replay"))
+    assert [e["doc"]["n"] for e in claimed] == ["c", "d", "e"]
+
+    engine(stub, tmp_path).ship([], build)
+    assert stub.acked("t") == set("abcde")
+    assert not os.listdir(tmp_path)
+
+
+def test_replay_that_cannot_park_again_keeps_the_claim(stub, tmp_path, monkeypatch):
+    state.write_dead_letters(str(tmp_path), *zip(*[build(r) for r in "abc"]), ["x"] * 3)
+    stub.fail_bulk(3)
+
+    def broken(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr("compliance.bulk.engine.write_dead_letters", broken)
+    with pytest.raises(OSError):
+        engine(stub, tmp_path).ship([], build)
+    claimed = lines(tmp_path / (state.DEAD_LETTER_FILE + ".replay"))
+    assert [e["doc"]["n"] for e in claimed] == ["a", "b", "c"]
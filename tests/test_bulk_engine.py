@@ -0,0 +1,37 @@
+import pytest
+
+from compliance import jsoncodec
+from compliance.bulk import BulkEngine, BulkFlushError, state
+
+
+def build(record):
+    return {"index": {"_index": "t", "_id": record}}, {"n": record, "pad": "x" * 40}
+
+
+def ndjson_size(records):
+    return sum(len(jsoncodec.dumps(a)) + len(jsoncodec.dumps(d)) + 2 for a, d in map(build, records))
+
+
+@pytest.mark.parametrize("compress", [True, False])
+def test_retry_serializes_the_chunked_body_again(stub, compress):
+    records = [f"h{i:03d}" for i in range(50)]
+    stub.fail_bulk(1)
+    eng = BulkEngine(stub.url, batch_size=50, retry_backoff_sec=0, compress=compress, chunk_size=64)
+    stats = eng.ship(records, build)
+    assert stats.retries == 1 and stats.failed == 0
+    assert stub.acked("t") == set(records)
+    assert stats.bytes_raw == ndjson_size(records)        # counted for the first attempt only
+    with stub.state.lock:
+        assert stub.state.counters["bulk_docs"] == 50
+
+
+def test_undecodable_response_is_dead_lettered(stub, tmp_path):
+    stub.truncate_bulk(1)
+    eng = BulkEngine(stub.url, batch_size=2, retry_backoff_sec=0, state_dir=str(tmp_path))
+    with pytest.raises(BulkFlushError, match="undecodable response"):
+        eng.ship(["a", "b"], build)
+    with open(tmp_path / state.DEAD_LETTER_FILE, "rb") as fh:
+        assert len(fh.read().splitlines()) == 2
+
+    stats = BulkEngine(stub.url, retry_backoff_sec=0, state_dir=str(tmp_path)).ship([], build)
+    assert stats.replayed == 2 and stub.acked("t") == {"a", "b"}
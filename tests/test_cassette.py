@@ -0,0 +1,59 @@
+import gzip
+
+import pytest
+import requests
+
+from compliance import aio
+from compliance.http import get_session, set_transport
+
+
+@pytest.fixture
+def transport():
+    yield set_transport
+    set_transport()      # back to the network for the next test
+
+
+def run(spec):
+    return aio.run(spec, index_dir=None, lookup_dir=None, batch_size=4)
+
+
+def test_replayed_run_matches_the_recorded_one_offline(stub, host_spec, transport, tmp_path):
+    cassette = str(tmp_path / "run.cassette.gz")
+    spec = host_spec(hosts=10)
+    transport(record=cassette)
+    recorded = run(spec)
+    transport()
+    with stub.state.lock:
+        searches, bulks = stub.state.counters["search"], stub.state.counters["bulk"]
+
+    transport(replay=cassette)
+    replayed = run(spec)
+    assert (replayed["rows"], replayed["bulk"]["docs"]) == (recorded["rows"], recorded["bulk"]["docs"]) == (10, 10)
+    with stub.state.lock:
+        assert (stub.state.counters["search"], stub.state.counters["bulk"]) == (searches, bulks)
+
+
+def test_cassette_keeps_no_credentials_or_write_bodies(stub, transport, tmp_path):
+    cassette = str(tmp_path / "c.cassette.gz")
+    transport(record=cassette)
+    session = get_session()
+    session.post(f"{stub.url}/bench-linux-5/_search", json={"size": 1},
+                 headers={"Authorization": "ApiKey c2VjcmV0"})
+    session.post(f"{stub.url}/metrics/_doc", json={"secret-field": 1})
+    transport()
+    with gzip.open(cassette, "rt") as fh:
+        text = fh.read()
+    assert text.count("\n") == 2
+    assert "c2VjcmV0" not in text and "secret-field" not in text
+
+
+def test_unrecorded_request_fails_on_replay(stub, transport, tmp_path):
+    cassette = str(tmp_path / "c.cassette.gz")
+    transport(record=cassette)
+    get_session().post(f"{stub.url}/bench-linux-5/_search", json={"size": 1})
+    transport(replay=cassette)
+    session = get_session()
+    # scheme/host may differ from the capture
+    assert session.post("http://elsewhere:9200/bench-linux-5/_search", json={"size": 1}).status_code == 200
+    with pytest.raises(requests.ConnectionError):
+        session.post(f"{stub.url}/bench-linux-5/_search", json={"size": 2})
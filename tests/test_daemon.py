@@ -0,0 +1,67 @@
+import pytest
+
+from compliance import aio
+from compliance.bulk import BulkFlushError
+from compliance.daemon import Daemon, HostStateFilter
+
+
+def cycle(spec):
+    return aio.run(spec, ship_concurrency=1, batch_size=4, index_dir=None, lookup_dir=None)
+
+
+def filtered_spec(host_spec, hs):
+    spec = host_spec(hosts=10)
+    spec.builder = hs.wrap(spec.builder)
+    spec.on_batch = hs.settle
+    return spec
+
+
+def test_rejected_host_is_shipped_again_next_cycle(stub, host_spec):
+    hs = HostStateFilter()
+    rejected = "00000000000000000000000000000003"
+    stub.reject(rejected)
+    cycle(filtered_spec(host_spec, hs))
+    assert rejected not in hs.fingerprints
+    assert len(hs.fingerprints) == 9
+    assert not hs.pending
+
+    stub.reject()
+    summary = cycle(filtered_spec(host_spec, hs))
+    assert summary["bulk"]["docs"] - summary["bulk"]["replayed"] == 1   # only the rejected host
+    assert hs.unchanged == 9
+    assert rejected in stub.acked("out")
+
+
+def test_failed_batch_is_not_remembered(stub, host_spec, no_backoff):
+    hs = HostStateFilter()
+    stub.fail_bulk(3)
+    with pytest.raises(BulkFlushError):
+        cycle(filtered_spec(host_spec, hs))
+    assert len(hs.fingerprints) == 6      # the first batch of 4 never landed
+    assert not hs.pending
+
+
+class _Run:
+    def __init__(self, ok):
+        self.ok = ok
+
+
+@pytest.mark.parametrize("results, max_cycles, code", [
+    ([True, True], 2, 0),
+    ([False, True], 2, 1),
+    ([False, True], None, 1),     # stopped by a signal after a failed cycle
+])
+def test_exit_code_reports_failed_cycles(monkeypatch, results, max_cycles, code):
+    daemon = Daemon(["linux"], interval=0, max_cycles=max_cycles)
+    outcomes = iter(results)
+
+    def cycle():
+        daemon.cycles += 1
+        ok = next(outcomes)
+        if daemon.cycles == len(results):
+            daemon.stop.set()     # as SIGTERM does
+        return _Run(ok)
+
+    monkeypatch.setattr(daemon, "cycle", cycle)
+    monkeypatch.setattr("compliance.daemon.signal.signal", lambda *a: None)
+    assert daemon.serve_forever() == code
@@ -0,0 +1,57 @@
+import gzip
+import json
+
+import pytest
+import requests
+
+from bench import fleet
+
+
+def test_documents_are_computed_from_their_position():
+    f = fleet.Fleet("windows", hosts=100)
+    assert f.doc(42) == fleet.Fleet("windows", hosts=100).doc(42)
+    stamps = [d["@timestamp"] for d in f]
+    assert len(stamps) == len(f) == 100 and stamps == sorted(stamps, reverse=True)    # newest first
+
+
+@pytest.mark.parametrize("platform, key", [("windows", "agent.name"), ("macos", "agent.name"),
+                                           ("linux", "host.id")])
+def test_each_host_reports_results_per_host_times(platform, key):
+    f = fleet.Fleet(platform, hosts=50, results_per_host=3)
+    names = []
+    for d in f:
+        v = d
+        for part in key.split("."):
+            v = v[part]
+        names.append(v)
+    assert len(names) == 150 and len(set(names)) == 50
+
+
+def test_parse_size():
+    assert [fleet.parse_size(s) for s in ("250", "10k", "1.5k", "1M")] == [250, 10_000, 1_500, 1_000_000]
+
+
+def test_stub_pages_through_the_fleet_with_search_after(stub):
+    seen, after = [], None
+    while True:
+        body = {"size": 7, "sort": [{"@timestamp": "desc"}]}
+        if after:
+            body["search_after"] = after
+        hits = requests.post(f"{stub.url}/bench-linux-30-x2/_search", json=body).json()["hits"]["hits"]
+        if not hits:
+            break
+        seen += [h["_source"]["host"]["id"] for h in hits]
+        after = hits[-1]["sort"]
+    assert len(seen) == 60 and len(set(seen)) == 30
+    assert requests.post(f"{stub.url}/not-a-fleet/_search", json={}).status_code == 404
+
+
+def test_stub_bulk_accepts_gzip_and_acks_ids(stub):
+    lines = []
+    for i in range(3):
+        lines += [json.dumps({"index": {"_index": "out", "_id": f"h{i}"}}), json.dumps({"n": i})]
+    r = requests.post(f"{stub.url}/_bulk", data=gzip.compress(("\n".join(lines) + "\n").encode()),
+                      headers={"Content-Type": "application/x-ndjson", "Content-Encoding": "gzip"})
+    assert r.status_code == 200 and not r.json()["errors"] and len(r.json()["items"]) == 3
+    assert stub.acked("out") == {"h0", "h1", "h2"}
+    assert stub.state.counters["bulk_docs"] == 3
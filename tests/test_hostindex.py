@@ -0,0 +1,55 @@
+import os
+from dataclasses import replace
+
+from compliance import aio
+from compliance.hostindex import HostIndex, reevaluate
+
+
+def line_of(row):
+    return "even" if int(row["id"], 16) % 2 == 0 else "odd"
+
+
+def indexed_spec(host_spec, baseline, dest="out"):
+    spec = host_spec(hosts=10, dest=dest, line_of=line_of, baseline_lines=dict)
+    return replace(spec, load_baseline=lambda: dict(baseline))
+
+
+def test_changed_lines_compare_with_the_stored_signatures(tmp_path):
+    index = HostIndex(str(tmp_path), "test")
+    index.write({"a": {"1": {"id": "1"}}, "b": {"2": {"id": "2"}}, "c": {"3": {"id": "3"}}},
+                {"a": 1, "b": 1, "*": 0})
+    assert index.changed_lines({"a": 1, "b": 1, "*": 0}) == []
+    assert index.changed_lines({"a": 2, "b": 1, "*": 0}) == ["a"]
+    assert index.changed_lines({"a": 1, "b": 1, "*": 5}) == ["c"]     # "c" follows the default
+    assert index.changed_lines({"a": 1, "*": 0}) == ["b"]              # "b" now falls back to "*"
+    assert index.load_line("a") == [{"id": "1"}]
+    assert index.load_line("missing") == []
+
+
+def test_rewrite_drops_the_lines_no_longer_seen(tmp_path):
+    index = HostIndex(str(tmp_path), "test")
+    index.write({"a": {"1": {}}, "b/c": {"2": {}}}, {})
+    assert sorted(os.listdir(index.lines_dir)) == ["a.json", "b_c.json"]
+    index.write({"a": {"1": {}}}, {})
+    assert os.listdir(index.lines_dir) == ["a.json"]
+
+
+def test_reevaluate_ships_only_the_hosts_on_changed_lines(stub, host_spec, tmp_path):
+    index_dir = str(tmp_path / "index")
+    aio.run(indexed_spec(host_spec, {"even": 1, "odd": 1}), index_dir=index_dir, lookup_dir=None)
+    assert len(stub.acked("out")) == 10
+    manifest = HostIndex(index_dir, "test").manifest()
+    odd = manifest["lines"]["odd"]["hosts"]
+    assert odd + manifest["lines"]["even"]["hosts"] == 10
+
+    summary = reevaluate(indexed_spec(host_spec, {"even": 1, "odd": 2}, dest="again"), index_dir)
+    assert summary["lines"] == ["odd"] and summary["docs"] == odd
+    assert len(stub.acked("again")) == odd
+
+    summary = reevaluate(indexed_spec(host_spec, {"even": 1, "odd": 2}, dest="again"), index_dir)
+    assert summary["lines"] == [] and summary["docs"] == 0      # signatures were saved
+
+
+def test_reevaluate_without_an_index_does_nothing(stub, host_spec, tmp_path):
+    summary = reevaluate(indexed_spec(host_spec, {"even": 1}), str(tmp_path / "none"))
+    assert summary["docs"] == 0 and not stub.acked("out")
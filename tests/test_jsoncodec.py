@@ -0,0 +1,32 @@
+import importlib.util
+
+import pytest
+
+from compliance import jsoncodec
+
+DOCS = [
+    {"agent_name": "WIN-0001", "build": 26100, "revision": 6899, "is_updated": False, "days": None,
+     "reason": "26100.6584 is 1 update(s) behind — KB5066835", "pct": 97.25,
+     "tags": ["é", "日本", " "], "nested": {"a": [1, 2.5, {"b": True}]}},
+    {22631: 6060, 26100: 6899},             # non-string keys (Windows build tables)
+    [],
+    {},
+]
+
+
+def backend(monkeypatch, codec):
+    monkeypatch.setenv("JSON_CODEC", codec)
+    spec = importlib.util.spec_from_file_location(f"jsoncodec_{codec}", jsoncodec.__file__)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    assert mod.NAME == codec
+    return mod
+
+
+@pytest.mark.parametrize("doc", DOCS)
+@pytest.mark.parametrize("kwargs", [{}, {"indent": True}, {"sort_keys": True}])
+def test_backends_write_the_same_bytes(monkeypatch, doc, kwargs):
+    pytest.importorskip("orjson")
+    std, fast = backend(monkeypatch, "json"), backend(monkeypatch, "orjson")
+    assert std.dumps(doc, **kwargs) == fast.dumps(doc, **kwargs)
+    assert std.loads(fast.dumps(doc)) == fast.loads(std.dumps(doc))
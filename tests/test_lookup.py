@@ -0,0 +1,104 @@
+import json
+import os
+import threading
+
+import pytest
+import requests
+
+from compliance import aio
+from compliance.lookup import HostLookup, make_server
+
+
+def write(directory, platform, *entries):
+    path = os.path.join(directory, f"{platform}.jsonl")
+    with open(path, "w") as fh:
+        for e in entries:
+            fh.write(json.dumps({"platform": platform, **e}) + "\n")
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))    # a new mtime on every write
+
+
+def host(name, status="compliant", observed="2025-10-20T00:00:00Z", **kw):
+    return {"agent_name": name, "host_name": name.upper(), "status": status,
+            "up_to_date": status == "compliant", "observed_at": observed, **kw}
+
+
+def test_reload_only_rebuilds_when_a_snapshot_changed(tmp_path):
+    write(tmp_path, "windows", host("win-1"), host("win-2", "behind"))
+    lookup = HostLookup(str(tmp_path))
+    assert lookup.reload() is True
+    assert json.loads(lookup.get("WIN-2"))["status"] == "behind"     # keys are case-insensitive
+    assert lookup.reload() is False
+    assert lookup.reload(force=True) is True
+
+    write(tmp_path, "windows", host("win-2"))
+    assert lookup.reload() is True
+    assert lookup.get("win-1") is None and json.loads(lookup.get("win-2"))["up_to_date"]
+    assert lookup.health()["hosts"] == 1 and lookup.reloads == 3
+
+
+def test_newest_observation_wins_across_snapshots(tmp_path):
+    write(tmp_path, "linux", host("dual", "behind", observed="2025-10-19T00:00:00Z"))
+    write(tmp_path, "windows", host("dual", observed="2025-10-20T00:00:00Z"))
+    lookup = HostLookup(str(tmp_path))
+    lookup.reload()
+    assert json.loads(lookup.get("dual"))["platform"] == "windows"
+    assert json.loads(lookup.get("DUAL"))["platform"] == "windows"     # the host_name key too
+
+
+def test_unreadable_lines_are_skipped(tmp_path):
+    write(tmp_path, "macos", host("mac-1"))
+    with open(tmp_path / "macos.jsonl", "a") as fh:
+        fh.write("{not json\n")
+    lookup = HostLookup(str(tmp_path))
+    lookup.reload()
+    assert lookup.health()["hosts"] == 1
+
+
+def test_async_run_writes_a_snapshot(stub, host_spec, tmp_path):
+    spec = host_spec(hosts=10, rollup_of=lambda row, record, baseline: ("compliant", 0, "1.0"))
+    aio.run(spec, index_dir=None, lookup_dir=str(tmp_path / "lookup"))
+    assert os.listdir(tmp_path / "lookup") == ["test.jsonl"]
+    lookup = HostLookup(str(tmp_path / "lookup"))
+    lookup.reload()
+    assert lookup.health()["hosts"] == 10
+    some_id = next(iter(stub.acked("out")))
+    assert json.loads(lookup.get(some_id))["up_to_date"] is True
+
+
+@pytest.fixture
+def server(tmp_path):
+    write(tmp_path, "windows", host("win-1"), host("win-2", "behind"))
+    lookup = HostLookup(str(tmp_path))
+    lookup.reload()
+    srv = make_server(lookup, port=0)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{srv.server_address[1]}", tmp_path
+    srv.shutdown()
+    srv.server_close()
+
+
+def test_http_lookups(server):
+    url, _ = server
+    r = requests.get(f"{url}/host/win-1")
+    assert r.status_code == 200 and r.json()["found"] and r.json()["result"]["status"] == "compliant"
+    r = requests.get(f"{url}/host/nobody")
+    assert r.status_code == 404 and r.json() == {"host": "nobody", "found": False, "result": None}
+
+    r = requests.get(f"{url}/hosts", params={"name": ["win-2", "nobody"]})
+    assert r.json()["results"]["nobody"] is None
+    assert r.json()["results"]["win-2"]["status"] == "behind"
+    r = requests.post(f"{url}/hosts", json={"hosts": ["WIN-1"]})
+    assert r.json()["results"]["WIN-1"]["agent_name"] == "win-1"
+
+    assert requests.post(f"{url}/hosts", json={"names": []}).status_code == 400
+    assert requests.get(f"{url}/nope").status_code == 404
+    assert requests.get(f"{url}/health").json()["hosts"] == 2
+
+
+def test_http_reload_picks_up_a_new_snapshot(server):
+    url, directory = server
+    write(directory, "windows", host("win-3"))
+    r = requests.post(f"{url}/reload")
+    assert r.status_code == 200 and r.json()["reloaded"] and r.json()["hosts"] == 1
+    assert requests.get(f"{url}/host/win-3").status_code == 200
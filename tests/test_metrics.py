@@ -0,0 +1,69 @@
+import pytest
+
+from compliance.http import get_session
+from compliance.metrics import RunMetrics
+
+
+def test_stage_records_time_docs_and_http_bytes(stub):
+    metrics = RunMetrics("test")
+    with metrics.stage("fetch") as st:
+        resp = get_session().post(f"{stub.url}/bench-linux-10/_search", json={"size": 5})
+        st.docs = len(resp.json()["hits"]["hits"])
+    fetch = metrics.stages["fetch"]
+    assert fetch.status == "ok" and fetch.docs == 5 and fetch.seconds > 0
+    assert fetch.bytes_sent > 0 and fetch.bytes_received == len(resp.content)
+    assert fetch.peak_rss_bytes > 0
+
+
+def test_failed_stage_fails_the_run():
+    metrics = RunMetrics("test")
+    with metrics.stage("baseline"):
+        pass
+    with pytest.raises(RuntimeError):
+        with metrics.stage("fetch"):
+            raise RuntimeError("boom")
+    doc = metrics.to_doc()
+    assert doc["status"] == "failed" and doc["stages"]["fetch"]["status"] == "failed"
+    assert doc["stages"]["baseline"]["status"] == "ok"
+
+
+def test_absorb_splits_an_async_summary_into_its_phases():
+    metrics = RunMetrics("test")
+    with metrics.stage("windows.pipeline") as st:
+        pass
+    metrics.absorb(st, {"rows": 10, "bulk": {"docs": 9, "retries": 2},
+                        "phases": {"fetch": 0.5, "compare": 0.25, "ship": 0.75}})
+    doc = metrics.to_doc()
+    assert doc["stages"]["windows.pipeline"]["docs"] == 10 and doc["retries"] == 2
+    assert doc["stages"]["windows.ship"] == {**doc["stages"]["windows.ship"], "seconds": 0.75, "docs": 9,
+                                             "docs_per_sec": 12.0}
+    assert doc["docs"] == 9                                     # shipped docs only
+
+
+def test_absorb_counts_plain_results():
+    metrics = RunMetrics("test")
+    for name, result in (("fetch", [1, 2, 3]), ("compare", {"total": 7})):
+        with metrics.stage(name) as st:
+            pass
+        metrics.absorb(st, result)
+    assert metrics.stages["fetch"].docs == 3 and metrics.stages["compare"].docs == 7
+
+
+def test_prometheus_textfile(tmp_path):
+    metrics = RunMetrics("win\"dows")
+    with metrics.stage("ship") as st:
+        st.docs = 4
+    path = tmp_path / "textfile" / "compliance.prom"
+    metrics.emit(index="", textfile=str(path))
+    text = path.read_text()
+    assert 'compliance_run_success{platform="windows"} 1' in text
+    assert 'compliance_stage_docs{platform="windows",stage="ship"} 4' in text
+    assert text.count("# TYPE ") == 10
+
+
+def test_emit_ships_one_doc_and_never_raises(stub):
+    metrics = RunMetrics("test")
+    doc = metrics.emit(es_url=stub.url, index="compliance-runs", textfile="")
+    assert doc["run_id"] == metrics.run_id
+    assert stub.state.counters["docs"] == 1
+    metrics.emit(es_url="http://127.0.0.1:9", index="compliance-runs", textfile="")   # nothing listening
@@ -0,0 +1,43 @@
+import io
+
+import pytest
+
+from compliance import jsoncodec, ndjson
+
+ROWS = [{"id": "h1", "os": "ubuntu"}, {"id": "h2", "os": "ubuntu"}]
+
+
+def test_read_ndjson_stream_skips_blank_lines():
+    data = b"\n".join(jsoncodec.dumps(r) for r in ROWS) + b"\n\n"
+    assert list(ndjson.read(io.BytesIO(data))) == ROWS
+
+
+@pytest.mark.parametrize("indent", [False, True])
+def test_read_detects_a_json_array_file(indent):
+    data = b"\n  " + jsoncodec.dumps(ROWS, indent=indent)
+    assert list(ndjson.read(io.BytesIO(data))) == ROWS
+
+
+def test_read_rejects_an_array_followed_by_more_lines():
+    with pytest.raises(ValueError):
+        list(ndjson.read(io.BytesIO(b'["a"]\n{"b": 1}\n')))
+
+
+@pytest.mark.parametrize("fmt", ["ndjson", "json"])
+def test_writing_round_trips_and_renames(tmp_path, fmt):
+    path = str(tmp_path / f"hosts.{fmt}")
+    with ndjson.writing(path, fmt) as writer:
+        for r in ROWS:
+            writer.write(r)
+    with ndjson.reading(path) as fh:
+        assert list(ndjson.read(fh)) == ROWS
+    assert [p.name for p in tmp_path.iterdir()] == [f"hosts.{fmt}"]
+
+
+def test_failed_stage_leaves_no_file(tmp_path):
+    path = str(tmp_path / "hosts.ndjson")
+    with pytest.raises(RuntimeError):
+        with ndjson.writing(path, "ndjson") as writer:
+            writer.write(ROWS[0])
+            raise RuntimeError("compare failed")
+    assert list(tmp_path.iterdir()) == []
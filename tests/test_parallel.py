@@ -0,0 +1,20 @@
+import threading
+
+from compliance import parallel
+
+
+def double(row, baseline, offset):
+    return row * baseline + offset
+
+
+def test_pool_never_forks_and_keeps_order():
+    stop = threading.Event()
+    busy = threading.Thread(target=stop.wait)    # the runners call the pool with threads alive
+    busy.start()
+    try:
+        with parallel.ComparePool(double, 2, workers=2, chunk_size=3, extra=(1,)) as pool:
+            assert pool._pool._mp_context.get_start_method() in ("forkserver", "spawn")
+            assert list(pool.map(range(20))) == [r * 2 + 1 for r in range(20)]
+    finally:
+        stop.set()
+        busy.join()
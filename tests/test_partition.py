@@ -0,0 +1,68 @@
+from datetime import datetime, timezone
+
+from compliance.bulk import BulkEngine
+from compliance.partition import Partition, for_run, latest_alias
+from compliance.pipeline import Settings
+
+
+def build(record):
+    return {"index": {"_index": "res", "_id": record}}, {"host": record}
+
+
+def run(stub, day, ids=("a", "b", "c"), retention=2):
+    part = Partition(stub.url, None, "res", retention=retention,
+                     now=datetime(2026, 10, day, tzinfo=timezone.utc))
+    stats = BulkEngine(stub.url, batch_size=2, retry_backoff_sec=0).ship(list(ids), part.wrap(build))
+    return part, stats
+
+
+def aliased(stub):
+    with stub.state.lock:
+        return set(stub.state.aliases.get(latest_alias("res"), ()))
+
+
+def test_retried_create_counts_as_existing(stub):
+    part, first = run(stub, 17)
+    assert first.failed == 0 and stub.acked(part.index) == {"a", "b", "c"}
+    # the same batches again, as after a timeout whose request had landed
+    again = BulkEngine(stub.url, retry_backoff_sec=0).ship(["a", "b", "c"], part.wrap(build))
+    assert again.existing == 3 and again.failed == 0 and again.dead_lettered == 0
+    assert part.commit(again)
+
+
+def test_commit_moves_alias_and_prunes_old_partitions(stub):
+    parts = []
+    for day in (17, 18, 19):
+        part, stats = run(stub, day)
+        assert part.commit(stats)
+        assert aliased(stub) == {part.index}
+        parts.append(part.index)
+    assert parts[-1].endswith("-run-20261019-000000")
+    with stub.state.lock:
+        left = {i for i in stub.state.indices if i.startswith("res-run-")}
+    assert left == set(parts[1:])
+
+
+def test_incomplete_run_keeps_the_alias(stub):
+    good, stats = run(stub, 18)
+    assert good.commit(stats)
+    stub.reject("b")
+    bad, stats = run(stub, 19)
+    assert stats.failed == 1
+    assert not bad.commit(stats)
+    assert aliased(stub) == {good.index}
+
+
+def test_for_run_follows_the_spec_settings():
+    assert for_run("http://es", None, "res", Settings()) is None
+    part = for_run("http://es", None, "res", Settings(partition_mode="run", partition_retention=3))
+    assert part.retention == 3 and part.index.startswith("res-run-")
+
+
+def test_run_without_docs_gets_an_empty_partition(stub):
+    part, stats = run(stub, 19, ids=())
+    assert stats.docs == 0
+    assert part.commit(stats)
+    assert aliased(stub) == {part.index}
+    with stub.state.lock:
+        assert part.index in stub.state.indices
@@ -0,0 +1,31 @@
+import os
+
+import dotenv
+
+from compliance import partition, platforms, rollup, templates
+
+ENVS = {
+    "Windows": {"PARTITION_MODE": "run", "ROLLUP_INDEX": "win-rollup", "INDEX_SHARDS": "3"},
+    "macOS": {},
+}
+
+
+def test_each_platform_keeps_its_own_env_settings(monkeypatch):
+    def load_dotenv(dotenv_path=None, **kwargs):
+        os.environ.update(ENVS[os.path.basename(os.path.dirname(dotenv_path))])
+        return True
+
+    monkeypatch.setattr(dotenv, "load_dotenv", load_dotenv)
+    monkeypatch.setattr(platforms, "_loaded", {})
+    for name in ("PARTITION_MODE", "ROLLUP_INDEX", "INDEX_SHARDS"):
+        monkeypatch.delenv(name, raising=False)
+
+    windows = platforms.load_platform("windows").spec()
+    macos = platforms.load_platform("macos").spec()
+    assert "PARTITION_MODE" not in os.environ
+
+    assert partition.partitioned(windows.settings) and not partition.partitioned(macos.settings)
+    assert rollup.rollup_index(windows) == "win-rollup"
+    assert rollup.rollup_index(macos) == f"{macos.dest_index}-rollup"
+    assert templates.template_body(windows)["template"]["settings"]["index"]["number_of_shards"] == 3
+    assert templates.template_body(macos)["template"]["settings"]["index"]["number_of_shards"] == 1
@@ -0,0 +1,51 @@
+import os
+import pstats
+import threading
+import tracemalloc
+
+from compliance.dag import Stage, run_dag
+from compliance.profiling import StageProfiler, default_dir
+
+
+def grow():
+    return [bytes(1000) for _ in range(2000)]
+
+
+def test_each_stage_gets_cpu_and_allocation_reports(tmp_path):
+    profiler = StageProfiler(str(tmp_path / "p"))
+    with profiler.stage("a.compare"):
+        kept = grow()
+    profiler.close()
+    assert tracemalloc.is_tracing() != profiler._started_tracemalloc     # stops only what it started
+    assert sorted(os.listdir(tmp_path / "p")) == ["a.compare.alloc.txt", "a.compare.pstats", "a.compare.txt"]
+    stats = pstats.Stats(str(tmp_path / "p" / "a.compare.pstats"))
+    assert any(func[2] == "grow" for func in stats.stats)
+    alloc = (tmp_path / "p" / "a.compare.alloc.txt").read_text()
+    assert "test_profiling.py" in alloc.split("==", 1)[1]          # the growing line is named
+    assert len(kept) == 2000
+
+
+def test_profiled_dag_runs_one_stage_at_a_time(tmp_path):
+    running, overlap = [], []
+    lock = threading.Lock()
+
+    def work(name):
+        def fn(_):
+            with lock:
+                running.append(name)
+                overlap.append(len(running))
+            grow()
+            with lock:
+                running.remove(name)
+        return fn
+
+    profiler = StageProfiler(str(tmp_path))
+    run = run_dag([Stage(n, work(n)) for n in ("fetch", "baseline", "template")], profiler=profiler)
+    profiler.close()
+    assert run.ok and max(overlap) == 1
+    assert sorted(profiler.stages) == ["baseline", "fetch", "template"]
+
+
+def test_default_dir_is_timestamped():
+    parent, name = os.path.split(default_dir("out"))
+    assert parent == os.path.join("out", "profiles") and len(name) == len("20251020-101500")
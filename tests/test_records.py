@@ -0,0 +1,42 @@
+import pickle
+
+import pytest
+
+from compliance.records import LinuxHost, MacRow, WindowsResult, WindowsRow
+
+
+def text(*parts):
+    return "".join(parts)     # a fresh, equal string object each call
+
+
+def test_rows_read_like_dicts():
+    row = WindowsRow("win-1", 26100, 6899, "2025-10-20T00:00:00.000Z")
+    assert row.get("build") == 26100 and row["agent_name"] == "win-1"
+    assert row.get("missing", "-") == "-"
+    with pytest.raises(KeyError):
+        row["missing"]
+    assert WindowsRow.from_dict({**row.as_dict(), "extra": 1}) == row
+    assert MacRow.from_dict({"agent_name": "mac-1"}).get("version") is None
+
+
+def test_records_have_no_instance_dict_and_are_not_hashable():
+    row = MacRow("mac-1", "15.7.1", None)
+    assert not hasattr(row, "__dict__")
+    with pytest.raises(AttributeError):
+        row.other = 1
+    with pytest.raises(TypeError):
+        hash(row)
+
+
+def test_shared_values_are_one_object():
+    a = LinuxHost("h1", text("2025-10-20T", "00:00:00Z"), "h1", text("Ub", "untu"), text("24.04", ".3 LTS"))
+    b = LinuxHost("h2", text("2025-10-20T", "00:00:00Z"), "h2", text("Ubu", "ntu"), text("24.04.3", " LTS"))
+    assert a.os_name is b.os_name and a.os_version is b.os_version and a.timestamp is b.timestamp
+    assert WindowsRow("x", int(text("261", "00")), None, None).build is \
+        WindowsRow("y", int(text("26", "100")), None, None).build
+
+
+def test_results_pickle_for_the_compare_pool():
+    result = WindowsResult("win-1", "2025-10-20T00:00:00Z", 26100, 6584, 6899, "no", "behind", 2, 21, "KB5066835")
+    again = pickle.loads(pickle.dumps(result))
+    assert again == result and again.as_dict()["latest_kb"] == "KB5066835"
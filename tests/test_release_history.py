@@ -0,0 +1,102 @@
+import json
+from datetime import date
+
+import pytest
+
+from compliance import jsoncodec
+from compliance.platforms import load_platform
+from compliance.release_history import MacReleaseHistory, WindowsReleaseHistory
+
+
+def windows_history(latest=6899):
+    history = WindowsReleaseHistory({26100: latest}, as_of=date(2025, 10, 20))
+    history.add(26100, 6584, "2025-09-09", "KB5065426")
+    history.add(26100, 6725, "2025-09-29", "KB5065789")
+    history.add(26100, 6899, "2025-10-14", "KB5066835")
+    history.add(22631, 6060, "2025-10-14", "KB5066793")
+    return history.freeze()
+
+
+def test_windows_behind_counts_the_newer_updates_and_days_since_the_oldest():
+    history = windows_history()
+    assert history.behind(26100, 6584) == (2, 21, "KB5066835")
+    assert history.behind(26100, 6700) == (2, 21, "KB5066835")    # between two releases
+    assert history.behind(26100, 6899) == (0, 0, "KB5066835")
+    assert history.behind(26100, 7000) == (0, 0, "KB5066835")    # preview newer than the table
+
+
+def test_windows_behind_stops_at_the_summary_tables_latest():
+    history = windows_history(latest=6725)
+    assert history[26100] == 6725
+    assert history.behind(26100, 6584) == (1, 21, "KB5065789")
+
+
+def test_windows_build_without_a_summary_row_takes_its_newest_history_row():
+    assert windows_history()[22631] == 6060
+
+
+def test_windows_behind_without_history_is_unknown():
+    history = windows_history()
+    assert history.behind(19045, 6456) == (None, None, None)
+    assert history.behind(26100, None) == (None, None, None)
+
+
+def test_windows_duplicate_rows_keep_the_earliest_date_and_a_kb():
+    history = WindowsReleaseHistory({26100: 6899}, as_of=date(2025, 10, 20))
+    history.add(26100, 6899, "2025-10-14", "KB5066835")
+    history.add(26100, 6899, "2025-10-10")             # the 25H2 table repeats the row
+    history.add(26100, 6584, "2025-09-09")
+    history.freeze()
+    assert history.behind(26100, 6584) == (1, 10, "KB5066835")
+
+
+def mac_history():
+    history = MacReleaseHistory(as_of=date(2025, 10, 20))
+    history.add("15", "15.7", "2025-09-15", maintained=True)
+    history.add("15", "15.7.1", "2025-09-29T00:00:00Z")
+    history.add("15", "15.6.1", "2025-08-20")
+    history.add("26", "26.0.1", "2025-09-29", maintained=True)
+    history.add("13", "13.7.8", "2025-08-20", maintained=False)
+    return history.freeze()
+
+
+def test_mac_history_lists_the_maintained_latest_versions_newest_major_first():
+    assert list(mac_history()) == ["26.0.1", "15.7.1"]
+
+
+def test_mac_behind_counts_the_known_newer_versions_of_the_major():
+    history = mac_history()
+    assert history.behind("15.6.1") == (2, 35)
+    assert history.behind("15.7") == (1, 21)
+    assert history.behind("15.7.1") == (0, 0)
+    assert history.behind("15.0") == (3, 61)                # older than anything seen
+    assert history.behind("12.7.6") == (None, None)
+    assert history.behind(None) == (None, None)
+
+
+def test_mac_history_round_trips_through_json():
+    history = mac_history()
+    again = MacReleaseHistory.from_json(json.loads(json.dumps(history.to_json())))
+    assert list(again) == list(history)
+    assert again.names == history.names and again.days == history.days
+    assert again.maintained == history.maintained
+
+
+@pytest.fixture
+def eol(stub, tmp_path, monkeypatch):
+    mod = load_platform("macos", "fetch_latest_version")
+    monkeypatch.setattr(mod, "URL", f"{stub.url}/eol/macos")
+    monkeypatch.setattr(mod, "HISTORY_FILE", str(tmp_path / "history.json"))
+    monkeypatch.setattr(mod, "HISTORY_TTL", 3600.0)
+    return mod
+
+
+def test_fetch_adds_the_new_latest_versions_to_the_cached_history(eol):
+    with open(eol.HISTORY_FILE, "wb") as fh:
+        jsoncodec.dump({"url": eol.URL, "fetched_at": 0,
+                        "majors": {"15": {"maintained": True, "versions": [["15.6.1", "2025-08-20"]]}}}, fh)
+    history = eol.load_macos_history()
+    assert history.names["15"] == ["15.6.1", "15.7.1"]
+    assert history.behind("15.6.1")[0] == 1
+    with open(eol.HISTORY_FILE, "rb") as fh:
+        assert jsoncodec.load(fh)["majors"]["15"]["versions"][0] == ["15.6.1", "2025-08-20"]
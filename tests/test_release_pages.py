@@ -0,0 +1,92 @@
+import pytest
+
+from compliance.platforms import load_platform
+
+
+@pytest.fixture
+def scrape(stub, tmp_path, monkeypatch):
+    mod = load_platform("windows", "scrape_latest_build")
+    monkeypatch.setattr(mod, "RELEASE_INFO_URLS", [f"{stub.url}/ms/release-info/win11",
+                                                   f"{stub.url}/ms/release-info/win10"])
+    monkeypatch.setattr(mod, "RELEASE_INFO_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(mod, "RELEASE_INFO_CACHE_TTL", 3600.0)
+    monkeypatch.setattr(mod, "SUPPORTED_BUILDS", set())
+    return mod
+
+
+def pages(stub):
+    with stub.state.lock:
+        return stub.state.counters["pages"], stub.state.counters["pages_not_modified"]
+
+
+def fail(stub, *paths):
+    with stub.state.lock:
+        stub.state.fail_paths = set(paths)
+
+
+def test_both_pages_merge_into_one_table(stub, scrape):
+    table = scrape.fetch_ms_latest_builds()
+    assert table[26100] == 6899 and table[19045] == 6456     # Windows 11 and Windows 10 lines
+    assert pages(stub) == (2, 0)
+    scrape.fetch_ms_latest_builds()
+    assert pages(stub) == (2, 0)                             # fresh cache: no request
+
+
+def test_stale_cache_is_revalidated_with_the_etag(stub, scrape, monkeypatch):
+    scrape.fetch_ms_latest_builds()
+    monkeypatch.setattr(scrape, "RELEASE_INFO_CACHE_TTL", 1e-9)
+    assert scrape.fetch_ms_latest_builds()[19045] == 6456
+    assert pages(stub) == (4, 2)
+
+
+def test_failed_page_falls_back_to_its_stale_copy(stub, scrape, monkeypatch):
+    scrape.fetch_ms_latest_builds()
+    monkeypatch.setattr(scrape, "RELEASE_INFO_CACHE_TTL", 1e-9)
+    fail(stub, "/ms/release-info/win10")
+    assert scrape.fetch_ms_latest_builds()[19045] == 6456
+
+
+def test_failed_page_without_a_copy_fails_the_baseline(stub, scrape):
+    fail(stub, "/ms/release-info/win10")
+    with pytest.raises(SystemExit) as exc:
+        scrape.fetch_ms_latest_builds()
+    assert exc.value.code == 1
+
+
+PAGE = """<html><body>
+<table><tr><th>Version</th><th>Servicing option</th><th>Availability date</th><th>Latest build</th></tr>
+<tr><td>24H2</td><td>General Availability Channel</td><td>2024-10-01</td><td>26100.6899</td></tr>
+<tr><td>24H2</td><td>Long-Term Servicing Channel</td><td>2024-10-01</td><td>26100.6584</td></tr>
+<tr><td>23H2</td><td>General Availability Channel</td><td>2023-10-31</td><td><b>22631.6060</b></td></tr>
+<tr><td>21H2</td><td>Enterprise</td><td>2021-10-04</td><td>End of servicing</td></tr>
+</table>
+<h4>Version 25H2 / 24H2 (OS build 26100)</h4>
+<table><tr><th>Servicing option</th><th>Availability date</th><th>Build</th><th>KB article</th></tr>
+<tr><td>General Availability Channel</td><td>2025-10-14</td><td>26100.6899 and 26200.6899</td>
+    <td><a href="#">KB5066835</a></td></tr>
+<tr><td>General Availability Channel</td><td>2025-09-09</td><td>26100.6584</td><td>KB5065426</td></tr>
+<tr><td>General Availability Channel</td><td>n/a</td><td>26100.6500</td><td>KB5000000</td></tr>
+</table>
+<table><tr><th>Unrelated</th></tr><tr><td>26100.1</td></tr></table>
+</body></html>"""
+
+
+def test_parse_release_page_reads_the_summary_and_history_tables(scrape):
+    page = scrape.parse_release_page(PAGE)
+    assert page["latest"] == {26100: 6899, 22631: 6060}     # GA beats LTSC on a shared line
+    assert page["history"] == [
+        [26100, 6899, "2025-10-14", "KB5066835"],
+        [26200, 6899, "2025-10-14", "KB5066835"],            # one cell, two build lines
+        [26100, 6584, "2025-09-09", "KB5065426"],
+    ]
+
+
+def test_parse_release_page_without_tables_is_empty(scrape):
+    assert scrape.parse_release_page("<html><body>Service unavailable</body></html>") == \
+        {"latest": {}, "history": []}
+
+
+def test_history_rows_become_the_baseline_history(stub, scrape):
+    table = scrape.fetch_ms_latest_builds()
+    assert table.ubrs[26100][-1] == 6899 and len(table.ubrs[26100]) == 8
+    assert table.behind(26100, 6899 - 37)[::2] == (1, "KB5066835")
@@ -0,0 +1,21 @@
+import pytest
+
+from compliance.bulk import BulkEngine
+from compliance.rollup import Rollup, rollup_index
+
+
+def test_rollup_ship_acknowledged(stub, host_spec):
+    spec = host_spec()
+    doc = Rollup("test", run_id="r1").ship(spec)
+    assert doc["run_id"] == "r1"
+    assert stub.acked(rollup_index(spec)) == {"test-r1"}
+
+
+def test_rejected_rollup_raises_and_is_dead_lettered(stub, host_spec, tmp_path):
+    spec = host_spec()
+    stub.reject("test-r1")
+    engine = BulkEngine(stub.url, state_dir=str(tmp_path / "state"))
+    with pytest.raises(RuntimeError, match="rejected"):
+        Rollup("test", run_id="r1").ship(spec, engine)
+    assert stub.acked(rollup_index(spec)) == set()
+    assert (tmp_path / "state" / "dead_letter.ndjson").exists()
@@ -0,0 +1,51 @@
+import os
+
+import pytest
+
+from compliance import shard
+from compliance.rollup import Rollup
+from compliance.shard import Shard
+
+
+def summary(hosts):
+    rollup = Rollup("linux", run_id="partial")
+    rollup.total = hosts
+    rollup.status["compliant"] = hosts
+    return {"platform": "linux", "seconds": 1.0, "hits": hosts, "rows": hosts,
+            "bulk": {"docs": hosts}, "rollup": rollup.doc()}
+
+
+def test_merge_takes_only_the_newest_run(tmp_path):
+    for i, hosts in enumerate((10, 20)):
+        path = shard.write_summary(str(tmp_path), summary(hosts), Shard(i, 2), run="mon")
+        os.utime(path, ns=(1, 1))
+    shard.write_summary(str(tmp_path), summary(5), Shard(0, 2), run="tue")   # shard 1 did not run
+
+    merged = shard.merge_dir(str(tmp_path))["linux"]
+    assert merged["shards"] == {"count": 2, "run_id": "tue", "merged": [0], "missing": [1]}
+    assert merged["rows"] == 5 and merged["rollup"]["total"] == 5
+    assert merged["rollup"]["run_id"] == "tue"
+
+    assert shard.merge_dir(str(tmp_path), run="tue")["linux"]["rows"] == 5
+
+
+def test_merge_summaries_rejects_mixed_runs(tmp_path):
+    a = {**summary(1), "shard": {"index": 0, "count": 2, "run_id": "mon"}}
+    b = {**summary(1), "shard": {"index": 1, "count": 2, "run_id": "tue"}}
+    with pytest.raises(ValueError, match="different runs"):
+        shard.merge_summaries([a, b])
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("", 0),
+    ("hello", 99162322),                    # "hello".hashCode() in Java
+    ("polygenelubricants", -2147483648),     # Integer.MIN_VALUE
+    ("\U0001F600", 1772899),                 # one code point, two UTF-16 units
+])
+def test_java_string_hash_parity(value, expected):
+    assert shard.java_string_hash(value) == expected
+
+
+def test_in_shard_uses_floor_mod():
+    # Math.floorMod(Integer.MIN_VALUE, 3) == 1 in Java; a truncating % would give -2
+    assert [shard.in_shard("polygenelubricants", Shard(i, 3)) for i in range(3)] == [False, True, False]
@@ -0,0 +1,42 @@
+import os
+
+import pytest
+
+from compliance import jsoncodec
+from compliance.bulk import BulkFlushError, ship_dir_to_elastic
+
+
+def write_reports(directory, names, mtime=None):
+    for name in names:
+        path = directory / f"{name}.json"
+        path.write_bytes(jsoncodec.dumps({"agent_name": name}))
+        if mtime is not None:
+            os.utime(path, ns=(mtime, mtime))
+
+
+def ship(stub, directory):
+    return ship_dir_to_elastic(str(directory), "reports", es_url=stub.url, batch_size=1,
+                               retry_backoff_sec=0)
+
+
+def failed_first_run(stub, directory):
+    write_reports(directory, ["a", "b", "c"], mtime=1_000_000_000_000_000_000)
+    stub.fail_bulk(3)                 # the first batch ("a") exhausts its retries
+    with pytest.raises(BulkFlushError):
+        ship(stub, directory)
+
+
+def test_rerun_resumes_the_same_files(stub, tmp_path):
+    failed_first_run(stub, tmp_path)
+    stats = ship(stub, tmp_path)
+    assert stats.replayed == 1        # "a", from the dead-letter file
+    assert stats.skipped == 1         # "a" again, before the checkpoint
+    assert stub.acked("reports") == {"a", "b", "c"}
+
+
+def test_regenerated_files_are_shipped_from_the_top(stub, tmp_path):
+    failed_first_run(stub, tmp_path)
+    write_reports(tmp_path, ["a", "b", "c"], mtime=2_000_000_000_000_000_000)   # next run's compare
+    stats = ship(stub, tmp_path)
+    assert stats.skipped == 0
+    assert stats.docs == 1 + 3        # the dead letter, then every file of this generation
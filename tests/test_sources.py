@@ -0,0 +1,45 @@
+import pytest
+
+from compliance.sources import NoSourceError, Source, epoch_millis, fan_in, merge_newest, paged_fetcher
+
+
+def test_epoch_millis_reads_offsets_precision_and_numbers():
+    same = ["2026-10-19T10:00:00Z", "2026-10-19T10:00:00.000000Z", "2026-10-19T12:00:00+02:00",
+            "2026-10-19T10:00:00", 1792404000000, "1792404000000"]
+    assert {epoch_millis(v) for v in same} == {1792404000000}
+    assert epoch_millis("yesterday") is None and epoch_millis(None, -1) == -1
+
+
+def test_merge_newest_compares_instants_not_strings():
+    eu = [{"id": "h1", "timestamp": "2026-10-19T11:30:00+02:00", "src": "eu"},   # 09:30Z
+          {"id": "h2", "timestamp": "2026-10-19T10:00:00.5Z", "src": "eu"}]
+    us = [{"id": "h1", "timestamp": "2026-10-19T10:00:00Z", "src": "us"},
+          {"id": "h2", "timestamp": "2026-10-19T10:00:00.123456Z", "src": "us"},
+          {"id": "h3", "timestamp": None, "src": "us"}]
+    rows = {r["id"]: r["src"] for r in merge_newest([eu, us], "id")}
+    assert rows == {"h1": "us", "h2": "eu", "h3": "us"}
+
+
+def test_fan_in_without_sources_fails():
+    with pytest.raises(NoSourceError, match="no sources configured"):
+        fan_in([], lambda source: ([], 0, 0), key="id")
+
+
+def test_fan_in_keeps_going_without_a_failed_source(stub):
+    good = Source("good", stub.url, "bench-linux-10")
+    bad = Source("bad", stub.url, "no-such-index")
+    rows, reports = fan_in([good, bad], paged_fetcher(_ids), key="id")
+    assert len(rows) == 10
+    assert [r.status for r in reports] == ["ok", "failed"]
+    with pytest.raises(NoSourceError):
+        fan_in([bad], paged_fetcher(_ids), key="id")
+
+
+def _ids(hits, seen):
+    out = []
+    for h in hits:
+        host_id = h["_source"]["host"]["id"]
+        if host_id not in seen:
+            seen.add(host_id)
+            out.append({"id": host_id, "timestamp": h["_source"]["@timestamp"]})
+    return out
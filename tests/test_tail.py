@@ -0,0 +1,27 @@
+import os
+import threading
+
+from compliance.bulk import state
+from compliance.tail import Tailer
+
+
+def tailer(spec):
+    return Tailer(spec, since=0, max_batch=4, poll=0, max_latency=0, overlap=0)
+
+
+def test_failed_tail_batch_is_dead_lettered_and_not_remembered(stub, host_spec, no_backoff):
+    spec = host_spec(hosts=10)
+    t = tailer(spec)
+    stub.fail_bulk(3)            # the first full batch exhausts its retries
+    assert t.poll_once() == 10
+    assert t.errors == 1
+    dead_letters = os.path.join(spec.ship_state("tail"), state.DEAD_LETTER_FILE)
+    assert os.path.exists(dead_letters)
+    assert len(t.host_state.fingerprints) == 6
+    assert not t.host_state.pending
+
+    again = tailer(spec)
+    again.run(threading.Event(), max_polls=1, report_every=3600)
+    assert again.stats.replayed == 4
+    assert len(stub.acked("out")) == 10
+    assert not os.path.exists(dead_letters)
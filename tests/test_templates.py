@@ -0,0 +1,73 @@
+from dataclasses import replace
+
+import pytest
+import requests
+
+from compliance import templates
+from compliance.templates import DATE, FREE_TEXT, KEYWORD, ensure, template_name
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    monkeypatch.setattr(templates, "_checked", {})
+
+
+@pytest.fixture
+def spec(host_spec):
+    base = host_spec(dest="out", mappings={"agent_name": KEYWORD, "@timestamp": DATE, "reason": FREE_TEXT},
+                     index_sort="agent_name")
+    return replace(base, settings=replace(base.settings, index_templates="install"))
+
+
+def installed(stub):
+    with stub.state.lock:
+        return dict(stub.state.templates)
+
+
+def test_install_puts_the_template_once(stub, spec):
+    result = ensure(spec)
+    assert result == {"template": "out-template", "action": "installed", "issues": []}
+    body = installed(stub)["out-template"]
+    assert body["index_patterns"] == ["out", "out-run-*"]
+    assert body["template"]["settings"]["index"]["sort"] == {"field": "agent_name", "order": "asc"}
+    assert ensure(spec) is result                            # cached per process
+
+    templates._checked.clear()
+    assert ensure(spec)["action"] == "current"               # same checksum on the cluster
+
+
+def test_changed_mappings_update_the_template(stub, spec):
+    ensure(spec)
+    changed = replace(spec, mappings={**spec.mappings, "build": {"type": "integer"}})
+    assert ensure(changed, "verify")["action"] == "differs"
+    assert "build" not in installed(stub)["out-template"]["template"]["mappings"]["properties"]
+    assert ensure(changed)["action"] == "updated"
+    assert "build" in installed(stub)["out-template"]["template"]["mappings"]["properties"]
+
+
+def test_verify_only_reports(stub, spec):
+    result = ensure(spec, "verify")
+    assert result["action"] == "missing" and not installed(stub)
+    assert any("dynamically" in issue for issue in result["issues"])
+
+
+def test_higher_priority_template_is_reported(stub, spec):
+    requests.put(f"{stub.url}/_index_template/legacy", json={
+        "index_patterns": ["out"], "priority": 500,
+        "template": {"mappings": {"properties": {"agent_name": {"type": "text"}}}}}).raise_for_status()
+    issues = ensure(spec)["issues"]
+    assert "new indices would map agent_name: text (want keyword)" in issues
+    assert any("sorted by None" in issue for issue in issues)
+
+
+def test_off_and_bad_modes(stub, spec):
+    assert ensure(spec, "off")["action"] == "skipped" and not installed(stub)
+    with pytest.raises(ValueError):
+        ensure(spec, "sometimes")
+
+
+def test_cluster_refusing_the_template_does_not_fail_the_run(stub, spec):
+    with stub.state.lock:
+        stub.state.fail_paths = {f"/_index_template/{template_name('out')}"}
+    result = ensure(spec)
+    assert result["action"] == "failed" and result["issues"]